@@ -1,75 +1,285 @@
-from flask import Flask, request, jsonify
-import pickle
+from flask import Flask, Response, g, request, jsonify, stream_with_context, url_for
 import numpy as np
-import cv2
 import os
 from PIL import Image
+import hmac
 import io
+import itertools
+import json
 import logging
-from skimage.feature import hog
+import threading
+import time
+import batch_jobs
+import batch_response
+import hog_features
+import metrics
+import micro_batching
+import model_artifact
+import model_registry
+import prediction_cache
+import preprocessing
+import upload_stream
 import urllib
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+# App log level from REFLASK_LOG_LEVEL; per-request details such as input shapes are logged at DEBUG
+logger = logging.getLogger("reflask")
+logger.setLevel(os.environ.get("REFLASK_LOG_LEVEL", "INFO").upper())
 
 # Starting the app
 app = Flask(__name__)
 
-# Loading the model
-with open('modell.pkl', 'rb') as file:
-    model = pickle.load(file)
+# Models are served through the registry: the newest version in REFLASK_MODELS_DIR (models/), hot-swapped when
+# a newer one appears, or else the model/ artifact or modell.pkl. REFLASK_MODEL_PATH pins one model (artifact
+# directory or pickle), e.g. the benchmark suite's; other versions can then only be activated through /models/reload.
+MODEL_PATH = os.environ.get("REFLASK_MODEL_PATH") or (
+    model_artifact.DEFAULT_MODEL_DIR if model_artifact.is_artifact(model_artifact.DEFAULT_MODEL_DIR) else 'modell.pkl')
+# Shared secret for the model admin endpoints, sent as the X-Admin-Token header; without it they only answer
+# requests from this host
+ADMIN_TOKEN = os.environ.get("REFLASK_ADMIN_TOKEN")
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
 
+registry = model_registry.ModelRegistry()
+# Opt-in micro-batching of concurrent /predict requests (REFLASK_MICROBATCH=1)
+batcher = None
+# Predictions of previously seen uploads, keyed by content hash and the fingerprint of the model version
+cache = None
+# Asynchronous batch jobs; the workers start with the first job, or at startup if jobs are unfinished
+job_queue = None
+# Set once the model is warm and this process's services run; /readyz answers 503 until then
+ready = threading.Event()
+# Process the services were started in; a forked worker starts its own
+_services_pid = None
 
-def preprocess_image(image):
+
+def load_model():
+    """
+    Load and warm the served model, unless one is active already.
+    """
+    if registry.current() is None:
+        if os.environ.get("REFLASK_MODEL_PATH"):
+            registry.activate_path(MODEL_PATH)
+        else:
+            registry.start(fallback_path=MODEL_PATH)
+    return registry.current()
+
+
+def start_services():
+    """
+    Start the threads and connections of this process: the model watcher, micro-batcher, prediction cache and
+    batch job workers. Threads and SQLite connections do not survive a fork, so a pre-forking server calls this in
+    every worker (see gunicorn.conf.py); calling it again in the same process does nothing.
     """
-    Preprocess the input image for the model:
-    - Convert to grayscale
-    - Resize to 300x300 pixels
-    - Extract HOG features
+    global batcher, cache, job_queue, _services_pid
+    if _services_pid == os.getpid():
+        return
+    _services_pid = os.getpid()
+    # Every worker follows versions pinned by /models/reload and /models/rollback in any worker; a model pinned by
+    # REFLASK_MODEL_PATH is not replaced by newer versions
+    registry.start_watching(follow_newest=not os.environ.get("REFLASK_MODEL_PATH"))
+    if micro_batching.MICROBATCH_ENABLED:
+        # Every request names the predictor of its model version (see predict_single)
+        batcher = micro_batching.MicroBatcher()
+        logger.info(f"Micro-batching /predict: up to {batcher.max_batch_size} images "
+                    f"within {batcher.max_wait * 1000:g} ms.")
+    if prediction_cache.PREDICTION_CACHE_ENABLED:
+        cache = prediction_cache.PredictionCache(None, db_path=prediction_cache.PREDICTION_CACHE_PATH)
+        # Entries of versions that can no longer be rolled back to are dropped
+        registry.add_listener(lambda new, old: cache.retain(model.fingerprint for model in registry.loaded()))
+    if batch_jobs.JOBS_ENABLED:
+        job_queue = batch_jobs.JobQueue(process_job_chunk)
+        job_queue.resume_pending()
+    ready.set()
+
+
+def create_app(start=True):
+    """
+    Return the app with its model loaded and warmed. The app, its model registry and services are module-level
+    singletons, so every call returns the same app; it is an entry point for gunicorn, not a factory of
+    independent apps. Until a call has loaded a model, /predict and /predict_batch answer 503 as /readyz does.
     Parameters:
-    - image: PIL.Image.Image, the input image.
+    - start: also start this process's services. gunicorn.conf.py passes False: the master loads the model once
+      and the workers forked from it share its pages, each starting its own services after the fork.
+    """
+    load_model()
+    if start:
+        start_services()
+    return app
+
+
+def predict_single(preprocessed_image, model):
+    """
+    Predict the label of one preprocessed image, batched with concurrent requests when enabled.
+    Only requests on the same model version share a batch, so the label and the cache entry match the version.
+    """
+    if batcher is not None:
+        return batcher.predict(preprocessed_image, model.predictor.predict)
+    return model.predictor.predict(preprocessed_image)
+
+
+def predict_upload(raw_image, endpoint="predict", model=None):
+    """
+    Predict the label of one raw upload, answering from the prediction cache when it was seen before.
+    Each stage is timed in the metrics of the given endpoint.
+    Parameters:
+    - model: the model_registry.ModelVersion to use; defaults to the active one.
     Returns:
-    - A NumPy array of the preprocessed image (HOG features).
-    """
-    # Convert image to OpenCV format
-    image_cv2 = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    # Convert to grayscale
-    grayscale = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2GRAY)
-    # Resize to 300x300
-    resized = cv2.resize(grayscale, (300, 300))
-    # Extract HOG features
-    hog_features, _ = hog(resized, orientations=8, pixels_per_cell=(16, 16),
-                          cells_per_block=(1, 1), visualize=True)
-    return np.expand_dims(hog_features, axis=0)
-
-
-def preprocess_images_batch(image_list):
-    """
-    Preprocess a batch of images for the model:
-    - Convert to grayscale
-    - Resize to 300x300
-    - Extract HOG features
+    - The prediction as a Python list, e.g. [0].
+    """
+    model = model or registry.current()
+    # The cache holds one prediction per image, shared with /predict_batch
+    key = None
+    if cache is not None:
+        with metrics.stage_timer(endpoint, "cache"):
+            key = prediction_cache.content_hash(raw_image)
+            cached = cache.get(key, model.fingerprint)
+        if cached is not None:
+            return [cached]
+    with metrics.stage_timer(endpoint, "decode"):
+        resized = preprocessing.to_model_input(Image.open(io.BytesIO(raw_image)))
+    with metrics.stage_timer(endpoint, "hog"):
+        preprocessed_image = hog_features.extract_hog_batch(resized[np.newaxis])
+    logger.debug("predict input_shape=%s", preprocessed_image.shape)
+    with metrics.stage_timer(endpoint, "predict"):
+        # Convert prediction to a Python list
+        predicted_label = predict_single(preprocessed_image, model).tolist()
+    if key is not None:
+        cache.put(key, predicted_label[0], model.fingerprint)
+    return predicted_label
+
+
+def classify_uploads(raw_images, endpoint="predict_batch", model=None, scores=None):
+    """
+    Predict the labels of a batch of raw uploads, answering previously seen ones from the cache.
+    Each stage is timed in the metrics of the given endpoint; preprocessing (decode and HOG) runs in the
+    worker processes and is timed as one stage.
     Parameters:
-    - image_list: List of PIL.Image.Image
+    - model: the model_registry.ModelVersion to use; defaults to the active one.
+    - scores: "decision" or "probability" to also return scores, from the same model pass as the labels. The
+      cache only holds labels, so every upload is then predicted.
     Returns:
-    - A NumPy array of HOG features for the batch.
+    - (predicted_labels, predicted_scores, errors): one prediction per upload (None for the ones that failed),
+      one score per upload (or None without scores) and {index: error message} for the uploads that could not
+      be preprocessed.
     """
-    logging.info(f"Received {len(image_list)} files for batch prediction.")
-    preprocessed_images = []
-    for image in image_list:
-        try:
-            # Converting PIL image to OpenCV format
-            image_cv2 = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            grayscale = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2GRAY)
-            resized = cv2.resize(grayscale, (300, 300))
-            # Extracting HOG features
-            hog_features, _ = hog(resized, orientations=8, pixels_per_cell=(16, 16),
-                                  cells_per_block=(1, 1), visualize=True)
-            preprocessed_images.append(hog_features)
-        except Exception as e:
-            logging.error(f"Error processing image: {str(e)}")
-            raise ValueError(f"Error in preprocessing batch: {str(e)}")
-    # Returning as a NumPy array
-    return np.array(preprocessed_images)
+    model = model or registry.current()
+    keys = [None] * len(raw_images)
+    predicted_labels = [None] * len(raw_images)
+    predicted_scores = [None] * len(raw_images) if scores else None
+    if cache is not None:
+        with metrics.stage_timer(endpoint, "cache"):
+            keys = [prediction_cache.content_hash(raw) for raw in raw_images]
+            if not scores:
+                predicted_labels = [cache.get(key, model.fingerprint) for key in keys]
+    missing = [idx for idx, label in enumerate(predicted_labels) if label is None]
+    errors = {}
+    if missing:
+        logger.info(f"Received {len(missing)} files for batch prediction.")
+        with metrics.stage_timer(endpoint, "preprocess"):
+            batch = preprocessing.preprocess_batch([raw_images[idx] for idx in missing])
+        # Only the uploads that failed are left out; the rest are still predicted
+        for idx, message in sorted(batch.errors.items()):
+            logger.error(f"Error processing image {missing[idx]}: {message}")
+            errors[missing[idx]] = message
+        if errors:
+            metrics.stage_errors.inc(endpoint, "preprocess", amount=len(errors))
+        predicted = [missing[idx] for idx in batch.indices]
+        preprocessed_images = batch.features
+        if predicted:
+            logger.debug("predict_batch input_shape=%s cached=%d", preprocessed_images.shape,
+                         len(raw_images) - len(missing))
+            with metrics.stage_timer(endpoint, "predict"):
+                if scores:
+                    predictions, decision_values = model.decide(preprocessed_images)
+                    values = (decision_values if scores == "decision"
+                              else model.calibration.probability(decision_values))
+                    for idx, value in zip(predicted, values.tolist()):
+                        predicted_scores[idx] = value
+                else:
+                    predictions = model.predictor.predict(preprocessed_images)
+            for idx, prediction in zip(predicted, predictions.tolist()):
+                predicted_labels[idx] = prediction
+            if cache is not None:
+                cache.put_many([(keys[idx], predicted_labels[idx]) for idx in predicted], model.fingerprint)
+    return predicted_labels, predicted_scores, errors
+
+
+def friendly_label(prediction):
+    """
+    Map a raw prediction (a label or a one-element list) to "approved", "rejected" or "unknown".
+    """
+    return batch_response.decision_names(np.ravel(prediction)[:1])[0]
+
+
+def process_job_chunk(raw_images):
+    """
+    Classify one chunk of an asynchronous batch job; a failed upload gets an error instead of a label.
+    """
+    model = registry.current()
+    metrics.batch_size.observe(len(raw_images), "batch_job")
+    predicted_labels, _, errors = classify_uploads(raw_images, endpoint="batch_job", model=model)
+    return [{"error": errors[idx]} if idx in errors else
+            {"Raw prediction": predicted_labels[idx], "Decision": friendly_label(predicted_labels[idx]),
+             "Model version": model.version}
+            for idx in range(len(raw_images))]
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        metrics.request_latency.observe(time.perf_counter() - start, request.endpoint or "unmatched",
+                                        str(response.status_code))
+    # The model version a prediction request was served with
+    if "model_version" in g:
+        response.headers["X-Model-Version"] = g.model_version
+    return response
+
+
+def collect_component_stats():
+    """
+    Gauges for the served model, the prediction cache and the micro-batcher, read at scrape time.
+    """
+    model = registry.current()
+    if model is None:
+        # Not loaded yet (see create_app)
+        return []
+    gauges = [("reflask_model_info", "The active model version (value 1).", 1,
+               {"version": model.version, "model_type": model.model_type})]
+    if cache is not None:
+        stats = cache.stats()
+        gauges += [("reflask_prediction_cache_hits", "Prediction cache hits since start.", stats["hits"]),
+                   ("reflask_prediction_cache_misses", "Prediction cache misses since start.", stats["misses"]),
+                   ("reflask_prediction_cache_entries", "Predictions held in memory.", stats["entries"])]
+    if batcher is not None:
+        stats = batcher.stats()
+        gauges += [("reflask_microbatch_batches", "Micro-batches predicted since start.", stats["batches"]),
+                   ("reflask_microbatch_rows", "Rows predicted through micro-batches since start.", stats["rows"])]
+    return gauges
+
+
+def collect_model_counters():
+    """
+    Counters of the model registry's reloads and rollbacks since this process started, read at scrape time.
+    """
+    return [("reflask_model_reloads_total", "Model versions activated by reloads.", registry.reloads),
+            ("reflask_model_rollbacks_total", "Model rollbacks.", registry.rollbacks)]
+
+
+metrics.registry.add_collector(collect_component_stats)
+metrics.registry.add_collector(collect_model_counters, kind="counter")
+
+
+def model_unavailable():
+    """
+    The 503 answer of prediction endpoints called before create_app has loaded a model.
+    """
+    return jsonify({"error": "No model is loaded yet"}), 503
 
 
 @app.route("/")
@@ -80,34 +290,30 @@ def home():
 # Adding functionality to enable getting predictions
 @app.route('/predict', methods=['POST'])
 def predict():
-    if 'file' not in request.files:
+    # One model version serves the whole request, even if a new one is swapped in meanwhile
+    model = registry.current()
+    if model is None:
+        return model_unavailable()
+    g.model_version = model.version
+    with metrics.stage_timer("predict", "parse"):
+        has_file_field = 'file' in request.files
+        file = request.files['file'] if has_file_field else request.get_data()
+    if not has_file_field:
         # Checking if file is in raw binary (e.g., from Postman binary upload)
-        file = request.get_data()
         if not file:
             return jsonify({"error": "No file provided"}), 400
         try:
-            image = Image.open(io.BytesIO(file))
-            preprocessed_image = preprocess_image(image)
-            print(f"Input shape for model: {preprocessed_image.shape}")
-            prediction = model.predict(preprocessed_image)
-            # Convert prediction to a Python list
-            predicted_label = prediction.tolist()
+            predicted_label = predict_upload(file, model=model)
             return jsonify({"Predicted label": predicted_label})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
-    file = request.files['file']
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
     try:
-        # Opening the uploaded image file
-        image = Image.open(io.BytesIO(file.read()))
-        # Preprocessing the image
-        preprocessed_image = preprocess_image(image)
-        print(f"Input shape for model: {preprocessed_image.shape}")
-        # Making prediction
-        prediction = model.predict(preprocessed_image)
-        # Convert prediction to a Python list
-        predicted_label = prediction.tolist()
+        with metrics.stage_timer("predict", "parse"):
+            raw_image = file.read()
+        # Making prediction for the uploaded image file
+        predicted_label = predict_upload(raw_image, model=model)
         if predicted_label[0] == 0:
             label_to_output = "approved"
         elif predicted_label[0] == 1:
@@ -121,38 +327,198 @@ def predict():
 
 @app.route('/predict_batch', methods=['POST'])
 def predict_batch():
+    model = registry.current()
+    if model is None:
+        return model_unavailable()
+    g.model_version = model.version
+    # The body is read part by part from request.stream (see upload_stream.py); request.files is never touched
+    boundary = request.mimetype_params.get("boundary")
+    if request.mimetype != "multipart/form-data" or not boundary:
+        return jsonify({"error": "No files provided"}), 400
+    if (request.content_length or 0) > upload_stream.MAX_REQUEST_BYTES:
+        return jsonify({"error": str(upload_stream.RequestTooLarge(upload_stream.MAX_REQUEST_BYTES))}), 413
+    # ?scores=decision|probability adds a score per file, ?layout=columns returns parallel arrays
+    scores = request.args.get("scores") or None
+    layout = request.args.get("layout", "records")
+    if scores is not None and scores not in batch_response.SCORE_KEYS:
+        return jsonify({"error": f"Unknown scores {scores!r}; use one of {', '.join(batch_response.SCORE_KEYS)}"}), 400
+    if layout not in batch_response.LAYOUTS:
+        return jsonify({"error": f"Unknown layout {layout!r}; use one of {', '.join(batch_response.LAYOUTS)}"}), 400
+    if scores == "probability" and model.calibration is None:
+        return jsonify({"error": f"Model version {model.version} has no probability calibration; "
+                                 f"use scores=decision"}), 400
+    filenames = []
+    predicted_labels = []
+    predicted_scores = []
+    errors = {}
+    try:
+        uploads = upload_stream.iter_uploads(request.stream, boundary)
+        while True:
+            with metrics.stage_timer("predict_batch", "parse"):
+                window = list(itertools.islice(uploads, upload_stream.INGEST_WINDOW))
+            if not window:
+                break
+            if any(upload.filename == '' for upload in window):
+                return jsonify({"error": "One or more files are missing filenames"}), 400
+            offset = len(filenames)
+            filenames.extend(upload.filename for upload in window)
+            # Files rejected while streaming (too large) are failures like undecodable ones
+            readable = [position for position, upload in enumerate(window) if upload.error is None]
+            errors.update((offset + position, upload.error) for position, upload in enumerate(window)
+                          if upload.error is not None)
+            window_labels, window_scores, window_errors = classify_uploads(
+                [window[position].data for position in readable], model=model, scores=scores)
+            labels = [None] * len(window)
+            window_values = [None] * len(window)
+            for idx, position in enumerate(readable):
+                labels[position] = window_labels[idx]
+                if window_scores is not None:
+                    window_values[position] = window_scores[idx]
+            predicted_labels.extend(labels)
+            predicted_scores.extend(window_values)
+            errors.update((offset + readable[idx], message) for idx, message in window_errors.items())
+            # Released before the next window is read, so only one window of raw images is held at a time
+            del window
+    except upload_stream.RequestTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if not filenames:
+        return jsonify({"error": "No files provided"}), 400
+    metrics.batch_size.observe(len(filenames), "predict_batch")
+    if errors:
+        failed_files = [{"File": filenames[idx], "error": message} for idx, message in sorted(errors.items())]
+        return jsonify({"error": f"Error processing one of the files: {failed_files[0]['error']}",
+                        "Failed files": failed_files}), 400
+    # Raw predictions and user-friendly labels (and scores), formatted as arrays and serialized once
+    body = batch_response.encode_batch(filenames, predicted_labels, predicted_scores if scores else None,
+                                       score_kind=scores, layout=layout)
+    return app.response_class(body, mimetype="application/json")
+
+
+@app.route('/jobs/predict_batch', methods=['POST'])
+def submit_batch_job():
+    if job_queue is None:
+        return jsonify({"error": "Batch jobs are disabled"}), 404
     files = request.files.getlist('files')
     if not files:
         return jsonify({"error": "No files provided"}), 400
+    if any(file.filename == '' for file in files):
+        return jsonify({"error": "One or more files are missing filenames"}), 400
     try:
-        images = []
-        for file in files:
-            if file.filename == '':
-                return jsonify({"error": "One or more files are missing filenames"}), 400
-            try:
-                images.append(Image.open(io.BytesIO(file.read())))
-            except Exception as e:
-                return jsonify({"error": f"Error processing one of the files: {str(e)}"}), 400
-        preprocessed_images = preprocess_images_batch(images)
-        print(f"Batch input shape for model: {preprocessed_images.shape}")
-        predictions = model.predict(preprocessed_images)
-        # Converting predictions to human-readable labels
-        predicted_labels = predictions.tolist()
-        label_mapping = {0: "approved", 1: "rejected"}
-        # Handle predictions based on their shape
-        friendly_labels = [
-            label_mapping.get(int(pred[0]) if isinstance(pred, (list, np.ndarray)) else int(pred), "unknown")
-            for pred in predicted_labels
-        ]
-        # Returning results with both raw predictions and user-friendly labels
-        return jsonify({
-            "Batch results": [
-                {"File": files[idx].filename, "Raw prediction": predicted_labels[idx], "Decision": friendly_labels[idx]}
-                for idx in range(len(files))
-            ]
-        })
+        job_id = job_queue.submit([(file.filename, file.read()) for file in files])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    return jsonify({"Job id": job_id, "Status": url_for('batch_job_status', job_id=job_id),
+                    "Results": url_for('batch_job_results', job_id=job_id)}), 202
+
+
+@app.route('/jobs/<job_id>')
+def batch_job_status(job_id):
+    status = job_queue.status(job_id) if job_queue is not None else None
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>/results')
+def batch_job_results(job_id):
+    """
+    Stream the job's results as NDJSON in input order, one object per file.
+    By default the stream stays open until the job is finished; ?wait=0 returns only the results so far.
+    """
+    if job_queue is None or job_queue.status(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    wait = request.args.get('wait', '1') != '0'
+    lines = (json.dumps(result) + "\n" for result in job_queue.iter_results(job_id, wait=wait))
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+
+@app.route("/healthz")
+def healthz():
+    """
+    Liveness: the process answers. The app only serves once its model is warm (see create_app).
+    """
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+def readyz():
+    """
+    Readiness: 200 once the model is loaded and warmed and this process's services run, 503 before.
+    """
+    model = registry.current()
+    if model is None or not ready.is_set():
+        return jsonify({"ready": False}), 503
+    return jsonify({"ready": True, "model_version": model.version, "pid": os.getpid()})
+
+
+@app.route("/microbatch_stats")
+def microbatch_stats():
+    if batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **batcher.stats()})
+
+
+@app.route("/cache_stats")
+def cache_stats():
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+
+def admin_authorized():
+    """
+    Whether the request may reload or roll back models: it carries the admin token or, when no token is
+    configured, comes from the loopback interface. The server binds to all interfaces by default.
+    """
+    if ADMIN_TOKEN is None:
+        return request.remote_addr in LOOPBACK_ADDRESSES
+    token = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+@app.route("/models")
+def list_models():
+    return jsonify(registry.status())
+
+
+@app.route("/models/reload", methods=['POST'])
+def reload_model():
+    """
+    Load, warm and activate a model version: {"version": "..."} or, without a body, the newest one.
+    A named version is pinned, so the other workers switch to it within REFLASK_MODEL_WATCH_SECONDS and a
+    restart keeps it; reloading the newest version lifts the pin.
+    """
+    if not admin_authorized():
+        return jsonify({"error": "Invalid admin token"}), 403
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        registry.reload(version)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Could not load model version: {e}"}), 500
+    return jsonify(registry.status())
+
+
+@app.route("/models/rollback", methods=['POST'])
+def rollback_model():
+    """
+    Reactivate the previous version and pin it for every worker, like a reload of a named version.
+    """
+    if not admin_authorized():
+        return jsonify({"error": "Invalid admin token"}), 403
+    try:
+        registry.rollback()
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(registry.status())
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/routes")
@@ -165,4 +531,6 @@ def list_routes():
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server; production runs under gunicorn (gunicorn.conf.py). REFLASK_PORT lets several instances
+    # run side by side, e.g. as endpoints of a sharded batch run
+    create_app().run(debug=True, port=int(os.environ.get("REFLASK_PORT", 5000)))
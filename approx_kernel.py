@@ -0,0 +1,266 @@
+"""
+Approximate-kernel linear classifier: an explicit feature map approximating the RBF kernel, then a linear model.
+
+The exact SVC costs n_support_vectors x n_features per prediction, and its support vectors grow with the training
+set. Here a HOG descriptor x is mapped to n_components features z(x) with z(x).z(y) ~ exp(-gamma ||x - y||^2), and a
+linear SVM (SGDClassifier with hinge loss) is trained on z, so a prediction costs n_components x n_features however
+many images the model was trained on. Two maps are supported:
+- rff: random Fourier features, z(x) = sqrt(2 / D) cos(W x + b) with W ~ N(0, 2 gamma) and b ~ U(0, 2 pi); it does
+  not depend on the data,
+- nystroem: z(x) = K(x, landmarks) K(landmarks, landmarks)^(-1/2) with landmarks sampled from the training images;
+  usually more accurate for the same D.
+ApproxKernelClassifier trains with partial_fit, so a model can keep learning from new images without refitting on
+the whole set (it needs scikit-learn). For serving, a Nystroem model folds its linear weights through the
+normalization into one weight per landmark, sum_j w_j exp(-gamma ||x - landmark_j||^2) + b, which is exactly what
+svm_engine.KernelSVMEngine computes with the landmarks as support vectors, so it is exported as one (D landmarks,
+fixed however many images it was trained on). A random Fourier model is served by ApproxKernelEngine. Both are
+saved and loaded through model_artifact.py and need NumPy alone at serving time.
+"""
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+import svm_engine
+
+MODEL_TYPES = {"rff": "rff-linear", "nystroem": "nystroem-linear"}
+METHODS = {model_type: method for method, model_type in MODEL_TYPES.items()}
+# Training state kept next to an approximate model so a later run can continue it with partial_fit
+TRAINING_STATE_NAME = "training_state.pkl"
+
+
+class RandomFourierMap:
+    """
+    Random Fourier features for the RBF kernel: sqrt(2 / D) cos(features @ weights.T + offset).
+    """
+    method = "rff"
+
+    def __init__(self, weights, offset, gamma, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.weights = np.ascontiguousarray(weights, dtype=self.dtype)
+        self.offset = np.ascontiguousarray(offset, dtype=self.dtype)
+        self.gamma = float(gamma)
+        self.scale = self.dtype.type(np.sqrt(2.0 / self.weights.shape[0]))
+
+    @classmethod
+    def fit(cls, features, n_components, gamma, random_state=0, dtype=np.float32):
+        """
+        Draw the random projection; only the number of features is taken from features.
+        """
+        rng = np.random.default_rng(random_state)
+        weights = rng.normal(scale=np.sqrt(2 * gamma), size=(n_components, np.shape(features)[1]))
+        return cls(weights, rng.uniform(0, 2 * np.pi, size=n_components), gamma, dtype)
+
+    @classmethod
+    def from_arrays(cls, arrays, gamma, dtype=np.float32):
+        return cls(arrays["weights"], arrays["offset"], gamma, dtype)
+
+    def arrays(self):
+        return {"weights": self.weights, "offset": self.offset}
+
+    @property
+    def n_features(self):
+        return self.weights.shape[1]
+
+    @property
+    def n_components(self):
+        return self.weights.shape[0]
+
+    def transform(self, features):
+        mapped = features @ self.weights.T
+        mapped += self.offset
+        np.cos(mapped, out=mapped)
+        mapped *= self.scale
+        return mapped
+
+
+class NystroemMap:
+    """
+    Nystroem features for the RBF kernel: rbf_kernel(features, landmarks) @ normalization.T.
+    """
+    method = "nystroem"
+
+    def __init__(self, landmarks, normalization, gamma, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.landmarks = np.ascontiguousarray(landmarks, dtype=self.dtype)
+        self.normalization = np.ascontiguousarray(normalization, dtype=self.dtype)
+        self.gamma = float(gamma)
+        self.landmark_norms = np.einsum("ij,ij->i", self.landmarks, self.landmarks)
+
+    @classmethod
+    def fit(cls, features, n_components, gamma, random_state=0, dtype=np.float32):
+        """
+        Sample n_components landmarks from features and compute K(landmarks, landmarks)^(-1/2).
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if n_components > features.shape[0]:
+            raise ValueError(f"Nystroem needs at least {n_components} images to sample landmarks from, "
+                             f"got {features.shape[0]}.")
+        rng = np.random.default_rng(random_state)
+        landmarks = features[np.sort(rng.choice(features.shape[0], size=n_components, replace=False))]
+        kernel = svm_engine.rbf_kernel(landmarks, landmarks, np.einsum("ij,ij->i", landmarks, landmarks), gamma)
+        u, singular_values, vt = np.linalg.svd(kernel)
+        normalization = (u / np.sqrt(np.maximum(singular_values, 1e-12))) @ vt
+        return cls(landmarks, normalization, gamma, dtype)
+
+    def landmark_weights(self, coef):
+        """
+        Weights of the landmarks' kernel values equivalent to applying coef to the mapped features.
+        """
+        return self.normalization.astype(np.float64).T @ np.ravel(coef)
+
+    @property
+    def n_features(self):
+        return self.landmarks.shape[1]
+
+    @property
+    def n_components(self):
+        return self.landmarks.shape[0]
+
+    def transform(self, features):
+        kernel = svm_engine.rbf_kernel(features, self.landmarks, self.landmark_norms, self.dtype.type(self.gamma))
+        return kernel @ self.normalization.T
+
+
+FEATURE_MAPS = {feature_map.method: feature_map for feature_map in (RandomFourierMap, NystroemMap)}
+
+
+class ApproxKernelEngine:
+    """
+    Batched decision function and predict of random Fourier features followed by a linear classifier.
+    """
+
+    def __init__(self, feature_map, coef, intercept, classes, chunk_size=svm_engine.CHUNK_SIZE):
+        self.feature_map = feature_map
+        self.dtype = feature_map.dtype
+        self.coef = np.ascontiguousarray(np.ravel(coef), dtype=self.dtype)
+        self.intercept = self.dtype.type(np.ravel(intercept)[0])
+        self.classes = np.asarray(classes)
+        self.chunk_size = chunk_size
+        if self.coef.shape[0] != feature_map.n_components:
+            raise ValueError(f"Got {self.coef.shape[0]} coefficients for {feature_map.n_components} components.")
+
+    @property
+    def n_features(self):
+        return self.feature_map.n_features
+
+    @property
+    def model_type(self):
+        return MODEL_TYPES[self.feature_map.method]
+
+    def decision_function(self, features):
+        """
+        Compute decision values for a batch; positive values vote for classes[1].
+        """
+        features = np.asarray(features, dtype=self.dtype)
+        if features.ndim == 1:
+            features = features[np.newaxis]
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f"Expected features of shape (N, {self.n_features}), got {features.shape}.")
+        decision = np.empty(features.shape[0], dtype=self.dtype)
+        for start in range(0, features.shape[0], self.chunk_size):
+            mapped = self.feature_map.transform(features[start:start + self.chunk_size])
+            decision[start:start + self.chunk_size] = mapped @ self.coef + self.intercept
+        return decision
+
+    def predict(self, features):
+        return self.classes[(self.decision_function(features) > 0).astype(np.intp)]
+
+
+class ApproxKernelClassifier:
+    """
+    Trains a feature map and a linear SVM on it incrementally.
+    Parameters:
+    - method: "rff" or "nystroem".
+    - n_components: dimension D of the feature map; the per-prediction cost is D x n_features.
+    - gamma: RBF kernel width, the same value as the exact SVC's.
+    - alpha: L2 regularization strength of the SGDClassifier.
+    """
+
+    def __init__(self, method="nystroem", n_components=1000, gamma=0.01, alpha=1e-5, random_state=0):
+        from sklearn.linear_model import SGDClassifier
+
+        if method not in FEATURE_MAPS:
+            raise ValueError(f"Unknown kernel approximation {method!r}; expected one of {sorted(FEATURE_MAPS)}.")
+        self.method = method
+        self.n_components = n_components
+        self.gamma = gamma
+        self.random_state = random_state
+        self.feature_map = None
+        self.n_seen = 0
+        # Averaged SGD keeps the weights stable across partial_fit calls on differently ordered batches
+        self.linear = SGDClassifier(loss="hinge", alpha=alpha, average=True, random_state=random_state)
+
+    @property
+    def model_type(self):
+        return MODEL_TYPES[self.method]
+
+    def partial_fit(self, features, labels, classes=None):
+        """
+        One pass of SGD over a batch. The first call fits the feature map on that batch (Nystroem samples its
+        landmarks from it) and needs classes, as SGDClassifier.partial_fit does.
+        """
+        features = np.asarray(features, dtype=np.float32)
+        if self.feature_map is None:
+            self.feature_map = FEATURE_MAPS[self.method].fit(features, self.n_components, self.gamma,
+                                                             self.random_state)
+        self.linear.partial_fit(self.feature_map.transform(features), labels, classes=classes)
+        self.n_seen += len(features)
+        return self
+
+    def fit(self, features, labels, epochs=10, batch_size=512):
+        """
+        Fit the feature map on all features, then run epochs of shuffled mini-batch partial_fit.
+        """
+        features = np.asarray(features, dtype=np.float32)
+        labels = np.asarray(labels)
+        if self.feature_map is None:
+            self.feature_map = FEATURE_MAPS[self.method].fit(features, self.n_components, self.gamma,
+                                                             self.random_state)
+        classes = np.unique(labels)
+        rng = np.random.default_rng(self.random_state)
+        for _ in range(epochs):
+            order = rng.permutation(len(features))
+            for start in range(0, len(features), batch_size):
+                batch = order[start:start + batch_size]
+                self.partial_fit(features[batch], labels[batch], classes=classes)
+        return self
+
+    def engine(self, dtype=np.float32, chunk_size=svm_engine.CHUNK_SIZE):
+        """
+        Export the fitted model for serving: a KernelSVMEngine over the landmarks for Nystroem, an
+        ApproxKernelEngine for random Fourier features.
+        """
+        if self.feature_map is None:
+            raise ValueError("The classifier has not been fitted.")
+        if self.method == "nystroem":
+            return svm_engine.KernelSVMEngine(self.feature_map.landmarks,
+                                              self.feature_map.landmark_weights(self.linear.coef_),
+                                              self.linear.intercept_, self.gamma, self.linear.classes_, dtype=dtype,
+                                              chunk_size=chunk_size)
+        feature_map = RandomFourierMap.from_arrays(self.feature_map.arrays(), self.gamma, dtype)
+        return ApproxKernelEngine(feature_map, self.linear.coef_, self.linear.intercept_, self.linear.classes_,
+                                  chunk_size)
+
+    def decision_function(self, features):
+        return self.linear.decision_function(self.feature_map.transform(np.asarray(features, dtype=np.float32)))
+
+    def predict(self, features):
+        return self.linear.predict(self.feature_map.transform(np.asarray(features, dtype=np.float32)))
+
+
+def save_training_state(classifier, model_dir):
+    """
+    Pickle the classifier next to its artifact so create_model.py can continue it with partial_fit.
+    Serving never reads this file.
+    """
+    with open(Path(model_dir) / TRAINING_STATE_NAME, "wb") as file:
+        pickle.dump(classifier, file)
+
+
+def load_training_state(model_dir):
+    """
+    Load the classifier saved by save_training_state. Only load training state you wrote yourself.
+    """
+    with open(Path(model_dir) / TRAINING_STATE_NAME, "rb") as file:
+        return pickle.load(file)
@@ -0,0 +1,235 @@
+"""
+Asynchronous batch prediction jobs backed by a local SQLite store.
+
+POST /jobs/predict_batch stores the uploaded files in the job database and returns a job id at once.
+Worker threads claim queued jobs and process their files in chunks, writing each file's result (or
+error) as soon as its chunk is done, so clients can poll the job status or stream partial results.
+Uploads and results live in SQLite, so queued and half-finished jobs survive a restart: a job whose
+worker stopped updating it for JOB_STALE_SECONDS is claimed again and resumes with its unfinished
+files. Processed uploads are dropped from the store to keep it small.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Set to 0 to disable the job endpoints
+JOBS_ENABLED = os.environ.get("REFLASK_JOBS", "1") != "0"
+# SQLite file holding queued jobs, their uploads and results
+JOB_DB_PATH = os.environ.get("REFLASK_JOB_DB", "batch_jobs.sqlite")
+# Number of worker threads processing jobs
+JOB_WORKERS = int(os.environ.get("REFLASK_JOB_WORKERS", 1))
+# Number of files classified per step; results become visible per chunk
+JOB_CHUNK_SIZE = int(os.environ.get("REFLASK_JOB_CHUNK_SIZE", 64))
+# A running job not updated for this long is considered abandoned and claimed again
+JOB_STALE_SECONDS = float(os.environ.get("REFLASK_JOB_STALE_SECONDS", 300))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    file_name TEXT NOT NULL,
+    data BLOB,
+    result TEXT,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of batch prediction jobs with a pool of worker threads.
+    process_fn(list of raw image bytes) must return one JSON-serializable result dict per image.
+    """
+
+    def __init__(self, process_fn, db_path=None, workers=None, chunk_size=None, stale_seconds=None):
+        self.process_fn = process_fn
+        self.db_path = JOB_DB_PATH if db_path is None else db_path
+        self.workers = JOB_WORKERS if workers is None else workers
+        self.chunk_size = JOB_CHUNK_SIZE if chunk_size is None else chunk_size
+        self.stale_seconds = JOB_STALE_SECONDS if stale_seconds is None else stale_seconds
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        """
+        One connection per thread; WAL lets status polls read while a worker writes.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            if not self._schema_ready:
+                connection.executescript(SCHEMA)
+                self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def start(self):
+        """
+        Start the worker threads if they are not running yet.
+        """
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"reflask-job-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logging.info(f"Started {self.workers} batch job worker(s) on {self.db_path}.")
+
+    def resume_pending(self):
+        """
+        Start the workers when the store already holds unfinished jobs, e.g. after a restart.
+        """
+        if os.path.exists(self.db_path):
+            pending = self._connection().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+            if pending:
+                logging.info(f"Resuming {pending} unfinished batch job(s).")
+                self.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, files):
+        """
+        Store a job for a list of (file name, raw bytes) pairs and return its id.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("INSERT INTO jobs (id, status, total, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                               (job_id, len(files), now, now))
+            connection.executemany("INSERT INTO job_files (job_id, position, file_name, data) VALUES (?, ?, ?, ?)",
+                                   [(job_id, position, name, sqlite3.Binary(raw))
+                                    for position, (name, raw) in enumerate(files)])
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id):
+        """
+        Return the job's progress as a dict, or None for an unknown job id.
+        """
+        row = self._connection().execute(
+            "SELECT id, status, total, completed, failed, created_at, updated_at, error FROM jobs WHERE id = ?",
+            (job_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "status", "total", "completed", "failed", "created_at", "updated_at", "error")
+        return dict(zip(keys, row))
+
+    def results(self, job_id, after=-1):
+        """
+        Return [(position, result dict)] of the finished files after the given position, in input order.
+        """
+        rows = self._connection().execute(
+            "SELECT position, result FROM job_files WHERE job_id = ? AND position > ? AND result IS NOT NULL "
+            "ORDER BY position", (job_id, after)).fetchall()
+        return [(position, json.loads(result)) for position, result in rows]
+
+    def iter_results(self, job_id, wait=True, poll_interval=0.5):
+        """
+        Yield the job's results in input order as they become available.
+        With wait=False only the results finished so far are yielded.
+        """
+        position = -1
+        while True:
+            # Reading the status first means nothing finished after it can be missed below
+            status = self.status(job_id)
+            for position, result in self.results(job_id, position):
+                yield result
+            if not wait or status is None or status["status"] in ("done", "failed"):
+                return
+            time.sleep(poll_interval)
+
+    def _claim(self):
+        """
+        Atomically take the oldest queued job, or a running job whose worker went silent.
+        """
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated_at < ?) "
+                "ORDER BY created_at LIMIT 1", (now - self.stale_seconds,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, row[0]))
+        return row[0]
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim()
+            except sqlite3.Error as e:
+                logging.error(f"Could not claim a batch job: {e}")
+                job_id = None
+            if job_id is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            try:
+                self._process(job_id)
+            except Exception as e:
+                logging.error(f"Batch job {job_id} failed: {e}")
+                with self._connection() as connection:
+                    connection.execute("UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                                       (str(e), time.time(), job_id))
+
+    def _process(self, job_id):
+        """
+        Classify the job's unfinished files chunk by chunk, storing results as they complete.
+        """
+        connection = self._connection()
+        while not self._stop.is_set():
+            rows = connection.execute(
+                "SELECT position, data FROM job_files WHERE job_id = ? AND result IS NULL ORDER BY position LIMIT ?",
+                (job_id, self.chunk_size)).fetchall()
+            if not rows:
+                with connection:
+                    connection.execute("UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ?",
+                                       (time.time(), job_id))
+                logging.info(f"Batch job {job_id} finished.")
+                return
+            names = dict(connection.execute(
+                f"SELECT position, file_name FROM job_files WHERE job_id = ? AND position IN "
+                f"({', '.join('?' * len(rows))})", (job_id, *[position for position, _ in rows])).fetchall())
+            results = self.process_fn([bytes(data) for _, data in rows])
+            records = [dict({"File": names[position]}, **result) for (position, _), result in zip(rows, results)]
+            failed = sum("error" in record for record in records)
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "UPDATE job_files SET result = ?, data = NULL WHERE job_id = ? AND position = ?",
+                    [(json.dumps(record), job_id, position) for (position, _), record in zip(rows, records)])
+                connection.execute(
+                    "UPDATE jobs SET completed = completed + ?, failed = failed + ?, updated_at = ? WHERE id = ?",
+                    (len(records), failed, time.time(), job_id))
@@ -1,54 +1,609 @@
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+import argparse
+import batch_response
 import dbAccessFunctions
+import directory_watcher
+import hashlib
+import itertools
 import json
 import os
 from pathlib import Path
+import result_store
+import socket
+import statistics
+import time
 import requests
+from requests.adapters import HTTPAdapter
 
 # Folder paths
 current = os.getcwd()
 BASE = Path(current).resolve().parent / "reflask"
 image_folder = BASE / "night_img"
 output_folder = BASE / "night_predict"
-image_folder.mkdir(parents=True, exist_ok=True)
-output_folder.mkdir(parents=True, exist_ok=True)
 
 # Endpoint for batch predictions
 url = "http://127.0.0.1:5000/predict_batch"
+# Sharded mode: comma-separated /predict_batch URLs; shard i is sent to endpoint i modulo their number
+BATCH_ENDPOINTS = [endpoint.strip() for endpoint in os.environ.get("REFLASK_BATCH_ENDPOINTS", url).split(",")
+                   if endpoint.strip()]
+# Sharded mode: seconds a worker's claim on a chunk of files lasts before other workers may take it over
+CLAIM_LEASE = int(os.environ.get("REFLASK_CLAIM_LEASE", 900))
+SHARD_FOLDER_NAME = "shards"
 
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+# Number of images sent per request
+CHUNK_SIZE = int(os.environ.get("REFLASK_BATCH_CHUNK_SIZE", 32))
+# Number of chunk requests in flight at the same time
+MAX_IN_FLIGHT = int(os.environ.get("REFLASK_BATCH_IN_FLIGHT", 2))
+# Seconds to wait for the response to one chunk
+REQUEST_TIMEOUT = float(os.environ.get("REFLASK_BATCH_TIMEOUT", 300))
+# Scores requested with every result: "decision" or "probability" (see batch_response.py); unset for labels only
+SCORES = os.environ.get("REFLASK_BATCH_SCORES") or None
+# Number of candidate file names checked against predicted_images per query
+LOOKUP_BATCH_SIZE = 500
+# Watch mode: images per request, and seconds the first image of a batch waits for more before it is sent
+WATCH_BATCH_SIZE = int(os.environ.get("REFLASK_WATCH_BATCH_SIZE", 8))
+WATCH_MAX_WAIT = float(os.environ.get("REFLASK_WATCH_MAX_WAIT", 1))
+# Watch mode: times a file of a failed chunk is re-sent before it is left for the next start
+WATCH_RETRIES = int(os.environ.get("REFLASK_WATCH_RETRIES", 3))
+# Watch mode: seconds between throughput and latency reports
+WATCH_REPORT_INTERVAL = float(os.environ.get("REFLASK_WATCH_REPORT_INTERVAL", 60))
+WATCH_CHECKPOINT_NAME = "watch_checkpoint.json"
 
-def batch_predict():
-    processed_files = dbAccessFunctions.fetch_processed_files(dbAccessFunctions.db_configuration)
-    files_to_process = [
-        ('files', (file, open(os.path.join(image_folder, file), 'rb')))
-        for file in os.listdir(image_folder)
-        if file.endswith(('.jpg', '.png', '.jpeg')) and file not in processed_files
-    ]
 
-    if not files_to_process:
-        print("No images to process.")
-        return
+class JsonResultWriter:
+    """
+    Keeps the day's results in night_predict/batch_results_YYYYMMDD.json, in the format the
+    endpoint returns ({"Batch results": [...]}). Chunks are appended to a journal next to it
+    (batch_results_YYYYMMDD.json.journal, one JSON object per line), and close() writes the JSON file
+    once, atomically, keeping the results already in it (from an earlier run), then removes the journal.
+    The journal of an interrupted run is picked up by the next one.
+    """
+    suffix = ".json"
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.journal = JsonLinesResultWriter(self.path.with_name(self.path.name + ".journal"))
+        self.results = []
+        if self.path.exists():
+            with open(self.path) as f:
+                self.results = json.load(f).get("Batch results", [])
+
+    def done_files(self):
+        return {result["File"] for result in self.results} | self.journal.done_files()
+
+    def append(self, results):
+        self.journal.append(results)
+
+    def close(self):
+        if not self.journal.path.exists():
+            return
+        # A file re-sent after a crash replaces its earlier result
+        merged = {}
+        for result in itertools.chain(self.results, self.journal.results()):
+            merged.pop(result["File"], None)
+            merged[result["File"]] = result
+        self.results = list(merged.values())
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, 'w') as f:
+            json.dump({"Batch results": self.results}, f, indent=4)
+        os.replace(temporary_path, self.path)
+        self.journal.path.unlink()
+
+
+class JsonLinesResultWriter:
+    """
+    Appends one JSON object per result to night_predict/batch_results_YYYYMMDD.jsonl, so a chunk
+    costs one append regardless of how many results the day already has.
+    """
+    suffix = ".jsonl"
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def results(self):
+        """
+        The results in the file, in order.
+        """
+        if not self.path.exists():
+            return []
+        results = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    result["File"]
+                except (ValueError, KeyError):
+                    # A line cut short by a crash; its file is simply sent again
+                    continue
+                results.append(result)
+        return results
+
+    def done_files(self):
+        return {result["File"] for result in self.results()}
+
+    def append(self, results):
+        with open(self.path, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+class ColumnarResultWriter:
+    """
+    Appends each chunk's results as one block of NumPy arrays to night_predict/batch_results_YYYYMMDD.npb
+    (see result_store.py): file name, label code, decision score, model version and save time, with the
+    decision and model version strings dictionary-encoded. A block cut short by a crash is dropped on open.
+    """
+    suffix = result_store.SUFFIX
+
+    def __init__(self, path):
+        self.path = Path(path)
+        result_store.repair(self.path)
+
+    def done_files(self):
+        return set(result_store.read_file_names(self.path))
+
+    def append(self, results):
+        result_store.append_block(self.path, results)
+
+    def close(self):
+        # One block per file once the run is over, so history reads stay cheap
+        result_store.compact(self.path)
+
+
+RESULT_WRITERS = {"json": JsonResultWriter, "jsonl": JsonLinesResultWriter, "columnar": ColumnarResultWriter}
+
+
+class DailyResultWriter:
+    """
+    Appends to the result file of the current day, so a long-running watcher starts a new file at midnight.
+    """
+
+    def __init__(self, folder, writer_class):
+        self.folder = Path(folder)
+        self.writer_class = writer_class
+        self.writer = None
+
+    @property
+    def path(self):
+        return self._current().path
+
+    def _current(self):
+        date_stamp = datetime.now().strftime("%Y%m%d")
+        path = self.folder / f"batch_results_{date_stamp}{self.writer_class.suffix}"
+        if self.writer is None or self.writer.path != path:
+            # The previous day is over
+            if self.writer is not None:
+                self.writer.close()
+            self.writer = self.writer_class(path)
+        return self.writer
+
+    def done_files(self):
+        return self._current().done_files()
+
+    def append(self, results):
+        self._current().append(results)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class WatchStats:
+    """
+    Throughput and end-to-end latency (file arrival to saved result) of the watch mode, printed periodically.
+    """
+
+    def __init__(self, report_interval=WATCH_REPORT_INTERVAL):
+        self.report_interval = report_interval
+        self.interval_started = time.monotonic()
+        self.total = 0
+        self.latencies = []
+
+    def record(self, latencies):
+        """
+        Record the latencies in seconds of one saved chunk; prints a report when the interval is over.
+        """
+        self.latencies.extend(latencies)
+        self.total += len(latencies)
+        if time.monotonic() - self.interval_started >= self.report_interval:
+            self.report()
+
+    def summary(self):
+        """
+        One line on the images saved since the last report.
+        """
+        seconds = time.monotonic() - self.interval_started
+        line = f"{len(self.latencies)} images in {seconds:.0f} s ({len(self.latencies) / max(seconds, 1e-9):.2f}/s)"
+        if self.latencies:
+            if len(self.latencies) > 1:
+                quantiles = statistics.quantiles(self.latencies, n=20, method="inclusive")
+                p50, p95 = quantiles[9], quantiles[18]
+            else:
+                p50 = p95 = self.latencies[0]
+            line += f", latency p50 {p50:.2f} s, p95 {p95:.2f} s, max {max(self.latencies):.2f} s"
+        return line
+
+    def report(self):
+        print(f"Watcher: {self.summary()}; {self.total} since start")
+        self.interval_started = time.monotonic()
+        self.latencies = []
+
+
+def iter_pending_files(folder, skip):
+    """
+    Lazily yield the names of images in folder that are not in skip.
+    """
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(IMAGE_EXTENSIONS) and entry.name not in skip:
+                yield entry.name
+
+
+def iter_unprocessed_files(names, lookup_batch_size=LOOKUP_BATCH_SIZE):
+    """
+    Lazily yield the names that predicted_images does not hold yet, checking them in batches.
+    """
+    for batch in iter_chunks(names, lookup_batch_size):
+        yield from dbAccessFunctions.fetch_unprocessed_files(dbAccessFunctions.db_configuration, batch,
+                                                             lookup_batch_size)
+
+
+def iter_chunks(names, chunk_size):
+    """
+    Group an iterable of file names into lists of at most chunk_size names.
+    """
+    names = iter(names)
+    while chunk := list(itertools.islice(names, chunk_size)):
+        yield chunk
+
+
+def make_session(max_in_flight=MAX_IN_FLIGHT):
+    """
+    HTTP session whose connection pool keeps one connection per chunk in flight.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def send_chunk(session, folder, chunk, endpoint=None, scores=None):
+    """
+    POST one chunk of images and return its results. Only this chunk's files are read into memory.
+    The response comes in the compact columns layout and is turned back into one result per file.
+    Parameters:
+    - scores: "decision" or "probability" to get a score with every result.
+    """
+    files = []
+    for name in chunk:
+        with open(os.path.join(folder, name), 'rb') as f:
+            files.append(('files', (name, f.read())))
+    params = {"layout": "columns"}
+    if scores:
+        params["scores"] = scores
+    response = session.post(endpoint or url, files=files, params=params, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 200:
+        raise RuntimeError(f"Error: {response.status_code}, {response.text}")
+    payload = response.json()
+    results = (batch_response.columns_to_results(payload["Batch columns"]) if "Batch columns" in payload
+               else payload["Batch results"])
+    # The version that served the chunk is kept with its results
+    model_version = response.headers.get("X-Model-Version")
+    if model_version:
+        for result in results:
+            result.setdefault("Model version", model_version)
+    return results
+
+
+def stream_batches(names, writer, mark_processed, session, folder=image_folder, chunk_size=CHUNK_SIZE,
+                   max_in_flight=MAX_IN_FLIGHT, scores=None):
+    """
+    Send the named images in chunks, with at most max_in_flight requests outstanding.
+    Results are written and the chunk's files marked processed as soon as the chunk completes, in
+    submission order, so a crash only loses the chunks in flight. A failed chunk is reported and
+    left unprocessed for the next run while the remaining chunks continue.
+    Returns:
+    - (number of images with results, number of chunks that failed)
+    """
+    return stream_chunks(iter_chunks(names, chunk_size), writer, mark_processed, session, folder=folder,
+                         max_in_flight=max_in_flight, scores=scores)
+
+
+def stream_chunks(chunks, writer, mark_processed, session, folder=image_folder, max_in_flight=MAX_IN_FLIGHT,
+                  on_failed=None, endpoint=None, scores=None):
+    """
+    Send ready-made chunks of image names as stream_batches does. Empty chunks are skipped; they let a
+    never-ending source (the watch mode) have finished chunks saved while it waits for new files.
+    Parameters:
+    - on_failed: called with the names of a chunk that failed.
+    - endpoint: the /predict_batch URL; defaults to url.
+    - scores: passed to send_chunk.
+    Returns:
+    - (number of images with results, number of chunks that failed)
+    """
+    completed = 0
+    failed_chunks = 0
+    in_flight = deque()
+
+    def finish_oldest():
+        nonlocal completed, failed_chunks
+        chunk, future = in_flight.popleft()
+        try:
+            results = future.result()
+        except Exception as e:
+            failed_chunks += 1
+            print(f"Failed to process chunk starting at {chunk[0]} ({len(chunk)} files): {e}")
+            if on_failed is not None:
+                on_failed(chunk)
+            return
+        writer.append(results)
+        mark_processed(chunk)
+        completed += len(results)
+        print(f"Saved results for {len(results)} files ({completed} so far) to {writer.path}")
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for chunk in chunks:
+            # Chunks that have already finished are saved without waiting for the next one to be sent
+            while in_flight and in_flight[0][1].done():
+                finish_oldest()
+            if not chunk:
+                continue
+            if len(in_flight) >= max_in_flight:
+                finish_oldest()
+            in_flight.append((chunk, executor.submit(send_chunk, session, folder, chunk, endpoint, scores)))
+        while in_flight:
+            finish_oldest()
+    return completed, failed_chunks
+
+
+def mark_files_processed(file_names):
+    dbAccessFunctions.save_processed_files(dbAccessFunctions.db_configuration, file_names)
+
+
+def batch_predict(chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT, output_format="json", scores=SCORES):
+    image_folder.mkdir(parents=True, exist_ok=True)
+    output_folder.mkdir(parents=True, exist_ok=True)
 
     # Generating a file name with the current date
     date_stamp = datetime.now().strftime("%Y%m%d")
-    output_file = output_folder / f"batch_results_{date_stamp}.json"
+    writer_class = RESULT_WRITERS[output_format]
+    writer = writer_class(output_folder / f"batch_results_{date_stamp}{writer_class.suffix}")
+
+    # Files already in today's output are skipped too, so an interrupted run resumes where it stopped
+    done_files = writer.done_files()
+    # Results written just before a crash may not have been marked processed yet
+    mark_files_processed(list(iter_unprocessed_files(sorted(done_files))))
+    # Only the files in night_img are checked against the processing history, never the whole table
+    pending = iter_unprocessed_files(iter_pending_files(image_folder, done_files))
+
+    with make_session(max_in_flight) as session:
+        completed, failed_chunks = stream_batches(pending, writer, mark_files_processed, session,
+                                                  chunk_size=chunk_size, max_in_flight=max_in_flight, scores=scores)
+    writer.close()
+    if not completed and not failed_chunks:
+        print("No images to process.")
+    elif failed_chunks:
+        print(f"{failed_chunks} chunk(s) failed and will be retried on the next run.")
+
+
+def shard_of(name, shards):
+    """
+    The shard of a file name: a stable hash of the name modulo shards, the same on every host and run.
+    """
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big") % shards
+
+
+def shard_result_path(output, date_stamp, shard, shards):
+    """
+    The JSON-lines result file of one shard (numbered from 1 in the name, as on the command line), merged into
+    the day's result file by merge_shard_results.
+    """
+    return (Path(output) / SHARD_FOLDER_NAME
+            / f"batch_results_{date_stamp}.shard-{shard + 1:03d}-of-{shards:03d}.jsonl")
+
+
+def run_shard(shard, shards, endpoint=None, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT, output_format="json",
+              folder=image_folder, output=output_folder, worker_id=None, scores=SCORES):
+    """
+    Process one shard of night_img: the files with shard_of(name, shards) == shard. Each chunk is claimed in
+    predicted_images (dbAccessFunctions.claim_files) right before it is sent, so workers whose shards overlap,
+    or a one-shot run at the same time, never send a file twice; a failed chunk's claims are released. Results
+    go to the shard's own JSON-lines file.
+    Returns:
+    - (number of images with results, number of chunks that failed)
+    """
+    folder = Path(folder)
+    output = Path(output)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{shard}"[-64:]
+    date_stamp = datetime.now().strftime("%Y%m%d")
+    writer = JsonLinesResultWriter(shard_result_path(output, date_stamp, shard, shards))
+    writer.path.parent.mkdir(parents=True, exist_ok=True)
+    merged_class = RESULT_WRITERS[output_format]
+    merged = merged_class(output / f"batch_results_{date_stamp}{merged_class.suffix}")
+    done_files = writer.done_files()
+    # Results written just before a crash may not have been marked processed yet
+    mark_files_processed(list(iter_unprocessed_files(sorted(done_files))))
+    done_files |= merged.done_files()
+    mine = (name for name in iter_pending_files(folder, done_files) if shard_of(name, shards) == shard)
+
+    def claimed_chunks():
+        for chunk in iter_chunks(iter_unprocessed_files(mine), chunk_size):
+            yield dbAccessFunctions.claim_files(dbAccessFunctions.db_configuration, chunk, worker_id, CLAIM_LEASE)
+
+    def release(chunk):
+        dbAccessFunctions.release_claims(dbAccessFunctions.db_configuration, chunk, worker_id)
+
+    with make_session(max_in_flight) as session:
+        completed, failed_chunks = stream_chunks(claimed_chunks(), writer, mark_files_processed, session,
+                                                 folder=folder, max_in_flight=max_in_flight, on_failed=release,
+                                                 endpoint=endpoint, scores=scores)
+    print(f"Shard {shard + 1}/{shards} ({endpoint or url}): {completed} images, {failed_chunks} failed chunk(s)")
+    return completed, failed_chunks
+
+
+def merge_shard_results(output=output_folder, output_format="json"):
+    """
+    Merge the shard result files into the usual night_predict/batch_results_YYYYMMDD file of their day, then
+    delete them. Files already in the day's results are not added again, so an interrupted merge can be rerun.
+    Returns:
+    - The number of results added.
+    """
+    output = Path(output)
+    writer_class = RESULT_WRITERS[output_format]
+    added = 0
+    shard_paths = sorted((output / SHARD_FOLDER_NAME).glob("batch_results_*.shard-*.jsonl"))
+    for date_stamp, paths in itertools.groupby(shard_paths, key=lambda path: path.name.split(".")[0][-8:]):
+        paths = list(paths)
+        writer = writer_class(output / f"batch_results_{date_stamp}{writer_class.suffix}")
+        done_files = writer.done_files()
+        results = {}
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; run_shard sends its file again
+                        continue
+                    if result["File"] not in done_files:
+                        results[result["File"]] = result
+        if results:
+            writer.append(list(results.values()))
+            writer.close()
+            added += len(results)
+        for path in paths:
+            path.unlink()
+    return added
+
+
+def sharded_batch_predict(shards, endpoints=None, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT,
+                          output_format="json", scores=SCORES):
+    """
+    Run all shards of night_img as local worker processes, shard i sending to endpoints[i % len(endpoints)],
+    then merge their results. To spread the shards over hosts, run --shard I/N on each and --merge once after.
+    """
+    endpoints = endpoints or BATCH_ENDPOINTS
+    image_folder.mkdir(parents=True, exist_ok=True)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=shards) as executor:
+        futures = [executor.submit(run_shard, shard, shards, endpoints[shard % len(endpoints)], chunk_size,
+                                   max_in_flight, output_format, scores=scores) for shard in range(shards)]
+        outcomes = [future.result() for future in futures]
+    completed = sum(images for images, _ in outcomes)
+    failed_chunks = sum(failed for _, failed in outcomes)
+    seconds = time.perf_counter() - start
+    print(f"{completed} images in {seconds:.1f} s ({completed / seconds:.1f}/s) over {shards} shards and "
+          f"{min(shards, len(endpoints))} endpoint(s); merged {merge_shard_results(output_folder, output_format)} "
+          f"results")
+    if failed_chunks:
+        print(f"{failed_chunks} chunk(s) failed and will be retried on the next run.")
+
+
+def watch(batch_size=WATCH_BATCH_SIZE, max_wait=WATCH_MAX_WAIT, max_in_flight=MAX_IN_FLIGHT, output_format="json",
+          use_inotify=True, folder=image_folder, output=output_folder, stop=None,
+          poll_interval=directory_watcher.POLL_INTERVAL, scores=SCORES):
+    """
+    Run until interrupted (or until stop is set): send each image completed in folder within seconds, in batches
+    of at most batch_size that wait at most max_wait seconds for more images. A checkpoint in output records the
+    files done, so a restart only looks at what arrived since (see directory_watcher.py). Files of a failed chunk
+    are re-sent up to WATCH_RETRIES times.
+    Returns:
+    - The WatchStats of the run.
+    """
+    folder = Path(folder)
+    output = Path(output)
+    folder.mkdir(parents=True, exist_ok=True)
+    output.mkdir(parents=True, exist_ok=True)
+    writer = DailyResultWriter(output, RESULT_WRITERS[output_format])
+    checkpoint = directory_watcher.Checkpoint(output / WATCH_CHECKPOINT_NAME)
+    watcher = directory_watcher.DirectoryWatcher(folder, checkpoint, IMAGE_EXTENSIONS, poll_interval, use_inotify)
+    stats = WatchStats()
+    arrivals = {}
+    failures = Counter()
+    print(f"Watching {folder} ({watcher.mode}), batches of up to {batch_size} images or {max_wait:g} s")
+
+    def new_chunks():
+        for batch in directory_watcher.iter_batches(watcher, batch_size, max_wait, stop):
+            arrivals.update(batch)
+            names = [name for name, _ in batch]
+            # Files processed outside the watcher, e.g. by a one-shot run, go straight to the checkpoint
+            unprocessed = set(iter_unprocessed_files(names)) if names else set()
+            processed = [name for name in names if name not in unprocessed]
+            checkpoint.record({name: arrivals.pop(name) for name in processed})
+            watcher.done(processed)
+            yield [name for name in names if name in unprocessed]
+
+    def saved(chunk):
+        mark_files_processed(chunk)
+        now_ns = time.time_ns()
+        done = {name: arrivals.pop(name) for name in chunk}
+        checkpoint.record(done)
+        watcher.done(chunk)
+        stats.record([(now_ns - time_ns) / 1e9 for time_ns in done.values()])
+
+    def failed(chunk):
+        failures.update(chunk)
+        retry = [name for name in chunk if failures[name] <= WATCH_RETRIES]
+        for name in chunk:
+            arrivals.pop(name, None)
+        if len(retry) < len(chunk):
+            print(f"Giving up on {len(chunk) - len(retry)} file(s) until the watcher restarts.")
+        watcher.release(retry)
 
-    # Sending files to the Flask app
     try:
-        response = requests.post(url, files=files_to_process)
-        if response.status_code == 200:
-            # Saving results
-            with open(output_file, 'w') as f:
-                json.dump(response.json(), f, indent=4)
-            print(f"Batch prediction results saved to {output_file}")
-            # Marking files as processed
-            for _, file_info in files_to_process:
-                dbAccessFunctions.save_processed_file(dbAccessFunctions.db_configuration, file_info[0])
-        else:
-            print(f"Error: {response.status_code}, {response.text}")
-    except Exception as e:
-        print(f"Failed to process batch prediction: {e}")
+        with make_session(max_in_flight) as session:
+            stream_chunks(new_chunks(), writer, saved, session, folder=folder, max_in_flight=max_in_flight,
+                          on_failed=failed, scores=scores)
+    except KeyboardInterrupt:
+        print("Watcher stopped.")
+    finally:
+        watcher.close()
+        writer.close()
+        stats.report()
+    return stats
 
 
 if __name__ == "__main__":
-    batch_predict()
+    parser = argparse.ArgumentParser(description="Send the images in night_img to /predict_batch in chunks.")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help=f"images per request (defaults to {CHUNK_SIZE}, or {WATCH_BATCH_SIZE} with --watch)")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    parser.add_argument("--format", choices=sorted(RESULT_WRITERS), default="json")
+    parser.add_argument("--watch", action="store_true", help="keep running and send images as they arrive")
+    parser.add_argument("--max-wait", type=float, default=WATCH_MAX_WAIT,
+                        help="with --watch, seconds an image waits for others to fill its batch")
+    parser.add_argument("--poll", action="store_true", help="with --watch, scan the folder instead of using inotify")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="split night_img over this many local worker processes and merge their results")
+    parser.add_argument("--shard", default=None, help="process only shard I/N (e.g. 2/4), as one of several hosts")
+    parser.add_argument("--merge", action="store_true", help="merge the shard result files into the day's results")
+    parser.add_argument("--endpoints", default=",".join(BATCH_ENDPOINTS),
+                        help="comma-separated /predict_batch URLs the shards are spread over")
+    parser.add_argument("--scores", choices=sorted(batch_response.SCORE_KEYS), default=SCORES,
+                        help="store a decision score or probability with every result")
+    args = parser.parse_args()
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    if args.shard:
+        shard, shards = (int(part) for part in args.shard.split("/"))
+        run_shard(shard - 1, shards, endpoints[(shard - 1) % len(endpoints)], args.chunk_size or CHUNK_SIZE,
+                  args.max_in_flight, args.format, scores=args.scores)
+    elif args.shards:
+        sharded_batch_predict(args.shards, endpoints, args.chunk_size or CHUNK_SIZE, args.max_in_flight, args.format,
+                              scores=args.scores)
+    elif args.merge:
+        print(f"Merged {merge_shard_results(output_folder, args.format)} results.")
+    elif args.watch:
+        watch(args.chunk_size or WATCH_BATCH_SIZE, args.max_wait, args.max_in_flight, args.format,
+              use_inotify=not args.poll, scores=args.scores)
+    else:
+        batch_predict(args.chunk_size or CHUNK_SIZE, args.max_in_flight, args.format, scores=args.scores)
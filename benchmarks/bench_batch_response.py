@@ -0,0 +1,73 @@
+"""
+Benchmark: encoding a /predict_batch response.
+
+Times the previous encoding (friendly_label per prediction, then Flask's jsonify, with the debug server's
+indentation) against batch_response.encode_batch in the records and columns layouts, with and without decision
+scores, and reports the body size of each.
+Usage:
+    python benchmarks/bench_batch_response.py [--results 10000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask, jsonify
+
+import batch_response
+
+
+def friendly_label(prediction):
+    # The per-prediction mapping /predict_batch used before batch_response
+    label_mapping = {0: "approved", 1: "rejected"}
+    return label_mapping.get(int(prediction[0]) if isinstance(prediction, (list, np.ndarray)) else int(prediction),
+                             "unknown")
+
+
+def timed(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function()
+        best = min(best, time.perf_counter() - started)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--results", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    random_state = np.random.RandomState(0)
+    filenames = [f"cast_ok_0_{index:06d}.jpeg" for index in range(args.results)]
+    labels = random_state.randint(0, 2, args.results)
+    scores = random_state.normal(0, 1.5, args.results).astype(np.float32)
+    app = Flask(__name__)
+    app.debug = True
+
+    def previous():
+        with app.app_context():
+            results = [{"File": name, "Raw prediction": label, "Decision": friendly_label(label)}
+                       for name, label in zip(filenames, labels.tolist())]
+            return jsonify({"Batch results": results}).get_data()
+
+    cases = [
+        ("jsonify (previous)", previous),
+        ("records", lambda: batch_response.encode_batch(filenames, labels)),
+        ("columns", lambda: batch_response.encode_batch(filenames, labels, layout="columns")),
+        ("records + scores", lambda: batch_response.encode_batch(filenames, labels, scores)),
+        ("columns + scores", lambda: batch_response.encode_batch(filenames, labels, scores, layout="columns")),
+    ]
+    print(f"{args.results} results, best of {args.repeat}")
+    for name, function in cases:
+        seconds, size = timed(function, args.repeat)
+        print(f"{name:>20}: {seconds * 1000:7.2f} ms, {size / args.results:5.1f} bytes/result")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: processed-file bookkeeping rows/sec, one connection and commit per row versus pooled bulk writes.
+
+"before" opens a fresh connection, runs one INSERT and commits for every row, as save_processed_file
+used to; "after" calls dbAccessFunctions.save_processed_files on a pooled connection, one multi-row
+INSERT and one commit per chunk of rows.
+With --backend mysql the rows go to a scratch database (reflask_bench, dropped afterwards) on the
+server from the MyDB_* environment variables; --backend sqlite runs the same two strategies against
+a temporary SQLite file as a stand-in when no MySQL/MariaDB server is available.
+Usage:
+    python benchmarks/bench_db_writes.py [--backend mysql|sqlite] [--rows 2000] [--chunk-size 32]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+BENCH_DATABASE = "reflask_bench"
+# SQLite stand-in for db_schema.TABLES["predicted_images"], which the MySQL benchmark creates
+SQLITE_CREATE_TABLE = ("CREATE TABLE predicted_images (id INTEGER PRIMARY KEY, file_name VARCHAR(255) NOT NULL UNIQUE, "
+                       "prediction_date DATETIME, claimed_by VARCHAR(64), claimed_until DATETIME)")
+
+
+def file_names(count, prefix):
+    return [f"{prefix}_{index:06d}.jpeg" for index in range(count)]
+
+
+def chunks(names, chunk_size):
+    return [names[start:start + chunk_size] for start in range(0, len(names), chunk_size)]
+
+
+def bench_mysql(rows, chunk_size):
+    import mysql.connector
+    import dbAccessFunctions
+    import db_schema
+
+    server_config = {key: value for key, value in dbAccessFunctions.db_configuration.items() if key != "database"}
+    bench_config = dict(dbAccessFunctions.db_configuration, database=BENCH_DATABASE)
+    admin = mysql.connector.connect(**{key: value for key, value in server_config.items() if key != "pool_size"})
+    cursor = admin.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+    cursor.execute(f"CREATE DATABASE {BENCH_DATABASE}")
+    cursor.execute(f"USE {BENCH_DATABASE}")
+    # The production table, with the unique index and claim columns save_processed_files relies on
+    cursor.execute(db_schema.TABLES["predicted_images"])
+    try:
+        def before(names):
+            direct_config = {key: value for key, value in bench_config.items() if key != "pool_size"}
+            for name in names:
+                connection = mysql.connector.connect(use_pure=True, **direct_config)
+                row_cursor = connection.cursor()
+                row_cursor.execute("INSERT INTO predicted_images (file_name, prediction_date) VALUES (%s, NOW())",
+                                   (name,))
+                connection.commit()
+                row_cursor.close()
+                connection.close()
+
+        def after(names):
+            for chunk in chunks(names, chunk_size):
+                dbAccessFunctions.save_processed_files(bench_config, chunk)
+
+        return run(before, after, rows)
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+        admin.close()
+
+
+def bench_sqlite(rows, chunk_size):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.sqlite")
+        with sqlite3.connect(path) as connection:
+            connection.execute(SQLITE_CREATE_TABLE)
+        query = ("INSERT INTO predicted_images (file_name, prediction_date) VALUES (?, CURRENT_TIMESTAMP) "
+                 "ON CONFLICT (file_name) DO UPDATE SET prediction_date = CURRENT_TIMESTAMP, claimed_by = NULL, "
+                 "claimed_until = NULL")
+
+        def before(names):
+            for name in names:
+                connection = sqlite3.connect(path)
+                connection.execute(query, (name,))
+                connection.commit()
+                connection.close()
+
+        pooled = sqlite3.connect(path)
+
+        def after(names):
+            for chunk in chunks(names, chunk_size):
+                pooled.executemany(query, [(name,) for name in chunk])
+                pooled.commit()
+
+        try:
+            return run(before, after, rows)
+        finally:
+            pooled.close()
+
+
+def run(before, after, rows):
+    """
+    Time both strategies on distinct file names and return rows/sec for each.
+    """
+    timings = {}
+    for label, strategy in (("before", before), ("after", after)):
+        names = file_names(rows, label)
+        start = time.perf_counter()
+        strategy(names)
+        timings[label] = rows / (time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="mysql")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=32, help="rows per bulk write (batch_predict chunk size)")
+    args = parser.parse_args()
+
+    bench = bench_mysql if args.backend == "mysql" else bench_sqlite
+    timings = bench(args.rows, args.chunk_size)
+    print(f"{args.rows} rows on {args.backend}, bulk chunk size {args.chunk_size}")
+    print(f"{'strategy':>22} {'rows/s':>10}")
+    print(f"{'per-row connection':>22} {timings['before']:>10.1f}")
+    print(f"{'pooled bulk writes':>22} {timings['after']:>10.1f}")
+    print(f"{'speedup':>22} {timings['after'] / timings['before']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
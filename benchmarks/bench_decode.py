@@ -0,0 +1,120 @@
+"""
+Benchmark: per-stage decode timings and accuracy of the reduced-size JPEG decode path.
+
+Builds RGB JPEGs at several resolutions from datapp/test castings (upscaled, quality 90, like phone
+photos of the part), then for each resolution times
+- the original pipeline: Image.open + full decode, RGB -> BGR, BGR -> GRAY, resize to 300x300,
+- the fast pipeline in preprocessing.to_model_input: open + reduced grayscale decode, resize,
+and compares the fast output to the original one: mean/max absolute pixel difference, max HOG
+feature difference and, when modell.pkl is available, the share of identical predictions.
+Usage:
+    python benchmarks/bench_decode.py [--images 40] [--sizes 300 1200 2400 4000 6000] [--model modell.pkl]
+"""
+import argparse
+import io
+import os
+import pickle
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import hog_features
+import preprocessing
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATAPP_TEST_DIR = BASE_DIR / "datapp" / "test"
+
+
+def make_uploads(count, width):
+    """
+    Encode count castings as square RGB JPEGs of the given side length.
+    """
+    paths = sorted(DATAPP_TEST_DIR.rglob("*.jpeg"))[::max(1, len(list(DATAPP_TEST_DIR.rglob("*.jpeg"))) // count)]
+    uploads = []
+    for path in paths[:count]:
+        gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        rgb = cv2.cvtColor(cv2.resize(gray, (width, width), interpolation=cv2.INTER_CUBIC),
+                           cv2.COLOR_GRAY2RGB)
+        buffer = io.BytesIO()
+        Image.fromarray(rgb).save(buffer, format="JPEG", quality=90)
+        uploads.append(buffer.getvalue())
+    return uploads
+
+
+def original_pipeline(raw, timings):
+    """
+    The pre-optimization decode stage, with per-stage timings.
+    """
+    start = time.perf_counter()
+    pixels = np.array(Image.open(io.BytesIO(raw)))
+    decoded = time.perf_counter()
+    image_cv2 = cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+    swapped = time.perf_counter()
+    grayscale = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2GRAY)
+    converted = time.perf_counter()
+    resized = cv2.resize(grayscale, preprocessing.IMAGE_SIZE)
+    done = time.perf_counter()
+    timings["decode"] += decoded - start
+    timings["rgb->bgr"] += swapped - decoded
+    timings["bgr->gray"] += converted - swapped
+    timings["resize"] += done - converted
+    return resized
+
+
+def fast_pipeline(raw, timings):
+    """
+    preprocessing.to_model_input on a freshly opened upload, timed as a whole.
+    """
+    start = time.perf_counter()
+    resized = preprocessing.to_model_input(Image.open(io.BytesIO(raw)))
+    timings["decode+gray+resize"] += time.perf_counter() - start
+    return resized
+
+
+def run(uploads, pipeline):
+    timings = defaultdict(float)
+    outputs = np.stack([pipeline(raw, timings) for raw in uploads])
+    return outputs, {stage: seconds / len(uploads) * 1e3 for stage, seconds in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 1200, 2400, 4000, 6000])
+    parser.add_argument("--model", default=str(BASE_DIR / "modell.pkl"))
+    args = parser.parse_args()
+
+    model = None
+    if os.path.exists(args.model):
+        with open(args.model, "rb") as file:
+            model = pickle.load(file)
+    for width in args.sizes:
+        uploads = make_uploads(args.images, width)
+        original, original_ms = run(uploads, original_pipeline)
+        fast, fast_ms = run(uploads, fast_pipeline)
+        pixel_difference = np.abs(original.astype(np.int16) - fast.astype(np.int16))
+        original_features = hog_features.extract_hog_batch(original)
+        fast_features = hog_features.extract_hog_batch(fast)
+        print(f"{width}x{width}, {len(uploads)} images")
+        print("  original ms/image: " + ", ".join(f"{stage} {ms:.2f}" for stage, ms in original_ms.items())
+              + f" (total {sum(original_ms.values()):.2f})")
+        print("  fast ms/image:     " + ", ".join(f"{stage} {ms:.2f}" for stage, ms in fast_ms.items())
+              + f" ({sum(original_ms.values()) / sum(fast_ms.values()):.1f}x)")
+        line = (f"  pixels: mean |diff| {pixel_difference.mean():.3f}, max {pixel_difference.max()}; "
+                f"HOG max |diff| {np.abs(original_features - fast_features).max():.4f}")
+        if model is not None:
+            agreement = np.mean(model.predict(original_features) == model.predict(fast_features))
+            line += f"; identical predictions {agreement:.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: accuracy, support vectors, model size and latency of the feature reduction settings.
+
+For every setting (see feature_reduction.py) the production SVC (RBF, C=1, gamma=0.01) is trained on the
+datapp/train HOG features, reduced as the setting says, exported as a model artifact and loaded back the way
+app.py serves it. Reported per setting: the fraction of variance kept, training time, test accuracy on
+datapp/test, the number of support vectors, the artifact size on disk, and the best-of-repeat latency of one
+prediction and of a batch of 128 (HOG extraction excluded; the projection is included).
+Usage:
+    python benchmarks/bench_feature_reduction.py [--settings none float16 pca:256 ...] [--train-images 0]
+                                                 [--output report.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn import svm
+from sklearn.preprocessing import LabelEncoder
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import feature_reduction
+import hog_features
+import image_loading
+import model_artifact
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATAPP_TRAIN_DIR = BASE_DIR / "datapp" / "train"
+DATAPP_TEST_DIR = BASE_DIR / "datapp" / "test"
+SETTINGS = ["none", "float16", "pca:512", "pca:256", "pca:128", "pca:64", "pca:128+float16"]
+
+
+def load_features(directory, limit=0, seed=42):
+    """
+    HOG features and label names of a dataset directory; a seeded sample of limit images when limit > 0.
+    """
+    entries = image_loading.list_images(directory)
+    if 0 < limit < len(entries):
+        sample = sorted(np.random.default_rng(seed).choice(len(entries), size=limit, replace=False))
+        entries = [entries[index] for index in sample]
+    images, errors = image_loading.load_images([path for path, _ in entries])
+    assert not errors, errors
+    return hog_features.extract_hog_batch(images), [label for _, label in entries]
+
+
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def evaluate(setting, train_features, train_labels, test_features, test_labels, work_dir, repeat):
+    """
+    Train, export and reload one setting; returns its report row.
+    """
+    reduction = feature_reduction.FeatureReduction.parse(setting)
+    start = time.perf_counter()
+    projection = reduction.fit(train_features)
+    reduced = projection.transform(train_features) if projection is not None else train_features
+    model = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(reduced, train_labels)
+    train_seconds = time.perf_counter() - start
+
+    model_dir = Path(work_dir) / setting.replace(":", "-").replace("+", "-")
+    manifest = model_artifact.export_model(model, model_dir, projection=projection,
+                                           storage_dtype=reduction.storage_dtype)
+    predictor, _ = model_artifact.load_artifact(model_dir)
+    accuracy = float(np.mean(predictor.predict(test_features) == test_labels))
+    single = test_features[:1]
+    batch = np.resize(test_features, (128, test_features.shape[1]))
+    return {
+        "setting": str(reduction),
+        "features": int(manifest["n_features"]),
+        "variance_kept": projection.explained_variance_ratio if projection is not None else 1.0,
+        "train_seconds": train_seconds,
+        "test_accuracy": accuracy,
+        "support_vectors": int(manifest["n_support_vectors"]),
+        "model_bytes": sum(path.stat().st_size for path in model_dir.iterdir()),
+        "predict_1_ms": best_time(lambda: predictor.predict(single), repeat) * 1000,
+        "predict_128_ms": best_time(lambda: predictor.predict(batch), repeat) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--settings", nargs="+", default=SETTINGS)
+    parser.add_argument("--train-images", type=int, default=0, help="seeded training sample size (0: all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+    for setting in args.settings:
+        feature_reduction.FeatureReduction.parse(setting)
+
+    train_features, train_names = load_features(DATAPP_TRAIN_DIR, args.train_images, args.seed)
+    test_features, test_names = load_features(DATAPP_TEST_DIR)
+    label_encoder = LabelEncoder()
+    train_labels = label_encoder.fit_transform(train_names)
+    test_labels = label_encoder.transform(test_names)
+    print(f"{len(train_labels)} training and {len(test_labels)} test images, "
+          f"{train_features.shape[1]} HOG features each")
+
+    rows = []
+    print(f"{'setting':>16} {'features':>8} {'variance':>8} {'train s':>8} {'accuracy':>8} {'SVs':>6} "
+          f"{'size MB':>8} {'1 ms':>7} {'128 ms':>7}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for setting in args.settings:
+            row = evaluate(setting, train_features, train_labels, test_features, test_labels, work_dir, args.repeat)
+            rows.append(row)
+            print(f"{row['setting']:>16} {row['features']:>8} {row['variance_kept']:>8.1%} "
+                  f"{row['train_seconds']:>8.1f} {row['test_accuracy']:>8.4f} {row['support_vectors']:>6} "
+                  f"{row['model_bytes'] / 2 ** 20:>8.2f} {row['predict_1_ms']:>7.3f} {row['predict_128_ms']:>7.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"train_images": len(train_labels), "test_images": len(test_labels), "results": rows}, f,
+                      indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: peak Python memory and time of /predict_batch ingestion, buffered versus streamed.
+
+Builds one multipart request of --images synthetic photos (noise JPEGs of --side x --side pixels) and runs the
+ingestion and preprocessing of /predict_batch on it, without a model:
+- buffered: request.files, every file read into a list, then preprocessing.preprocess_batch on the whole list,
+- streamed: upload_stream.iter_uploads over request.stream, preprocessing one window of uploads at a time.
+Peak memory is measured with tracemalloc (NumPy and Pillow buffers included), excluding the request body itself.
+Usage:
+    python benchmarks/bench_ingestion.py [--images 64] [--side 2000] [--window 16]
+"""
+import argparse
+import io
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import preprocessing
+import upload_stream
+
+
+def make_request(body, content_type):
+    return Request(EnvironBuilder(method="POST", input_stream=io.BytesIO(body), content_type=content_type,
+                                  content_length=len(body)).get_environ())
+
+
+def buffered(body, content_type, window):
+    request = make_request(body, content_type)
+    raw_images = [file.read() for file in request.files.getlist("files")]
+    return len(preprocessing.preprocess_batch(raw_images, workers=0).indices)
+
+
+def streamed(body, content_type, window):
+    request = make_request(body, content_type)
+    uploads = upload_stream.iter_uploads(request.stream, request.mimetype_params["boundary"])
+    done = 0
+    while True:
+        batch = list(itertools.islice(uploads, window))
+        if not batch:
+            return done
+        done += len(preprocessing.preprocess_batch([upload.data for upload in batch], workers=0).indices)
+        del batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--side", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    photos = []
+    for _ in range(4):
+        buffer = io.BytesIO()
+        pixels = rng.integers(0, 256, size=(args.side, args.side, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        photos.append(buffer.getvalue())
+    files = [(io.BytesIO(photos[index % len(photos)]), f"photo_{index}.jpg") for index in range(args.images)]
+    environ = EnvironBuilder(method="POST", data={"files": files}).get_environ()
+    body = environ["wsgi.input"].read()
+    content_type = environ["CONTENT_TYPE"]
+    print(f"{args.images} images of {len(photos[0]) / 2 ** 20:.1f} MB, request body {len(body) / 2 ** 20:.0f} MB, "
+          f"window {args.window}")
+    for name, ingest in (("buffered", buffered), ("streamed", streamed)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        count = ingest(body, content_type, args.window)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:>9}: {count} images in {seconds:.2f} s, peak {peak / 2 ** 20:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: cold-start time and per-worker memory of the pickled model versus the model artifact.
+
+Starts --workers processes per format at the same time, as a pre-forking server would. Each one loads
+the model the way app.py does, namely
+- pickle: unpickles modell.pkl and exports the kernel engine from it,
+- artifact: memory-maps the model_artifact.py directory,
+then predicts one batch, so every support vector page has been read, and reports its load time, its
+first-prediction time, its RSS and its PSS (proportional set size: shared pages divided among the
+processes mapping them, Linux only). The processes stay alive until all have reported, so the PSS
+reflects the sharing between them. The page cache is warm, so the times exclude disk reads.
+Usage:
+    python benchmarks/bench_model_load.py [--pickle modell.pkl] [--artifact model] [--workers 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def memory_kb():
+    """
+    (RSS, PSS) of this process in kB; PSS is None where /proc/self/smaps_rollup is unavailable.
+    """
+    rss = pss = None
+    try:
+        with open("/proc/self/status") as f:
+            rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        with open("/proc/self/smaps_rollup") as f:
+            pss = next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+    except (OSError, StopIteration):
+        if rss is None:
+            import resource
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, pss
+
+
+def child(model_format, path):
+    """
+    Load and warm the model and report the timings as one JSON line; report the memory once the parent
+    asks (after every worker has loaded), then wait until it closes stdin.
+    """
+    import pickle
+
+    import numpy as np
+
+    import model_artifact
+    import svm_engine
+
+    baseline_rss, baseline_pss = memory_kb()
+    start = time.perf_counter()
+    if model_format == "pickle":
+        with open(path, "rb") as file:
+            model = pickle.load(file)
+        engine = svm_engine.KernelSVMEngine.from_model(model)
+    else:
+        engine, _ = model_artifact.load_artifact(path)
+    loaded = time.perf_counter()
+    engine.predict(np.random.default_rng(0).random((8, engine.n_features)))
+    predicted = time.perf_counter()
+    print(json.dumps({"load_seconds": loaded - start, "first_predict_seconds": predicted - loaded}), flush=True)
+    sys.stdin.readline()
+    rss, pss = memory_kb()
+    print(json.dumps({"rss_kb": rss, "pss_kb": pss, "baseline_rss_kb": baseline_rss,
+                      "baseline_pss_kb": baseline_pss}), flush=True)
+    sys.stdin.read()
+
+
+def run_workers(model_format, path, workers):
+    processes = [subprocess.Popen([sys.executable, __file__, "--child", model_format, str(path)],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    reports = [json.loads(process.stdout.readline()) for process in processes]
+    # Memory is read only once every worker holds its model, so PSS splits shared pages among all of them
+    for process in processes:
+        process.stdin.write("measure\n")
+        process.stdin.flush()
+    for process, report in zip(processes, reports):
+        report.update(json.loads(process.stdout.readline()))
+    for process in processes:
+        process.stdin.close()
+        process.wait()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pickle", default=str(BASE_DIR / "modell.pkl"))
+    parser.add_argument("--artifact", default=None,
+                        help="model directory (default: converted from --pickle into a temporary directory)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", nargs=2, metavar=("FORMAT", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    import model_artifact
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        artifact = args.artifact
+        if artifact is None:
+            artifact = Path(work_dir) / "model"
+            model_artifact.convert_pickle(args.pickle, artifact)
+        print(f"{args.workers} concurrent workers per format; times are per worker, memory is the growth "
+              f"over the interpreter with numpy loaded")
+        print(f"{'format':>9} {'load ms':>9} {'predict ms':>11} {'RSS MB':>8} {'PSS MB':>8}")
+        for model_format, path in (("pickle", args.pickle), ("artifact", artifact)):
+            reports = run_workers(model_format, path, args.workers)
+            mean = lambda key: sum(report[key] for report in reports) / len(reports)
+            rss = (mean("rss_kb") - mean("baseline_rss_kb")) / 1024
+            pss = float("nan")
+            if reports[0]["pss_kb"] is not None:
+                pss = (mean("pss_kb") - mean("baseline_pss_kb")) / 1024
+            print(f"{model_format:>9} {mean('load_seconds') * 1000:>9.1f} "
+                  f"{mean('first_predict_seconds') * 1000:>11.1f} {rss:>8.1f} {pss:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: /predict_batch preprocessing throughput versus worker count.
+
+Reads the raw JPEG bytes of the datapp/test set once, then times preprocessing.preprocess_batch
+(decode, grayscale, resize, HOG) for 1, 2, 4, ... worker processes up to the CPU count.
+Usage:
+    python benchmarks/bench_preprocess_pool.py [--limit 715] [--chunk-size 16] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import preprocessing
+
+DATAPP_TEST_DIR = Path(__file__).resolve().parent.parent / "datapp" / "test"
+
+
+def load_raw_images(limit=None):
+    """
+    Read the raw bytes of the datapp/test images, as an upload would deliver them.
+    """
+    paths = sorted(path for path in DATAPP_TEST_DIR.rglob("*") if path.suffix in (".jpg", ".jpeg", ".png"))
+    return [path.read_bytes() for path in paths[:limit]]
+
+
+def worker_counts(max_workers):
+    """
+    1, 2, 4, ... up to and including max_workers.
+    """
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def run(raw_images, workers, chunk_size, repeat):
+    """
+    Best-of-repeat wall-clock time of preprocessing the whole set with the given worker count.
+    """
+    preprocessing.shutdown_pool()
+    # Warming up the pool so process start-up is not counted
+    preprocessing.preprocess_batch(raw_images[:chunk_size * max(workers, 2)], workers=workers, chunk_size=chunk_size)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        batch = preprocessing.preprocess_batch(raw_images, workers=workers, chunk_size=chunk_size)
+        timings.append(time.perf_counter() - start)
+    assert not batch.errors and len(batch.indices) == len(raw_images)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limit", type=int, default=None, help="number of images to use (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=preprocessing.PREPROCESS_CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    raw_images = load_raw_images(args.limit)
+    print(f"{len(raw_images)} images from {DATAPP_TEST_DIR}, chunk size {args.chunk_size}")
+    print(f"{'workers':>8} {'seconds':>9} {'images/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts(args.max_workers):
+        seconds = run(raw_images, workers, args.chunk_size, args.repeat)
+        baseline = baseline or seconds
+        print(f"{workers:>8} {seconds:>9.3f} {len(raw_images) / seconds:>10.1f} {baseline / seconds:>7.2f}x")
+    preprocessing.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: night_predict result formats, writing one day chunk by chunk and reading many days of history.
+
+For each of json, jsonl and columnar, one day of synthetic /predict_batch results is written through the
+batch_predict writer in chunks, reporting the write time and bytes per result. Closing the writer writes the JSON
+file from its journal and compacts the columnar file into one block. The day's file is then copied to --days dates,
+and result_store.load_history plus a summary per day and decision is timed over the whole history.
+Usage:
+    python benchmarks/bench_result_formats.py [--results 10000] [--chunk-size 32] [--days 30]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import batch_predict
+import result_store
+
+
+def synthetic_results(count):
+    return [{"File": f"cast_ok_0_{index:06d}.jpeg", "Raw prediction": index % 3 == 0,
+             "Decision": "rejected" if index % 3 == 0 else "approved", "Model version": "20260301-120000",
+             "Decision score": (index % 200) / 100 - 1} for index in range(count)]
+
+
+def bench_format(output_format, results, chunk_size, days):
+    writer_class = batch_predict.RESULT_WRITERS[output_format]
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        first = folder / f"batch_results_20260101{writer_class.suffix}"
+        writer = writer_class(first)
+        started = time.perf_counter()
+        for start in range(0, len(results), chunk_size):
+            writer.append(results[start:start + chunk_size])
+        append_seconds = time.perf_counter() - started
+        writer.close()
+        write_seconds = time.perf_counter() - started
+        size = first.stat().st_size
+        for day in range(2, days + 1):
+            shutil.copyfile(first, folder / f"batch_results_202601{day:02d}{writer_class.suffix}"
+                            if day <= 31 else folder / f"batch_results_2026{day // 31 + 1:02d}01{writer_class.suffix}")
+        started = time.perf_counter()
+        table = result_store.load_history(folder)
+        summary = result_store.summarize(table, ("date", "decision"))
+        read_seconds = time.perf_counter() - started
+    return {"append_seconds": append_seconds, "write_seconds": write_seconds, "bytes_per_result": size / len(results),
+            "read_seconds": read_seconds, "rows": len(table["file"]), "groups": len(summary)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--results", type=int, default=10000, help="results per day")
+    parser.add_argument("--chunk-size", type=int, default=32)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+    results = synthetic_results(args.results)
+    print(f"{args.results} results per day in chunks of {args.chunk_size}, history of {args.days} days")
+    for output_format in ("json", "jsonl", "columnar"):
+        stats = bench_format(output_format, results, args.chunk_size, args.days)
+        print(f"{output_format:>9}: write {stats['write_seconds']:7.2f} s ({stats['append_seconds']:.2f} s appending), "
+              f"{stats['bytes_per_result']:6.1f} bytes/result, "
+              f"read + summarize {stats['rows']} results {stats['read_seconds']:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: wall-clock time of the hyperparameter search versus worker count, and versus a plain GridSearchCV.
+
+Runs hyperparameter_search.search() with the default grid on a seeded sample of the datapp/train HOG features
+for n_jobs = 1, 2, 4, ... up to the CPU count and reports the speedup over one worker (ideal: the worker count).
+Then times sklearn's GridSearchCV over SVC(kernel=...) on the raw features with the same grid and folds, which
+recomputes the kernel for every candidate and fold, and checks that both searches pick the same parameters.
+Usage:
+    python benchmarks/bench_search_scaling.py [--images 2000] [--folds 3] [--skip-baseline]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn import svm
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import hog_features
+import hyperparameter_search
+import image_loading
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATAPP_TRAIN_DIR = BASE_DIR / "datapp" / "train"
+
+
+def load_sample(size, seed):
+    entries = image_loading.list_images(DATAPP_TRAIN_DIR)
+    sample = sorted(np.random.default_rng(seed).choice(len(entries), size=min(size, len(entries)), replace=False))
+    entries = [entries[index] for index in sample]
+    images, errors = image_loading.load_images([path for path, _ in entries])
+    assert not errors, errors
+    return hog_features.extract_hog_batch(images), LabelEncoder().fit_transform([label for _, label in entries])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-baseline", action="store_true", help="do not time the plain GridSearchCV")
+    args = parser.parse_args()
+
+    features, labels = load_sample(args.images, args.seed)
+    cpu_count = os.cpu_count() or 1
+    job_counts = sorted({2 ** exponent for exponent in range(cpu_count.bit_length()) if 2 ** exponent <= cpu_count}
+                        | {cpu_count})
+    print(f"{len(labels)} images, {args.folds} folds, {cpu_count} CPUs")
+    print(f"{'n_jobs':>6} {'seconds':>8} {'speedup':>8}")
+    single = None
+    for n_jobs in job_counts:
+        start = time.perf_counter()
+        result = hyperparameter_search.search(features, labels, folds=args.folds, n_jobs=n_jobs,
+                                              random_state=args.seed)
+        seconds = time.perf_counter() - start
+        single = single or seconds
+        print(f"{n_jobs:>6} {seconds:>8.2f} {single / seconds:>8.2f}")
+    print(f"Best: {result.best_params_} ({result.best_score_:.4f})")
+
+    if not args.skip_baseline:
+        cv = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.seed)
+        grid = [dict(grid, degree=[3], coef0=[1]) for grid in hyperparameter_search.PARAM_GRID]
+        start = time.perf_counter()
+        baseline = GridSearchCV(svm.SVC(), grid, cv=cv, refit=False, n_jobs=1).fit(features, labels)
+        seconds = time.perf_counter() - start
+        best = {key: baseline.best_params_[key] for key in result.best_params_}
+        print(f"Plain GridSearchCV, 1 job: {seconds:.2f} s ({single / seconds:.2f}x the shared-Gram time), "
+              f"best {best} ({baseline.best_score_:.4f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark: throughput and tail latency of the development server versus gunicorn under concurrent load.
+
+Starts each server as its own process on --port, as it is run in practice:
+- dev: python app.py (Werkzeug's development server with the debugger and reloader),
+- gunicorn: python -m gunicorn with gunicorn.conf.py (pre-forked workers sharing the preloaded model),
+waits until /readyz answers 200 and reports how long that took. --concurrency client threads then post images of
+datapp/test to /predict over keep-alive sessions for --duration seconds after a --warmup period, and requests/sec,
+p50 and p99 latency, failed requests and the PSS of all server processes (Linux only) are reported. The prediction
+cache and batch jobs are disabled, so every request is decoded, HOG-encoded and predicted. Worker and thread
+counts follow REFLASK_WORKERS and REFLASK_THREADS.
+Usage:
+    python benchmarks/bench_serving_load.py [--servers dev,gunicorn] [--concurrency 8] [--duration 20]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import image_loading
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SERVER_COMMANDS = {"dev": [sys.executable, "app.py"], "gunicorn": [sys.executable, "-m", "gunicorn"]}
+
+
+def group_pss_mb(group):
+    """
+    Total PSS in MB of the processes in a process group, or None where /proc is unavailable.
+    """
+    total = 0
+    try:
+        pids = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # The process group is the fifth field after the parenthesized command name
+                if int(f.read().rsplit(")", 1)[1].split()[2]) != group:
+                    continue
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        except (OSError, StopIteration, ValueError):
+            continue
+    return total / 1024
+
+
+def start_server(name, port, model_path=None, timeout=120):
+    """
+    Start a server in its own process group and wait until it is ready. Returns (process, seconds to ready).
+    """
+    env = dict(os.environ, REFLASK_PORT=str(port), REFLASK_PREDICTION_CACHE="0", REFLASK_JOBS="0",
+               REFLASK_LOG_LEVEL="WARNING")
+    if model_path:
+        env["REFLASK_MODEL_PATH"] = model_path
+    started = time.perf_counter()
+    process = subprocess.Popen(SERVER_COMMANDS[name], cwd=BASE_DIR, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} server exited with status {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/readyz", timeout=1).status_code == 200:
+                return process, time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"{name} server was not ready within {timeout} s")
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(30)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def run_load(url, images, concurrency, warmup, duration):
+    """
+    Post images round-robin from concurrency threads; latencies of requests started after the warm-up are kept.
+    Returns (latencies in seconds, failed requests).
+    """
+    start = time.perf_counter()
+    measure_from, deadline = start + warmup, start + warmup + duration
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+
+    def client(offset):
+        session = requests.Session()
+        index = offset
+        while True:
+            name, data = images[index % len(images)]
+            index += concurrency
+            sent = time.perf_counter()
+            if sent >= deadline:
+                return
+            try:
+                ok = session.post(url, files={"file": (name, data)}, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - sent
+            if sent >= measure_from:
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        failures[0] += 1
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), failures[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--servers", default="dev,gunicorn", help="comma-separated servers to compare")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per server")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load before measuring")
+    parser.add_argument("--images", type=int, default=64, help="distinct images posted round-robin")
+    parser.add_argument("--port", type=int, default=5090)
+    parser.add_argument("--model", help="model artifact or pickle to serve (REFLASK_MODEL_PATH)")
+    args = parser.parse_args()
+    paths = [path for path, _ in sorted(image_loading.list_images(BASE_DIR / "datapp" / "test"))][:args.images]
+    if not paths:
+        sys.exit("No images in datapp/test.")
+    images = [(Path(path).name, Path(path).read_bytes()) for path in paths]
+    print(f"{args.concurrency} clients posting {len(images)} images to /predict for {args.duration:g} s, "
+          f"{os.cpu_count()} cores")
+    throughput = {}
+    for name in args.servers.split(","):
+        try:
+            process, ready_seconds = start_server(name, args.port, args.model)
+        except (RuntimeError, OSError) as e:
+            print(f"{name:>9}: skipped ({e})")
+            continue
+        try:
+            latencies, failures = run_load(f"http://127.0.0.1:{args.port}/predict", images, args.concurrency,
+                                           args.warmup, args.duration)
+            pss = group_pss_mb(process.pid)
+        finally:
+            stop_server(process)
+        throughput[name] = len(latencies) / args.duration
+        p50, p99 = (np.percentile(latencies, [50, 99]) * 1000) if len(latencies) else (float("nan"),) * 2
+        memory = "" if pss is None else f", {pss:.0f} MB PSS"
+        print(f"{name:>9}: {throughput[name]:7.1f} req/s, p50 {p50:7.1f} ms, p99 {p99:7.1f} ms, "
+              f"{failures} failed, ready after {ready_seconds:.1f} s{memory}")
+    if throughput.get("dev") and "gunicorn" in throughput:
+        print(f"gunicorn serves {throughput['gunicorn'] / throughput['dev']:.1f}x the requests/sec of the dev server")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: SVC.predict versus the precomputed kernel engine for batch sizes from 1 to 1024.
+
+Encodes the datapp/test images once with the production HOG extractor, then times model.predict
+and KernelSVMEngine.predict on batches of 1, 2, 4, ... 1024 feature rows (cycling the test set
+when it is smaller), and reports the largest decision value difference.
+Usage:
+    python benchmarks/bench_svm_engine.py [--model modell.pkl] [--repeat 5]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import hog_features
+import svm_engine
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATAPP_TEST_DIR = BASE_DIR / "datapp" / "test"
+BATCH_SIZES = [2 ** exponent for exponent in range(11)]
+
+
+def load_test_features():
+    """
+    HOG features of the preprocessed datapp/test images.
+    """
+    paths = sorted(path for path in DATAPP_TEST_DIR.rglob("*") if path.suffix in (".jpg", ".jpeg", ".png"))
+    images = np.stack([cv2.resize(cv2.imread(str(path), cv2.IMREAD_GRAYSCALE), hog_features.IMAGE_SIZE)
+                       for path in paths])
+    return hog_features.extract_hog_batch(images)
+
+
+def best_time(function, batch, repeat):
+    """
+    Best-of-repeat wall-clock time of one call.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(batch)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=str(BASE_DIR / "modell.pkl"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as file:
+        model = pickle.load(file)
+    engine = svm_engine.KernelSVMEngine.from_model(model)
+    features = load_test_features()
+    max_batch = max(BATCH_SIZES)
+    pool = np.resize(features, (max(max_batch, len(features)), features.shape[1]))
+    difference = np.abs(engine.decision_function(features) - model.decision_function(features)).max()
+    agreement = np.mean(engine.predict(features) == model.predict(features))
+    print(f"{len(features)} test images, {len(engine.dual_coef)} support vectors, "
+          f"max |decision difference| {difference:.2e}, label agreement {agreement:.2%}")
+    print(f"{'batch':>6} {'svc ms':>9} {'engine ms':>10} {'svc img/s':>10} {'engine img/s':>13} {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        batch = pool[:batch_size]
+        svc_seconds = best_time(model.predict, batch, args.repeat)
+        engine_seconds = best_time(engine.predict, batch, args.repeat)
+        print(f"{batch_size:>6} {svc_seconds * 1e3:>9.2f} {engine_seconds * 1e3:>10.2f} "
+              f"{batch_size / svc_seconds:>10.1f} {batch_size / engine_seconds:>13.1f} "
+              f"{svc_seconds / engine_seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
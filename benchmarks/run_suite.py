@@ -0,0 +1,262 @@
+"""
+Benchmark suite: training time, feature-extraction throughput and serving latency, written as JSON.
+
+1. Trains the production SVC (RBF, C=1, gamma=0.01) on a seeded sample of datapp/train and times
+   image loading, HOG extraction and fitting.
+2. Times HOG extraction and the full decode + HOG preprocessing on the datapp/test images.
+3. Imports app.py with that model (prediction cache and batch jobs off) and, through the Flask test
+   client, measures /predict latency percentiles and /predict_batch throughput for several batch sizes.
+Every metric is stored with its unit and whether lower or higher is better. With --baseline, metrics that
+are worse than the baseline by more than --threshold (a fraction, e.g. 0.25 for 25%) are reported and the
+suite exits with status 1.
+Usage:
+    python benchmarks/run_suite.py [--output results.json] [--baseline baseline.json] [--threshold 0.25]
+                                   [--train-images 1500] [--seed 42] [--requests 200] [--quick]
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn import svm
+from sklearn.preprocessing import LabelEncoder
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import hog_features
+import image_loading
+import preprocessing
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATAPP_TRAIN_DIR = BASE_DIR / "datapp" / "train"
+DATAPP_TEST_DIR = BASE_DIR / "datapp" / "test"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BATCH_SIZES = [1, 8, 32, 128]
+# Allowed relative slowdown before a metric counts as a regression
+DEFAULT_THRESHOLD = float(os.environ.get("REFLASK_BENCH_THRESHOLD", 0.25))
+# Tighter defaults for metrics that should not move at all with a fixed seed
+METRIC_THRESHOLDS = {"model.test_accuracy": 0.01}
+
+
+class Results:
+    """
+    Named measurements with their unit and direction, plus run metadata.
+    """
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": round(float(value), 6), "unit": unit, "better": better}
+        print(f"{name:<40} {value:>12.4f} {unit}")
+
+    def to_dict(self):
+        return {"meta": self.meta, "metrics": self.metrics}
+
+
+def run_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "git_commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "seed": args.seed, "train_images": args.train_images, "requests": args.requests,
+            "repeat": args.repeat, "batch_sizes": args.batch_sizes}
+
+
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_training(results, train_images, seed, model_path):
+    """
+    Train the production SVC on a seeded sample of datapp/train and pickle it to model_path.
+    """
+    entries = image_loading.list_images(DATAPP_TRAIN_DIR)
+    rng = np.random.default_rng(seed)
+    sample = sorted(rng.choice(len(entries), size=min(train_images, len(entries)), replace=False))
+    entries = [entries[index] for index in sample]
+
+    start = time.perf_counter()
+    images, errors = image_loading.load_images([path for path, _ in entries])
+    loaded = time.perf_counter()
+    assert not errors, errors
+    features = hog_features.extract_hog_batch(images)
+    encoded = time.perf_counter()
+    labels = LabelEncoder().fit_transform([label for _, label in entries])
+    model = svm.SVC(kernel='rbf', C=1, gamma=0.01)
+    model.fit(features, labels)
+    fitted = time.perf_counter()
+
+    results.add("train.load_seconds", loaded - start, "s")
+    results.add("train.hog_seconds", encoded - loaded, "s")
+    results.add("train.fit_seconds", fitted - encoded, "s")
+    results.add("train.total_seconds", fitted - start, "s")
+    with open(model_path, "wb") as file:
+        pickle.dump(model, file)
+    return model
+
+
+def bench_features(results, test_paths, raw_images, model, repeat):
+    """
+    HOG and full preprocessing throughput on datapp/test, plus the sample model's test accuracy.
+    """
+    images, errors = image_loading.load_images(test_paths)
+    assert not errors, errors
+    seconds = best_time(lambda: hog_features.extract_hog_batch(images), repeat)
+    results.add("features.hog_images_per_second", len(images) / seconds, "images/s", better="higher")
+    # In-thread decode + HOG, as /predict does it, independent of the worker pool size
+    seconds = best_time(lambda: preprocessing.preprocess_batch(raw_images, workers=0), repeat)
+    results.add("features.preprocess_images_per_second", len(raw_images) / seconds, "images/s", better="higher")
+
+    true_labels = LabelEncoder().fit_transform([Path(path).parent.name for path in test_paths])
+    accuracy = np.mean(model.predict(hog_features.extract_hog_batch(images)) == true_labels)
+    results.add("model.test_accuracy", accuracy, "fraction", better="higher")
+
+
+def bench_serving(results, client, test_paths, raw_images, requests, batch_sizes, repeat):
+    """
+    /predict latency percentiles and /predict_batch throughput through the Flask test client.
+    """
+    def post_single(index):
+        index %= len(raw_images)
+        data = {"file": (io.BytesIO(raw_images[index]), Path(test_paths[index]).name)}
+        response = client.post("/predict", data=data, content_type="multipart/form-data")
+        assert response.status_code == 200, response.data
+
+    for index in range(min(20, requests)):
+        post_single(index)
+    latencies = []
+    for index in range(requests):
+        start = time.perf_counter()
+        post_single(index)
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+    for percentile in (50, 90, 99):
+        results.add(f"serving.predict_p{percentile}_ms", np.percentile(latencies_ms, percentile), "ms")
+    results.add("serving.predict_mean_ms", latencies_ms.mean(), "ms")
+
+    for size in batch_sizes:
+        def post_batch():
+            data = {"files": [(io.BytesIO(raw_images[index % len(raw_images)]), f"{index}.jpg")
+                              for index in range(size)]}
+            response = client.post("/predict_batch", data=data, content_type="multipart/form-data")
+            assert response.status_code == 200, response.data
+        post_batch()
+        seconds = best_time(post_batch, repeat)
+        results.add(f"serving.batch_{size}_images_per_second", size / seconds, "images/s", better="higher")
+
+
+def compare(current, baseline, threshold, metric_thresholds=None):
+    """
+    Return [(name, baseline value, current value, relative change)] for the metrics that got worse than
+    the baseline by more than threshold (or their entry in metric_thresholds). Metrics missing from
+    either run are ignored.
+    """
+    metric_thresholds = metric_thresholds or {}
+    regressions = []
+    for name, metric in current["metrics"].items():
+        if name not in baseline["metrics"]:
+            continue
+        base = baseline["metrics"][name]["value"]
+        value = metric["value"]
+        if base == 0:
+            continue
+        change = (value - base) / base
+        allowed = metric_thresholds.get(name, threshold)
+        worse = change > allowed if metric["better"] == "lower" else change < -allowed
+        if worse:
+            regressions.append((name, base, value, change))
+    return regressions
+
+
+def report_regressions(current, baseline, threshold, metric_thresholds, baseline_name):
+    """
+    Print the metrics compare finds worse than the baseline. Returns the suite's exit status: 1 if any
+    metric regressed past its threshold, else 0.
+    """
+    regressions = compare(current, baseline, threshold, metric_thresholds)
+    for name, base, value, change in regressions:
+        print(f"REGRESSION {name}: {base:.4f} -> {value:.4f} ({change:+.1%})")
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed past their threshold against {baseline_name}.")
+        return 1
+    print(f"No metric regressed past its threshold ({threshold:.0%} by default) against {baseline_name}.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown before failing (default: REFLASK_BENCH_THRESHOLD or 0.25)")
+    parser.add_argument("--metric-threshold", action="append", default=[], metavar="NAME=FRACTION",
+                        help="threshold for one metric, e.g. serving.predict_p99_ms=0.5 (repeatable)")
+    parser.add_argument("--train-images", type=int, default=1500, help="size of the seeded training sample")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="timed /predict requests")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="small sample sizes for a smoke run")
+    args = parser.parse_args()
+    if args.quick:
+        args.train_images, args.requests, args.repeat = 300, 40, 1
+    metric_thresholds = dict(METRIC_THRESHOLDS)
+    for item in args.metric_threshold:
+        name, _, fraction = item.partition("=")
+        metric_thresholds[name] = float(fraction)
+
+    results = Results(run_metadata(args))
+    test_paths = [path for path, _ in sorted(image_loading.list_images(DATAPP_TEST_DIR))]
+    raw_images = [Path(path).read_bytes() for path in test_paths]
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_path = os.path.join(work_dir, "modell.pkl")
+        model = bench_training(results, args.train_images, args.seed, model_path)
+        bench_features(results, test_paths, raw_images, model, args.repeat)
+
+        # Serving the sample model; cached answers and background jobs would distort the timings
+        os.environ.update({"REFLASK_MODEL_PATH": model_path, "REFLASK_PREDICTION_CACHE": "0", "REFLASK_JOBS": "0",
+                           "REFLASK_LOG_LEVEL": "WARNING"})
+        import app
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        bench_serving(results, flask_app.test_client(), test_paths, raw_images, args.requests, args.batch_sizes,
+                      args.repeat)
+        preprocessing.shutdown_pool()
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results.to_dict(), f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        status = report_regressions(results.to_dict(), baseline, args.threshold, metric_thresholds, args.baseline)
+        if status:
+            sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
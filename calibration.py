@@ -0,0 +1,129 @@
+"""
+Platt scaling: calibrated probabilities from SVM decision values.
+
+An SVM's decision value ranks images but is not a probability. Platt scaling fits
+    P(classes[1] | f) = 1 / (1 + exp(A * f + B))
+to decision values f of images the model was not trained on, by maximum likelihood with Platt's smoothed targets,
+using the Newton method with backtracking of Lin, Lin and Weng (2007), as libsvm does for SVC(probability=True).
+create_model.py fits A and B on out-of-fold decision values of the training set, as libsvm does: each image is
+scored by a model trained on the other folds (the final model's own training images would be overconfident, its
+support vectors sit on the margin), which keeps the test set a clean evaluation of the calibrated probabilities.
+A and B are stored in the model's metadata, so the server turns the decision values it computes anyway into
+probabilities.
+"""
+import numpy as np
+
+
+class PlattScaling:
+    """
+    The fitted sigmoid 1 / (1 + exp(a * f + b)), giving the probability of classes[1].
+    """
+
+    def __init__(self, a, b):
+        self.a = float(a)
+        self.b = float(b)
+
+    def probability(self, decision_values):
+        """
+        The probabilities of classes[1] for an array of decision values, computed without overflow.
+        """
+        decision_values = np.asarray(decision_values, dtype=np.float64)
+        return np.exp(-np.logaddexp(0.0, self.a * decision_values + self.b))
+
+    def to_dict(self):
+        return {"method": "platt", "a": self.a, "b": self.b}
+
+    @classmethod
+    def from_dict(cls, fields):
+        """
+        The calibration stored by to_dict, or None for a missing or unknown one.
+        """
+        if not fields or fields.get("method") != "platt":
+            return None
+        return cls(fields["a"], fields["b"])
+
+
+def _negative_log_likelihood(decision_values, targets, a, b):
+    scaled = a * decision_values + b
+    return float(np.sum(np.logaddexp(0.0, scaled) - (1 - targets) * scaled))
+
+
+def out_of_fold_decision_values(make_classifier, features, labels, folds=5, random_state=0, n_jobs=None,
+                                **fit_params):
+    """
+    Decision values of every sample from a classifier fitted on the other stratified folds, what
+    cross_val_predict(method="decision_function") returns for scikit-learn estimators.
+    Parameters:
+    - make_classifier: returns a new, unfitted classifier with fit(features, labels, **fit_params) and
+      decision_function; unlike cross_val_predict this covers models scikit-learn cannot clone.
+    - n_jobs: folds fitted in parallel, as in joblib.Parallel.
+    Returns:
+    - An array of one decision value per sample.
+    Raises:
+    - ValueError if every class has fewer samples than folds.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    labels = np.asarray(labels)
+
+    def fold_decision_values(train, held_out):
+        classifier = make_classifier().fit(features[train], labels[train], **fit_params)
+        return held_out, classifier.decision_function(features[held_out])
+
+    splits = StratifiedKFold(folds, shuffle=True, random_state=random_state).split(features, labels)
+    decision_values = np.empty(len(labels), dtype=np.float64)
+    for held_out, values in Parallel(n_jobs=n_jobs)(delayed(fold_decision_values)(*split) for split in splits):
+        decision_values[held_out] = values
+    return decision_values
+
+
+def fit_platt(decision_values, positive, max_iterations=100, min_step=1e-10, sigma=1e-12, eps=1e-5):
+    """
+    Fit Platt scaling to decision values and whether each image belongs to classes[1].
+    Parameters:
+    - positive: booleans, True where the true label is classes[1].
+    - sigma: added to the Hessian's diagonal to keep it invertible.
+    - eps: the fit stops once both gradient components are below this.
+    Returns:
+    - A PlattScaling.
+    Raises:
+    - ValueError if there are no decision values.
+    """
+    decision_values = np.asarray(decision_values, dtype=np.float64).ravel()
+    positive = np.asarray(positive, dtype=bool).ravel()
+    if decision_values.size == 0:
+        raise ValueError("Cannot calibrate without decision values.")
+    prior1 = int(positive.sum())
+    prior0 = positive.size - prior1
+    # Smoothed targets instead of 0 and 1 keep the fit from diverging on separable data
+    targets = np.where(positive, (prior1 + 1.0) / (prior1 + 2.0), 1.0 / (prior0 + 2.0))
+    a, b = 0.0, float(np.log((prior0 + 1.0) / (prior1 + 1.0)))
+    value = _negative_log_likelihood(decision_values, targets, a, b)
+    for _ in range(max_iterations):
+        probabilities = np.exp(-np.logaddexp(0.0, a * decision_values + b))
+        weights = probabilities * (1 - probabilities)
+        h11 = sigma + np.dot(decision_values * decision_values, weights)
+        h22 = sigma + weights.sum()
+        h21 = np.dot(decision_values, weights)
+        residuals = targets - probabilities
+        g1 = np.dot(decision_values, residuals)
+        g2 = residuals.sum()
+        if abs(g1) < eps and abs(g2) < eps:
+            break
+        determinant = h11 * h22 - h21 * h21
+        step_a = -(h22 * g1 - h21 * g2) / determinant
+        step_b = -(-h21 * g1 + h11 * g2) / determinant
+        descent = g1 * step_a + g2 * step_b
+        step = 1.0
+        while step >= min_step:
+            new_a, new_b = a + step * step_a, b + step * step_b
+            new_value = _negative_log_likelihood(decision_values, targets, new_a, new_b)
+            if new_value < value + 1e-4 * step * descent:
+                a, b, value = new_a, new_b, new_value
+                break
+            step /= 2
+        else:
+            # No step decreases the objective any more
+            break
+    return PlattScaling(a, b)
@@ -1,13 +1,19 @@
 # %%
 import cv2
 import mlflow
-import numpy as np
 import pickle
 import os
+import approx_kernel
+import calibration
 import dbAccessFunctions
-from skimage.feature import hog
+import feature_reduction
+import feature_store
+import hyperparameter_search
+import model_artifact
+import model_registry
 from sklearn import svm
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.base import clone
+from sklearn.metrics import classification_report, accuracy_score, log_loss
 from sklearn.preprocessing import LabelEncoder
 from PIL import Image
 from pathlib import Path
@@ -22,6 +28,29 @@ current_dir = os.getcwd()
 BASE_DIR = Path(current_dir).resolve().parent / "reflask"
 DATA_DIR = BASE_DIR / "data"
 DATAPP_DIR = BASE_DIR / "datapp"
+FEATURE_STORE_DIR = BASE_DIR / "feature_store"
+# Optional compression before the SVM: none, float16, pca:<components> or pca:<components>+float16
+# (see feature_reduction.py; compare settings with benchmarks/bench_feature_reduction.py)
+FEATURE_REDUCTION = feature_reduction.FeatureReduction.parse(os.environ.get("REFLASK_FEATURE_REDUCTION", "none"))
+# Model to train: the exact "rbf-svc", or an approximate kernel with a linear SVM, "nystroem-linear" or "rff-linear",
+# whose prediction cost does not grow with the training set (see approx_kernel.py)
+MODEL_TYPE = os.environ.get("REFLASK_MODEL_TYPE") or model_artifact.DEFAULT_MODEL_TYPE
+APPROX_COMPONENTS = int(os.environ.get("REFLASK_APPROX_COMPONENTS", 1000))
+APPROX_EPOCHS = int(os.environ.get("REFLASK_APPROX_EPOCHS", 10))
+# Earlier approximate model version to continue with partial_fit instead of training from scratch
+APPROX_RESUME = os.environ.get("REFLASK_APPROX_RESUME")
+# Hyperparameter search instead of the fixed C=1, gamma=0.01: "grid" or "halving" (see hyperparameter_search.py)
+SEARCH = os.environ.get("REFLASK_SEARCH")
+SEARCH_FOLDS = int(os.environ.get("REFLASK_SEARCH_FOLDS", 3))
+SEARCH_JOBS = int(os.environ.get("REFLASK_SEARCH_JOBS", -1))
+# Folds of the training set whose out-of-fold decision values Platt scaling is fitted on (see calibration.py)
+CALIBRATION_FOLDS = int(os.environ.get("REFLASK_CALIBRATION_FOLDS", 5))
+if MODEL_TYPE != model_artifact.DEFAULT_MODEL_TYPE and MODEL_TYPE not in approx_kernel.METHODS:
+    raise ValueError(f"Unknown REFLASK_MODEL_TYPE {MODEL_TYPE!r}.")
+if SEARCH and MODEL_TYPE != model_artifact.DEFAULT_MODEL_TYPE:
+    raise ValueError("REFLASK_SEARCH tunes the exact SVC; unset REFLASK_MODEL_TYPE to use it.")
+if APPROX_RESUME and FEATURE_REDUCTION.n_components:
+    raise ValueError("REFLASK_APPROX_RESUME cannot be combined with a PCA reduction, which is refitted on every run.")
 
 
 # %%
@@ -80,41 +109,12 @@ def preprocess_images(input_directory, output_directory):
 # preprocess_images(DATA_DIR / "train" / "rejected", DATAPP_DIR / "train" / "rejected")
 
 
-# %%
-def load_images_and_labels(directory_path):
-    """
-    Load images and their labels from a directory structure, recursively handling subdirectories.
-    """
-    data = []
-    labels = []
-    for rootdir, _, anyfiles in os.walk(directory_path):
-        request_label = os.path.basename(rootdir)
-        for file in anyfiles:
-            if file.endswith(('png', 'jpg', 'jpeg')):
-                current_file_path = os.path.join(rootdir, file)
-                try:
-                    image = cv2.imread(current_file_path, cv2.IMREAD_GRAYSCALE)
-                    if image is None:
-                        print(f"Could not read image: {current_file_path}")
-                        continue
-                    if image.shape != (300, 300):  # Resizing if not 300x300
-                        image = cv2.resize(image, (300, 300))
-                    data.append(image)
-                    labels.append(request_label)
-                except Exception as error:
-                    print(f"Error loading image {current_file_path}: {error}")
-    data = np.array(data)
-    labels = np.array(labels)
-    return data, labels
-
-
 # %%
 TEST_DIR = DATAPP_DIR / "test"
-train_data, train_labels = load_images_and_labels(DATAPP_DIR / "train")
-test_data, test_labels = load_images_and_labels(TEST_DIR)
 
 
 # %%
+image_metadata = []
 for root, dirs, files in os.walk(DATAPP_DIR):
     if "approved" in root.lower():
         label = "approved"
@@ -124,30 +124,20 @@ for root, dirs, files in os.walk(DATAPP_DIR):
         continue
     for file_name in files:
         if file_name.endswith((".jpg", ".png", ".jpeg")):
-            file_path = os.path.join(root, file_name)
-            print(f"Inserting {file_path} with label {label}")
-            try:
-                dbAccessFunctions.insert_image_metadata(dbAccessFunctions.db_configuration, file_path, label)
-            except Exception as e:
-                print(f"Error inserting into database: {e}")
+            image_metadata.append((os.path.join(root, file_name), label))
+# One INSERT IGNORE batch; paths already in the images table are skipped by its unique index
+print(f"Inserting metadata of {len(image_metadata)} images")
+dbAccessFunctions.batch_insert_image_metadata(dbAccessFunctions.db_configuration, image_metadata)
 
 
 # %%
-def extract_features(images):
-    """
-    Extract HOG features from a list of images.
-    """
-    features = []
-    for image in images:
-        hog_features, _ = hog(image, orientations=8, pixels_per_cell=(16, 16),
-                              cells_per_block=(1, 1), visualize=True)
-        features.append(hog_features)
-    return np.array(features)
-
-
-# Extracting features from train and test datasets
-train_features = extract_features(train_data)
-test_features = extract_features(test_data)
+# Loading HOG features and labels from the on-disk feature store (memory-mapped);
+# only images that are new or changed since the last run are read and encoded
+train_store = feature_store.FeatureStore(FEATURE_STORE_DIR / "train")
+train_features, train_labels = train_store.sync(DATAPP_DIR / "train")
+test_store = feature_store.FeatureStore(FEATURE_STORE_DIR / "test")
+test_features, test_labels = test_store.sync(TEST_DIR)
+print(f"Feature store: train {train_store.last_sync}, test {test_store.last_sync}")
 
 # %%
 label_encoder = LabelEncoder()
@@ -155,26 +145,99 @@ train_labels_encoded = label_encoder.fit_transform(train_labels)
 test_labels_encoded = label_encoder.transform(test_labels)
 
 # %%
-clf = svm.SVC(kernel='rbf', C=1, gamma=0.01)
-clf.fit(train_features, train_labels_encoded)
+# The projection is fitted on the training features only and stored with the model
+projection = FEATURE_REDUCTION.fit(train_features)
+if projection is not None:
+    print(f"Feature reduction {FEATURE_REDUCTION}: {projection.n_features} -> {projection.n_components} features, "
+          f"{projection.explained_variance_ratio:.1%} of the variance kept")
+    train_features = projection.transform(train_features)
+    test_features = projection.transform(test_features)
+
+# %%
+if SEARCH:
+    # Every candidate becomes an MLflow child run, not only autolog's default of the best five
+    mlflow.sklearn.autolog(max_tuning_runs=None, log_models=False)
+    # Only RBF models can be stored with a projection, so a reduced search covers the RBF candidates alone
+    search_grid = [grid for grid in hyperparameter_search.PARAM_GRID if projection is None or grid["kernel"] == ["rbf"]]
+    search_result = hyperparameter_search.search(train_features, train_labels_encoded, param_grid=search_grid,
+                                                 method=SEARCH, folds=SEARCH_FOLDS, n_jobs=SEARCH_JOBS)
+    print("\n".join(hyperparameter_search.summarize(search_result)))
+    print(f"Best parameters: {search_result.best_params_} (cross-validated accuracy {search_result.best_score_:.4f})")
+
+# %%
+if MODEL_TYPE == model_artifact.DEFAULT_MODEL_TYPE:
+    if SEARCH:
+        clf = hyperparameter_search.best_estimator(search_result.best_params_)
+    else:
+        clf = svm.SVC(kernel='rbf', C=1, gamma=0.01)
+    clf.fit(train_features, train_labels_encoded)
+else:
+    if APPROX_RESUME:
+        # The feature map is kept and the linear SVM continues from its weights, so images added since that
+        # version are learnt incrementally
+        clf = approx_kernel.load_training_state(APPROX_RESUME)
+        print(f"Continuing {APPROX_RESUME} ({clf.n_seen} samples seen so far)")
+    else:
+        clf = approx_kernel.ApproxKernelClassifier(approx_kernel.METHODS[MODEL_TYPE], APPROX_COMPONENTS, gamma=0.01)
+    clf.fit(train_features, train_labels_encoded, epochs=APPROX_EPOCHS)
 # Predicting on test set
 predictions = clf.predict(test_features)
 # Evaluating model
 print(classification_report(test_labels_encoded, predictions))
 print(f"Accuracy: {accuracy_score(test_labels_encoded, predictions)}")
+# Platt scaling for /predict_batch?scores=probability, fitted on out-of-fold decision values of the training set,
+# so the test set stays a clean evaluation of the calibrated probabilities too
+if MODEL_TYPE == model_artifact.DEFAULT_MODEL_TYPE:
+    make_classifier, fit_params = (lambda: clone(clf)), {}
+else:
+    # A resumed model is calibrated with fresh models of the same settings, trained on this run's images only
+    make_classifier = lambda: approx_kernel.ApproxKernelClassifier(clf.method, clf.n_components, gamma=clf.gamma,
+                                                                   alpha=clf.linear.alpha,
+                                                                   random_state=clf.random_state)
+    fit_params = {"epochs": APPROX_EPOCHS}
+calibration_scores = calibration.out_of_fold_decision_values(make_classifier, train_features, train_labels_encoded,
+                                                             folds=CALIBRATION_FOLDS, n_jobs=SEARCH_JOBS,
+                                                             **fit_params)
+model_calibration = calibration.fit_platt(calibration_scores, train_labels_encoded == 1)
+calibration_log_loss = log_loss(test_labels_encoded,
+                                model_calibration.probability(clf.decision_function(test_features)), labels=[0, 1])
+print(f"Calibration: P(rejected) = 1 / (1 + exp({model_calibration.a:.4f} * score + {model_calibration.b:.4f})), "
+      f"test log loss {calibration_log_loss:.4f}")
 
 # %%
 # Now we can check results with the command mlflow ui from a CLI, then visiting localhost:5000
 # Tested. Worked well.
 
 # %% Storing test classification in db
-file_paths_test = [str(file) for file in TEST_DIR.rglob('*') if file.is_file()]
+# Paths in the same order as the test features and predictions
+file_paths_test = test_store.paths
 dbAccessFunctions.store_results_to_db(dbAccessFunctions.db_configuration,
                                       predictions,
                                       test_labels_encoded,
                                       file_paths_test)
 
 # %%
-# Packaging
-with open('modell.pkl', 'wb') as file:
-    pickle.dump(clf, file)
+# Packaging: a new version of the served artifact (memory-mapped arrays plus manifest, see model_artifact.py);
+# a running app picks it up from the models directory and swaps it in without a restart
+model_version_dir = Path(model_registry.MODELS_DIR) / model_registry.new_version_name()
+model_metadata = {"test_accuracy": float(accuracy_score(test_labels_encoded, predictions)),
+                  "train_images": int(len(train_labels)), "calibration": model_calibration.to_dict(),
+                  "calibration_test_log_loss": float(calibration_log_loss)}
+if SEARCH:
+    model_metadata["search"] = search_result.best_params_
+if getattr(clf, "kernel", "rbf") == "rbf":
+    model_artifact.export_model(clf, model_version_dir, label_names=label_encoder.classes_.tolist(),
+                                metadata=model_metadata, projection=projection,
+                                storage_dtype=FEATURE_REDUCTION.storage_dtype)
+    print(f"Model version written to {model_version_dir}")
+else:
+    # The artifact engines evaluate RBF kernels only; app.py serves other kernels from the pickle with model.predict
+    print(f"The best model has a {clf.kernel} kernel; it is written to modell.pkl only "
+          f"(serve it with REFLASK_MODEL_PATH=modell.pkl)")
+if isinstance(clf, approx_kernel.ApproxKernelClassifier):
+    approx_kernel.save_training_state(clf, model_version_dir)
+# The pickle is kept for sklearn-based tooling such as the benchmarks; it has no place for a projection or an
+# approximate model, so those are only written as artifacts
+if projection is None and MODEL_TYPE == model_artifact.DEFAULT_MODEL_TYPE:
+    with open('modell.pkl', 'wb') as file:
+        pickle.dump(clf, file)
@@ -1,20 +1,28 @@
 import os
+import threading
 import mysql.connector
+import mysql.connector.pooling
 import tkinter as tk
 from tkinter import ttk
 
+# Connection pools by configuration, created on first use
+_pools = {}
+_pools_lock = threading.Lock()
+
 
 def batch_insert_image_metadata(db_configur, image_data):
     """
-    Insert multiple rows into the database in one operation.
+    Insert multiple rows into the database in one operation, skipping file paths that already exist.
     """
+    connection = None
     try:
-        connection = mysql.connector.connect(**db_configur)
+        connection = get_db_connection(**db_configur)
         cursor = connection.cursor()
-        query = "INSERT INTO images (file_path, label) VALUES (%s, %s)"
+        # The unique index on file_path turns duplicates into no-ops (see db_schema.py)
+        query = "INSERT IGNORE INTO images (file_path, label) VALUES (%s, %s)"
         cursor.executemany(query, image_data)
         connection.commit()
-        print(f"Successfully inserted {len(image_data)} rows.")
+        print(f"Successfully inserted {cursor.rowcount} of {len(image_data)} rows.")
     except mysql.connector.Error as err:
         print(f"MySQL Error: {err}")
     except Exception as e:
@@ -24,8 +32,43 @@ def batch_insert_image_metadata(db_configur, image_data):
             connection.close()
 
 
+def claim_files(db_k, file_names, worker_id, lease_seconds):
+    """
+    Claim the files that are neither processed nor claimed by another worker, for lease_seconds.
+    The claim is one INSERT ... ON DUPLICATE KEY UPDATE, so concurrent workers never claim the same file; a
+    claim whose lease expired (its worker died) can be taken over. save_processed_files ends a claim.
+    Returns:
+    - The names now claimed by worker_id, in input order.
+    """
+    file_names = list(file_names)
+    if not file_names:
+        return []
+    connection = get_db_connection(**db_k)
+    try:
+        cursor = connection.cursor()
+        # Assignments run left to right: claimed_until is only extended when claimed_by is (now) this worker
+        cursor.executemany(
+            "INSERT INTO predicted_images (file_name, claimed_by, claimed_until) "
+            "VALUES (%s, %s, NOW() + INTERVAL %s SECOND) "
+            "ON DUPLICATE KEY UPDATE "
+            "claimed_by = IF(prediction_date IS NULL AND (claimed_until IS NULL OR claimed_until < NOW()), "
+            "VALUES(claimed_by), claimed_by), "
+            "claimed_until = IF(claimed_by = VALUES(claimed_by), VALUES(claimed_until), claimed_until)",
+            [(file_name, worker_id, int(lease_seconds)) for file_name in file_names]
+        )
+        connection.commit()
+        placeholders = ", ".join(["%s"] * len(file_names))
+        cursor.execute(f"SELECT file_name FROM predicted_images WHERE file_name IN ({placeholders}) "
+                       f"AND claimed_by = %s AND prediction_date IS NULL", file_names + [worker_id])
+        claimed = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+    finally:
+        connection.close()
+    return [file_name for file_name in file_names if file_name in claimed]
+
+
 def create_database(db_konphig, db_name):
-    my_db = mysql.connector.connect(**db_konphig)
+    my_db = get_db_connection(**db_konphig)
     my_cursor = my_db.cursor()
     create_db_query = "CREATE DATABASE IF NOT EXISTS {}".format(db_name)
     my_cursor.execute(create_db_query)
@@ -37,12 +80,13 @@ db_configuration = {
     "user": os.environ.get("MyDB_USER", "root"),
     "password": os.environ.get("MyDB_PASSWORD", ""),
     "database": "reflask",
-    "use_pure": "True"
+    # Number of pooled connections kept open per configuration
+    "pool_size": int(os.environ.get("MyDB_POOL_SIZE", 5)),
 }
 
 
 def drop_database(db_konph, db_name):
-    my_db = mysql.connector.connect(**db_konph)
+    my_db = get_db_connection(**db_konph)
     my_cursor = my_db.cursor()
     drop_db_query = "DROP DATABASE {}".format(db_name)
     my_cursor.execute(drop_db_query)
@@ -52,35 +96,82 @@ def drop_database(db_konph, db_name):
 def fetch_processed_files(db_kon):
     connection = get_db_connection(**db_kon)
     cursor = connection.cursor()
-    cursor.execute("SELECT file_name FROM predicted_images")
+    # Rows without a prediction date are only claimed (see claim_files)
+    cursor.execute("SELECT file_name FROM predicted_images WHERE prediction_date IS NOT NULL")
     processed_files = {row[0] for row in cursor.fetchall()}
     cursor.close()
     connection.close()
     return processed_files
 
 
+def fetch_unprocessed_files(db_kon, candidate_names, batch_size=500):
+    """
+    Return the candidate file names that are not in predicted_images yet, in candidate order.
+    Candidates are looked up in batches through the unique file_name index, so the cost depends on
+    the number of candidates rather than on the size of the processing history. Claimed files that
+    have no prediction yet count as unprocessed.
+    """
+    candidate_names = list(candidate_names)
+    if not candidate_names:
+        return []
+    processed = set()
+    connection = get_db_connection(**db_kon)
+    try:
+        cursor = connection.cursor()
+        for start in range(0, len(candidate_names), batch_size):
+            batch = candidate_names[start:start + batch_size]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"SELECT file_name FROM predicted_images WHERE file_name IN ({placeholders}) "
+                           f"AND prediction_date IS NOT NULL", batch)
+            processed.update(row[0] for row in cursor.fetchall())
+        cursor.close()
+    finally:
+        connection.close()
+    return [name for name in candidate_names if name not in processed]
+
+
 def get_db_connection(**db_konf):
-    return mysql.connector.connect(**db_konf)
+    """
+    Take a connection from the pool of this configuration; close() hands it back to the pool.
+    Falls back to a direct connection when every pooled connection is in use.
+    """
+    try:
+        return get_pool(**db_konf).get_connection()
+    except mysql.connector.errors.PoolError:
+        db_konf = {key: value for key, value in db_konf.items() if key != "pool_size"}
+        return mysql.connector.connect(**db_konf)
+
+
+def get_pool(**db_konf):
+    """
+    Return the module-level connection pool for a configuration, creating it on first use.
+    The pool size is read from the configuration's pool_size entry (defaults to 5).
+    """
+    key = tuple(sorted((name, str(value)) for name, value in db_konf.items()))
+    with _pools_lock:
+        if key not in _pools:
+            db_konf = dict(db_konf)
+            pool_size = int(db_konf.pop("pool_size", 5))
+            _pools[key] = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name=f"reflask_{len(_pools)}", pool_size=pool_size, **db_konf)
+        return _pools[key]
 
 
 def insert_image_metadata(db_konf_iim, file_path, label):
     """
     Insert metadata for an image into the MySQL database only if it does not already exist.
     """
+    connection = None
     try:
-        connection = mysql.connector.connect(**db_konf_iim)
+        connection = get_db_connection(**db_konf_iim)
         cursor = connection.cursor()
-        # Checking if the file_path already exists
-        check_query = "SELECT COUNT(*) FROM images WHERE file_path = %s"
-        cursor.execute(check_query, (file_path,))
-        result = cursor.fetchone()
-        if result[0] > 0:
+        # The unique index on file_path makes the server skip existing rows, no pre-check needed
+        insert_query = "INSERT IGNORE INTO images (file_path, label) VALUES (%s, %s)"
+        cursor.execute(insert_query, (file_path, label))
+        connection.commit()
+        if cursor.rowcount == 0:
             print(f"File {file_path} already exists in the database. Skipping insertion.")
         else:
-            # Insert the new image metadata
-            insert_query = "INSERT INTO images (file_path, label) VALUES (%s, %s)"
-            cursor.execute(insert_query, (file_path, label))
-            connection.commit()
             print(f"Successfully inserted {file_path} with label {label}.")
     except mysql.connector.Error as err:
         print(f"MySQL Error: {err}")
@@ -92,7 +183,7 @@ def insert_image_metadata(db_konf_iim, file_path, label):
 
 
 def print_table_data(db_conf_ptd, table_name):
-    my_db = mysql.connector.connect(**db_conf_ptd)
+    my_db = get_db_connection(**db_conf_ptd)
     my_cursor = my_db.cursor()
     query = "SELECT * FROM {}".format(table_name)
     my_cursor.execute(query)
@@ -104,20 +195,53 @@ def print_table_data(db_conf_ptd, table_name):
     my_db.close()
 
 
+def release_claims(db_k, file_names, worker_id):
+    """
+    Give up worker_id's claims on files it could not process, so another worker can take them at once.
+    """
+    file_names = list(file_names)
+    if not file_names:
+        return
+    connection = get_db_connection(**db_k)
+    try:
+        cursor = connection.cursor()
+        placeholders = ", ".join(["%s"] * len(file_names))
+        cursor.execute(f"UPDATE predicted_images SET claimed_by = NULL, claimed_until = NULL "
+                       f"WHERE file_name IN ({placeholders}) AND claimed_by = %s AND prediction_date IS NULL",
+                       file_names + [worker_id])
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+
 def save_processed_file(db_k, file_name):
+    save_processed_files(db_k, [file_name])
+
+
+def save_processed_files(db_k, file_names):
+    """
+    Record several processed files with one multi-row INSERT and a single commit, ending their claims.
+    """
+    if not file_names:
+        return
     connection = get_db_connection(**db_k)
-    cursor = connection.cursor()
-    cursor.execute(
-        "INSERT INTO predicted_images (file_name, prediction_date) VALUES (%s, NOW())",
-        (file_name,)
-    )
-    connection.commit()
-    cursor.close()
-    connection.close()
+    try:
+        cursor = connection.cursor()
+        # Re-processed files only get a new prediction date
+        cursor.executemany(
+            "INSERT INTO predicted_images (file_name, prediction_date) VALUES (%s, NOW()) "
+            "ON DUPLICATE KEY UPDATE prediction_date = NOW(), claimed_by = NULL, claimed_until = NULL",
+            [(file_name,) for file_name in file_names]
+        )
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
 
 
 def show_table_data(db_conf_std, table_name):
-    my_db = mysql.connector.connect(**db_conf_std)
+    my_db = get_db_connection(**db_conf_std)
     my_cursor = my_db.cursor()
     query = "SELECT * FROM {}".format(table_name)
     my_cursor.execute(query)
@@ -142,32 +266,36 @@ def store_results_to_db(db_config, predictions, test_labels, file_paths):
     """
     Store classification results into the database.
     """
+    connection = None
     try:
-        connection = mysql.connector.connect(**db_config)
-        cursor = connection.cursor()
         # Validating input lengths
         if len(file_paths) != len(predictions) or len(file_paths) != len(test_labels):
             raise ValueError("Mismatch in lengths of file_paths, predictions, and test_labels.")
-        for file_path, prediction, true_label in zip(file_paths, predictions, test_labels):
-            insert_query = """
-                INSERT INTO classification_results (file_path, predicted_label, true_label)
-                VALUES (%s, %s, %s)
-                """
-            cursor.execute(insert_query, (file_path, int(prediction), int(true_label)))
-            print(f"Inserted: {file_path}, Predicted: {prediction}, True: {true_label}")  # Debug log
+        connection = get_db_connection(**db_config)
+        cursor = connection.cursor()
+        insert_query = """
+            INSERT INTO classification_results (file_path, predicted_label, true_label)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE predicted_label = VALUES(predicted_label), true_label = VALUES(true_label)
+            """
+        # One multi-row INSERT and one commit for the whole batch
+        cursor.executemany(insert_query, [(file_path, int(prediction), int(true_label))
+                                          for file_path, prediction, true_label
+                                          in zip(file_paths, predictions, test_labels)])
         connection.commit()
+        cursor.close()
         print(f"Successfully stored {len(predictions)} results.")
     except Exception as db_error:
         print(f"Error storing results to database: {db_error}")
     finally:
-        if connection.is_connected():
-            cursor.close()
+        if connection:
             connection.close()
 
 
 def update_image_processed_status(db_conf_uips, image_id, processed=True):
+    connection = None
     try:
-        connection = mysql.connector.connect(**db_conf_uips)
+        connection = get_db_connection(**db_conf_uips)
         cursor = connection.cursor()
         query = "UPDATE images SET processed = %s WHERE id = %s"
         cursor.execute(query, (processed, image_id))
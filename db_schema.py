@@ -0,0 +1,135 @@
+"""
+Schema management for the Reflask MySQL database.
+
+Creates the images, predicted_images and classification_results tables with unique indexes on the
+file columns, so duplicate checks are index lookups done by the server (INSERT IGNORE /
+INSERT ... ON DUPLICATE KEY UPDATE) instead of COUNT(*) pre-checks or full-table scans.
+predicted_images also holds the claims of sharded batch workers (claimed_by, claimed_until);
+a row without a prediction_date is claimed but not processed yet.
+Run it once per database (safe to repeat):
+    python db_schema.py
+"""
+import mysql.connector
+
+import dbAccessFunctions
+
+TABLES = {
+    "images": """
+        CREATE TABLE IF NOT EXISTS images (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            file_path VARCHAR(255) NOT NULL,
+            label VARCHAR(32),
+            processed BOOLEAN NOT NULL DEFAULT FALSE,
+            UNIQUE KEY uq_images_file_path (file_path)
+        )
+        """,
+    "predicted_images": """
+        CREATE TABLE IF NOT EXISTS predicted_images (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            file_name VARCHAR(255) NOT NULL,
+            prediction_date DATETIME,
+            claimed_by VARCHAR(64),
+            claimed_until DATETIME,
+            UNIQUE KEY uq_predicted_images_file_name (file_name)
+        )
+        """,
+    "classification_results": """
+        CREATE TABLE IF NOT EXISTS classification_results (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            file_path VARCHAR(255) NOT NULL,
+            predicted_label INT,
+            true_label INT,
+            UNIQUE KEY uq_classification_results_file_path (file_path)
+        )
+        """,
+}
+
+# Unique indexes that tables created before this module may be missing, as (table, index, column)
+UNIQUE_INDEXES = [
+    ("images", "uq_images_file_path", "file_path"),
+    ("predicted_images", "uq_predicted_images_file_name", "file_name"),
+    ("classification_results", "uq_classification_results_file_path", "file_path"),
+]
+
+# Columns that tables created before this module may be missing, as (table, column, definition)
+ADDED_COLUMNS = [
+    ("predicted_images", "claimed_by", "VARCHAR(64)"),
+    ("predicted_images", "claimed_until", "DATETIME"),
+]
+
+
+def create_tables(db_konf):
+    """
+    Create the tables that do not exist yet.
+    """
+    connection = dbAccessFunctions.get_db_connection(**db_konf)
+    try:
+        cursor = connection.cursor()
+        for table_name, create_query in TABLES.items():
+            cursor.execute(create_query)
+            print(f"Table {table_name} is in place.")
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def ensure_unique_indexes(db_konf):
+    """
+    Add the unique indexes to existing tables that lack them.
+    Adding an index fails if the table already holds duplicates; those rows have to be cleaned up first.
+    """
+    connection = dbAccessFunctions.get_db_connection(**db_konf)
+    try:
+        cursor = connection.cursor()
+        for table_name, index_name, column in UNIQUE_INDEXES:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+                (table_name, index_name)
+            )
+            if cursor.fetchone()[0]:
+                continue
+            try:
+                cursor.execute(f"ALTER TABLE {table_name} ADD UNIQUE INDEX {index_name} ({column})")
+                print(f"Added unique index {index_name} on {table_name}.{column}.")
+            except mysql.connector.Error as err:
+                print(f"Could not add unique index {index_name} (duplicate {column} values?): {err}")
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def ensure_columns(db_konf):
+    """
+    Add the columns of ADDED_COLUMNS to existing tables that lack them.
+    """
+    connection = dbAccessFunctions.get_db_connection(**db_konf)
+    try:
+        cursor = connection.cursor()
+        for table_name, column, definition in ADDED_COLUMNS:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+                (table_name, column)
+            )
+            if cursor.fetchone()[0]:
+                continue
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {definition}")
+            print(f"Added column {table_name}.{column}.")
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def ensure_schema(db_konf):
+    """
+    Create missing tables, columns and indexes.
+    """
+    create_tables(db_konf)
+    ensure_columns(db_konf)
+    ensure_unique_indexes(db_konf)
+
+
+if __name__ == "__main__":
+    ensure_schema(dbAccessFunctions.db_configuration)
@@ -0,0 +1,287 @@
+"""
+Detects newly completed files in a directory, for the watch mode of batch_predict.py.
+
+On Linux the directory is watched through inotify (via ctypes, no extra package): IN_CLOSE_WRITE reports a file
+whose writer closed it and IN_MOVED_TO a file renamed into place, so a file is never picked up half-written and
+the directory is not listed again. Elsewhere, or with use_inotify=False (e.g. network shares, where inotify sees
+nothing), the directory is scanned every poll interval and a file counts as complete once its size and mtime are
+unchanged between two scans, or at once when its last write is a poll interval old. Either way the names returned
+are filtered by a Checkpoint, a small JSON file with the files processed recently, and the time the newest of them
+arrived (the later of mtime and ctime, which a rename or copy also sets). A file that arrived more than
+window_seconds before that time is history, so a restart neither re-sends nor looks up old files; the watcher only
+scans once at start-up to catch files that arrived while it was down.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# Seconds between directory scans when polling
+POLL_INTERVAL = float(os.environ.get("REFLASK_WATCH_POLL_INTERVAL", 2))
+# Files arriving up to this many seconds before the newest processed one are still checked by name
+CHECKPOINT_WINDOW = float(os.environ.get("REFLASK_WATCH_CHECKPOINT_WINDOW", 3600))
+# Longest wait of iter_batches before it hands control back to its consumer
+IDLE_TICK = 0.1
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+# A completed file and when it arrived (nanoseconds since the epoch)
+Arrival = namedtuple("Arrival", ["name", "time_ns"])
+
+
+def arrival_time_ns(stat_result):
+    """
+    When a file arrived: its last write, or its rename or copy into the directory if that came later.
+    """
+    return max(stat_result.st_mtime_ns, stat_result.st_ctime_ns)
+
+
+class Checkpoint:
+    """
+    The files processed recently and the arrival time of the newest one, saved atomically as JSON.
+    """
+
+    def __init__(self, path, window_seconds=CHECKPOINT_WINDOW):
+        self.path = Path(path)
+        self.window_ns = int(window_seconds * 1e9)
+        self.watermark_ns = None
+        self.recent = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                state = json.load(f)
+            self.watermark_ns = state["watermark_ns"]
+            self.recent = state["recent"]
+
+    def is_new(self, name, time_ns):
+        """
+        Whether a file that arrived at time_ns still has to be processed.
+        """
+        if name in self.recent:
+            return False
+        return self.watermark_ns is None or time_ns > self.watermark_ns - self.window_ns
+
+    def record(self, arrivals):
+        """
+        Record processed files ({name: arrival time_ns}) and save; names older than the window are dropped.
+        """
+        if not arrivals:
+            return
+        self.recent.update(arrivals)
+        self.watermark_ns = max(self.watermark_ns or 0, max(arrivals.values()))
+        horizon = self.watermark_ns - self.window_ns
+        self.recent = {name: time_ns for name, time_ns in self.recent.items() if time_ns > horizon}
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "w") as f:
+            json.dump({"watermark_ns": self.watermark_ns, "recent": self.recent}, f)
+        os.replace(temporary_path, self.path)
+
+
+class _Inotify:
+    """
+    A non-blocking inotify descriptor watching one directory for completed and moved-in files.
+    """
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    @classmethod
+    def open(cls, folder):
+        """
+        The watch for folder, or None where inotify is not available.
+        """
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            return cls(folder)
+        except (OSError, AttributeError):
+            return None
+
+    def read(self, timeout):
+        """
+        Wait up to timeout seconds for events; returns (file names, whether the event queue overflowed).
+        """
+        names = []
+        overflowed = False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return names, overflowed
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names, overflowed
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            overflowed = overflowed or bool(mask & IN_Q_OVERFLOW)
+            if name:
+                names.append(os.fsdecode(name))
+        return names, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """
+    Returns the files of a folder that were completed since the last call and are new to the checkpoint.
+    A returned name is not returned again until release() (after a failure, to retry it) or until it is in the
+    checkpoint; call done() once it is recorded there.
+    Parameters:
+    - extensions: suffixes of the files to watch, e.g. (".jpg", ".png").
+    - use_inotify: watch through inotify where available; False always polls.
+    """
+
+    def __init__(self, folder, checkpoint, extensions, poll_interval=POLL_INTERVAL, use_inotify=True):
+        self.folder = Path(folder)
+        self.checkpoint = checkpoint
+        self.extensions = tuple(extensions)
+        self.poll_interval = poll_interval
+        self.inotify = _Inotify.open(self.folder) if use_inotify else None
+        self.mode = "inotify" if self.inotify is not None else "poll"
+        # Names returned and not yet done or released
+        self._returned = set()
+        # (size, mtime_ns) of files seen by the last scan that may still be being written
+        self._unsettled = {}
+        self._scan_needed = True
+        self._last_scan = None
+
+    def _arrival(self, name):
+        """
+        The Arrival of name if it is a new file to process, else None.
+        """
+        if not name.endswith(self.extensions) or name in self._returned:
+            return None
+        try:
+            stat_result = os.stat(self.folder / name)
+        except FileNotFoundError:
+            return None
+        time_ns = arrival_time_ns(stat_result)
+        return Arrival(name, time_ns) if self.checkpoint.is_new(name, time_ns) else None
+
+    def _scan(self):
+        """
+        List the folder; a new file is complete when it is unchanged since the previous scan or was last
+        written a poll interval ago.
+        """
+        self._last_scan = time.monotonic()
+        settled_ns = time.time_ns() - int(self.poll_interval * 1e9)
+        completed = []
+        unsettled = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.extensions) or entry.name in self._returned:
+                    continue
+                try:
+                    stat_result = entry.stat()
+                except FileNotFoundError:
+                    continue
+                time_ns = arrival_time_ns(stat_result)
+                if not entry.is_file() or not self.checkpoint.is_new(entry.name, time_ns):
+                    continue
+                state = (stat_result.st_size, stat_result.st_mtime_ns)
+                if self._unsettled.get(entry.name) == state or stat_result.st_mtime_ns < settled_ns:
+                    completed.append(Arrival(entry.name, time_ns))
+                else:
+                    unsettled[entry.name] = state
+        self._unsettled = unsettled
+        # With inotify, scanning continues only until the files found at start-up or after a retry are complete
+        self._scan_needed = self.inotify is None or bool(unsettled)
+        return completed
+
+    def poll(self, timeout):
+        """
+        Wait up to timeout seconds for completed files.
+        Returns:
+        - A list of Arrival tuples, possibly empty.
+        """
+        completed = []
+        if self.inotify is not None:
+            # While a scan is pending, wake up in time for it
+            wait = min(timeout, self.poll_interval) if self._scan_needed else timeout
+            names, overflowed = self.inotify.read(wait)
+            for name in dict.fromkeys(names):
+                arrival = self._arrival(name)
+                if arrival is not None:
+                    completed.append(arrival)
+                    self._returned.add(name)
+            # Events were lost; a scan finds the files they were about
+            self._scan_needed = self._scan_needed or overflowed
+        elif self._last_scan is not None:
+            time.sleep(max(0.0, min(timeout, self._last_scan + self.poll_interval - time.monotonic())))
+        if self._scan_needed and (self._last_scan is None
+                                  or time.monotonic() - self._last_scan >= self.poll_interval):
+            for arrival in self._scan():
+                completed.append(arrival)
+                self._returned.add(arrival.name)
+        return completed
+
+    def done(self, names):
+        """
+        Forget names that are now in the checkpoint.
+        """
+        self._returned.difference_update(names)
+
+    def release(self, names):
+        """
+        Make names eligible again, e.g. after they failed; they are picked up by the next scan.
+        """
+        self._returned.difference_update(names)
+        self._scan_needed = True
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+def iter_batches(watcher, batch_size, max_wait, stop=None):
+    """
+    Group the files the watcher reports into batches of at most batch_size Arrivals, sent when full or when the
+    oldest has waited max_wait seconds. An empty list is yielded whenever no batch is ready, at least every
+    IDLE_TICK seconds, so the consumer can save finished work while the folder is idle.
+    Parameters:
+    - stop: a threading.Event ending the iteration (after the files already pending are yielded).
+    """
+    pending = []
+    first_pending = None
+    while True:
+        stopping = stop is not None and stop.is_set()
+        if not stopping:
+            timeout = IDLE_TICK
+            if pending:
+                timeout = max(0.0, min(timeout, first_pending + max_wait - time.monotonic()))
+            arrivals = watcher.poll(timeout)
+            if arrivals and not pending:
+                first_pending = time.monotonic()
+            pending.extend(arrivals)
+        while len(pending) >= batch_size:
+            yield pending[:batch_size]
+            pending = pending[batch_size:]
+            first_pending = time.monotonic()
+        if pending and (stopping or time.monotonic() - first_pending >= max_wait):
+            yield pending
+            pending = []
+        elif stopping:
+            return
+        else:
+            yield []
@@ -0,0 +1,136 @@
+"""
+Optional compression of the HOG descriptor before the RBF SVM, chosen at training time and stored with the model.
+
+A setting is written as "none", "float16", "pca:<components>" or "pca:<components>+float16":
+- pca:<k> projects the 2592-value descriptor onto its k leading principal components of the training set. The
+  projection is orthonormal and not whitened, so distances (and therefore gamma) keep their scale; the kernel cost
+  per support vector drops from 2592 to k multiply-adds and the SVM is trained on the projected features.
+- float16 stores the support vectors (and the projection) in half precision on disk, halving the artifact. They are
+  widened to the serving dtype when the model is loaded, so serving arithmetic is unchanged but the widened copy is
+  private to the process instead of shared through the page cache.
+create_model.py takes the setting from REFLASK_FEATURE_REDUCTION; model_artifact.py saves the projection next to the
+support vectors and load_artifact() wraps the engine in a ReducedPredictor, so app.py keeps passing raw HOG features.
+benchmarks/bench_feature_reduction.py compares accuracy, support vectors, model size and latency across settings.
+"""
+import numpy as np
+
+
+class FeatureReduction:
+    """
+    A parsed reduction setting: the number of PCA components (None for no projection) and the storage dtype.
+    """
+
+    def __init__(self, n_components=None, storage_dtype=None):
+        if n_components is not None and n_components < 1:
+            raise ValueError(f"PCA needs at least one component, got {n_components}.")
+        self.n_components = n_components
+        self.storage_dtype = np.dtype(storage_dtype) if storage_dtype is not None else None
+
+    @classmethod
+    def parse(cls, setting):
+        """
+        Parse "none", "float16", "pca:<k>" or "pca:<k>+float16". Raises ValueError for anything else.
+        """
+        n_components = storage_dtype = None
+        for part in (setting or "none").strip().lower().split("+"):
+            method, _, value = part.partition(":")
+            if method == "none" and not value:
+                continue
+            if method == "pca" and value.isdigit() and n_components is None:
+                n_components = int(value)
+            elif method == "float16" and not value and storage_dtype is None:
+                storage_dtype = np.float16
+            else:
+                raise ValueError(f"Unknown feature reduction {setting!r}; expected none, float16, pca:<k> "
+                                 f"or pca:<k>+float16.")
+        return cls(n_components, storage_dtype)
+
+    def __str__(self):
+        parts = [f"pca:{self.n_components}"] if self.n_components else []
+        if self.storage_dtype is not None:
+            parts.append(self.storage_dtype.name)
+        return "+".join(parts) or "none"
+
+    def fit(self, features):
+        """
+        Fit the projection to training features. Returns a PCAProjection, or None without PCA.
+        """
+        return PCAProjection.fit(features, self.n_components) if self.n_components else None
+
+
+class PCAProjection:
+    """
+    Centre and project features onto principal components: (features - mean) @ components.T.
+    """
+
+    def __init__(self, mean, components, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.mean = np.ascontiguousarray(mean, dtype=self.dtype)
+        self.components = np.ascontiguousarray(components, dtype=self.dtype)
+        if self.components.ndim != 2 or self.components.shape[1] != self.mean.shape[0]:
+            raise ValueError(f"Got components of shape {self.components.shape} for {self.mean.shape[0]} features.")
+        # Folding the mean into an offset saves an (N, n_features) subtraction per batch
+        self.offset = self.mean @ self.components.T
+
+    @classmethod
+    def fit(cls, features, n_components, dtype=np.float32):
+        """
+        Principal components of features from the eigendecomposition of their covariance, largest first, with
+        signs fixed so that each component's largest entry is positive.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if n_components > features.shape[1]:
+            raise ValueError(f"Cannot keep {n_components} components of {features.shape[1]} features.")
+        mean = features.mean(axis=0)
+        centred = features - mean
+        eigenvalues, eigenvectors = np.linalg.eigh(centred.T @ centred)
+        components = eigenvectors[:, ::-1][:, :n_components].T
+        signs = np.sign(components[np.arange(n_components), np.abs(components).argmax(axis=1)])
+        components *= signs[:, np.newaxis]
+        projection = cls(mean, components, dtype)
+        total = eigenvalues.sum()
+        projection.explained_variance_ratio = float(eigenvalues[::-1][:n_components].sum() / total) if total else 1.0
+        return projection
+
+    @property
+    def n_features(self):
+        return self.components.shape[1]
+
+    @property
+    def n_components(self):
+        return self.components.shape[0]
+
+    def transform(self, features):
+        features = np.asarray(features, dtype=self.dtype)
+        if features.ndim == 1:
+            features = features[np.newaxis]
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f"Expected features of shape (N, {self.n_features}), got {features.shape}.")
+        return features @ self.components.T - self.offset
+
+
+class ReducedPredictor:
+    """
+    Apply a PCAProjection and then a KernelSVMEngine; takes HOG features like the engine alone would.
+    """
+
+    def __init__(self, projection, engine):
+        if projection.n_components != engine.n_features:
+            raise ValueError(f"Projection gives {projection.n_components} features "
+                             f"but the engine expects {engine.n_features}.")
+        self.projection = projection
+        self.engine = engine
+
+    @property
+    def n_features(self):
+        return self.projection.n_features
+
+    @property
+    def classes(self):
+        return self.engine.classes
+
+    def decision_function(self, features):
+        return self.engine.decision_function(self.projection.transform(features))
+
+    def predict(self, features):
+        return self.engine.predict(self.projection.transform(features))
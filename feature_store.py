@@ -0,0 +1,183 @@
+"""
+Persistent HOG feature store for the training and test datasets used by create_model.py.
+
+A store directory holds
+- features-<generation>.npy: the (N, n_features) float64 HOG matrix, one row per image,
+- labels-<generation>.npy: the (N,) label array (the name of each image's parent directory),
+- manifest.json: the HOG parameters, the current generation and, per row, the image path, size,
+  mtime and BLAKE2b hash (plus the images that could not be read).
+sync() walks the image directory, reuses the rows of images whose size and mtime (or, failing that,
+content hash) are unchanged, extracts HOG features only for new or changed images, and returns the
+arrays memory-mapped with np.load(mmap_mode="r"), so an unchanged dataset is loaded zero-copy.
+Changing any HOG parameter rebuilds the store. Every rebuild writes a new generation and only then
+switches the manifest to it, so arrays still mapped by a caller are never overwritten in place.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+import hog_features
+import image_loading
+
+# Number of changed images loaded and encoded per pass
+EXTRACT_CHUNK_SIZE = 256
+MANIFEST_VERSION = 1
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    Return the BLAKE2b hex digest of a file's content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    """
+    On-disk cache of the HOG matrix and labels of one image directory.
+    """
+
+    def __init__(self, store_dir, image_size=hog_features.IMAGE_SIZE, orientations=hog_features.ORIENTATIONS,
+                 pixels_per_cell=hog_features.PIXELS_PER_CELL):
+        self.store_dir = Path(store_dir)
+        self.image_size = tuple(image_size)
+        self.orientations = orientations
+        self.pixels_per_cell = tuple(pixels_per_cell)
+        # Image paths of the rows returned by the last load() or sync()
+        self.paths = []
+        # Counts of the last sync, as {"reused": ..., "extracted": ..., "failed": ...}
+        self.last_sync = {}
+
+    @property
+    def parameters(self):
+        return {"version": MANIFEST_VERSION, "image_size": list(self.image_size),
+                "orientations": self.orientations, "pixels_per_cell": list(self.pixels_per_cell)}
+
+    @property
+    def manifest_path(self):
+        return self.store_dir / "manifest.json"
+
+    def _read_manifest(self):
+        """
+        Return the manifest, or None when the store is missing or was built with other parameters.
+        """
+        if not self.manifest_path.exists():
+            return None
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("parameters") != self.parameters:
+            return None
+        if not all((self.store_dir / manifest[key]).exists() for key in ("features_file", "labels_file")):
+            return None
+        return manifest
+
+    def load(self):
+        """
+        Return the stored (features, labels) memory-mapped read-only, without checking the images.
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            raise FileNotFoundError(f"No feature store with matching parameters in {self.store_dir}.")
+        self.paths = [record["path"] for record in manifest["files"]]
+        return (np.load(self.store_dir / manifest["features_file"], mmap_mode="r"),
+                np.load(self.store_dir / manifest["labels_file"], mmap_mode="r"))
+
+    def sync(self, image_directory):
+        """
+        Bring the store up to date with image_directory and return (features, labels), memory-mapped.
+        Images that cannot be read are reported and left out, as in image_loading.load_images_and_labels;
+        they are only retried once they change.
+        """
+        manifest = self._read_manifest() or {"files": [], "failed": []}
+        stored = {record["path"]: (row, record) for row, record in enumerate(manifest["files"])}
+        stored.update((record["path"], (None, record)) for record in manifest["failed"])
+        records = []
+        labels = []
+        reuse_rows = []
+        known_failures = []
+        for path, label in image_loading.list_images(image_directory):
+            stat = os.stat(path)
+            record = {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            row, old = stored.get(path, (None, None))
+            if old is not None and (old["size"], old["mtime_ns"]) == (record["size"], record["mtime_ns"]):
+                record["hash"] = old["hash"]
+            else:
+                record["hash"] = file_hash(path)
+                # A touched but unchanged file (e.g. after a checkout) keeps its row
+                if old is None or old["hash"] != record["hash"]:
+                    row, old = None, None
+            if old is not None and row is None:
+                known_failures.append(record)
+                continue
+            records.append(record)
+            labels.append(label)
+            reuse_rows.append(row)
+
+        if "features_file" in manifest and reuse_rows == list(range(len(manifest["files"]))):
+            self.last_sync = {"reused": len(records), "extracted": 0, "failed": len(known_failures)}
+            if records != manifest["files"] or known_failures != manifest["failed"]:
+                self._write_manifest(manifest["features_file"], manifest["labels_file"], records, known_failures)
+            return self.load()
+        return self._rebuild(manifest, records, labels, reuse_rows, known_failures)
+
+    def _rebuild(self, manifest, records, labels, reuse_rows, failures):
+        """
+        Write a new generation: stored rows are copied from the old memory map, the rest are extracted.
+        """
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        n_features = hog_features.feature_length(self.image_size, self.orientations, self.pixels_per_cell)
+        to_extract = [index for index, row in enumerate(reuse_rows) if row is None]
+        extracted = {}
+        for start in range(0, len(to_extract), EXTRACT_CHUNK_SIZE):
+            chunk = to_extract[start:start + EXTRACT_CHUNK_SIZE]
+            images, errors = image_loading.load_images([records[index]["path"] for index in chunk], self.image_size)
+            for position, message in sorted(errors.items()):
+                print(f"Error loading image {records[chunk[position]]['path']}: {message}")
+                failures.append(records[chunk[position]])
+            loaded = [position for position in range(len(chunk)) if position not in errors]
+            chunk_features = hog_features.extract_hog_batch(images[loaded], orientations=self.orientations,
+                                                            pixels_per_cell=self.pixels_per_cell)
+            extracted.update(zip((chunk[position] for position in loaded), chunk_features))
+
+        keep = [index for index, row in enumerate(reuse_rows) if row is not None or index in extracted]
+        generation = f"{time.time_ns():x}"
+        features_file = f"features-{generation}.npy"
+        labels_file = f"labels-{generation}.npy"
+        features = np.lib.format.open_memmap(self.store_dir / features_file, mode="w+", dtype=np.float64,
+                                             shape=(len(keep), n_features))
+        old_features = None
+        if any(row is not None for row in reuse_rows):
+            old_features = np.load(self.store_dir / manifest["features_file"], mmap_mode="r")
+        for out_row, index in enumerate(keep):
+            features[out_row] = old_features[reuse_rows[index]] if reuse_rows[index] is not None \
+                else extracted[index]
+        features.flush()
+        del features, old_features
+        np.save(self.store_dir / labels_file, np.array([labels[index] for index in keep], dtype=str))
+        self._write_manifest(features_file, labels_file, [records[index] for index in keep], failures)
+        self._remove_stale_generations(features_file, labels_file)
+        self.last_sync = {"reused": len(keep) - len(extracted), "extracted": len(extracted), "failed": len(failures)}
+        return self.load()
+
+    def _write_manifest(self, features_file, labels_file, records, failures):
+        temporary_manifest = self.store_dir / "manifest.json.tmp"
+        with open(temporary_manifest, "w") as f:
+            json.dump({"parameters": self.parameters, "features_file": features_file, "labels_file": labels_file,
+                       "files": records, "failed": failures}, f)
+        os.replace(temporary_manifest, self.manifest_path)
+
+    def _remove_stale_generations(self, *current_files):
+        for path in list(self.store_dir.glob("features-*.npy")) + list(self.store_dir.glob("labels-*.npy")):
+            if path.name not in current_files:
+                try:
+                    path.unlink()
+                except OSError:
+                    # Still memory-mapped (Windows); removed by a later rebuild
+                    pass
@@ -0,0 +1,49 @@
+"""
+Production serving of app.py under gunicorn (Linux/macOS); gunicorn reads this file from the working directory.
+
+    uv run gunicorn
+
+The master imports the app and loads and warms the model once (preload_app), then forks the workers. The model's
+arrays are memory-mapped or were read before the fork, so all workers share one copy of their pages
+copy-on-write; gc.freeze() keeps the garbage collector from touching, and so copying, the preloaded objects. Each
+worker then starts its own services (model watcher, prediction cache, job workers, micro-batcher), as threads and
+SQLite connections do not survive a fork. A worker only accepts requests after that, so /healthz and /readyz
+answer once the model is warm.
+
+HOG extraction and SVM prediction are CPU-bound and hold the GIL for most of a request, so the server scales with
+processes: one worker per core (REFLASK_WORKERS). A second thread per worker (REFLASK_THREADS) lets a worker read
+the next upload while it computes; more threads only queue for the GIL. Because the cores are taken by workers,
+each worker preprocesses batches in-process (REFLASK_PREPROCESS_WORKERS=1) and BLAS runs single-threaded, instead
+of every worker starting a pool or thread team as large as the machine.
+"""
+import gc
+import os
+
+# Set before the app (and NumPy) is imported; explicit settings win
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(variable, "1")
+os.environ.setdefault("REFLASK_PREPROCESS_WORKERS", "1")
+
+wsgi_app = "app:create_app(start=False)"
+bind = os.environ.get("REFLASK_BIND", f"0.0.0.0:{os.environ.get('REFLASK_PORT', 5000)}")
+workers = int(os.environ.get("REFLASK_WORKERS", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.environ.get("REFLASK_THREADS", 2))
+# REFLASK_PRELOAD=0 loads the model in every worker instead, e.g. to debug start-up
+preload_app = os.environ.get("REFLASK_PRELOAD", "1") != "0"
+# Large /predict_batch requests can take minutes; idle keep-alive connections are closed after 5 s
+timeout = int(os.environ.get("REFLASK_WORKER_TIMEOUT", 300))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # The preloaded objects are never freed, so the collector does not need to scan (and write to) them
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import app
+
+    # Loads the model first if it was not preloaded
+    app.create_app()
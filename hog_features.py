@@ -0,0 +1,164 @@
+"""
+Vectorized HOG feature extraction shared by model training (create_model.py) and serving (app.py).
+
+The extractor reproduces skimage.feature.hog(image, orientations=8, pixels_per_cell=(16, 16),
+cells_per_block=(1, 1)) for a whole (N, H, W) uint8 stack at once:
+- gradients are taken with the same central differences as skimage,
+- orientations are binned with the same half-open [start, end) comparisons; for uint8 input the
+  magnitude and bin of every possible gradient pair are tabulated once and looked up per pixel,
+- cell sums are accumulated in float32 in the same row-major pixel order as skimage's Cython loop,
+  so the histograms are bit-identical,
+- the L2-Hys block normalization is applied to all cells in one go.
+Tolerance: the output matches skimage bit-for-bit on the bundled datasets. The only operations
+that could in principle differ are the 8-element sums of the block normalization, which are
+bounded by a few ULPs (absolute error well below 1e-12), so any comparison should use
+np.allclose(..., rtol=0, atol=1e-12) rather than assume exact equality on every platform.
+"""
+import functools
+
+import numpy as np
+
+# HOG parameters the production model is trained with
+ORIENTATIONS = 8
+PIXELS_PER_CELL = (16, 16)
+CELLS_PER_BLOCK = (1, 1)
+IMAGE_SIZE = (300, 300)
+# Number of images processed per vectorized pass, bounding the float64 temporaries
+CHUNK_SIZE = 16
+_EPS = 1e-5
+
+
+def feature_length(image_shape=IMAGE_SIZE, orientations=ORIENTATIONS, pixels_per_cell=PIXELS_PER_CELL):
+    """
+    Return the length of the HOG descriptor for an image of the given shape.
+    """
+    n_cells_row = image_shape[0] // pixels_per_cell[0]
+    n_cells_col = image_shape[1] // pixels_per_cell[1]
+    return n_cells_row * n_cells_col * orientations
+
+
+def _magnitude_and_bin(g_row, g_col, orientations):
+    """
+    Compute gradient magnitudes and orientation bins with skimage's float64 formulas.
+    Orientations of exactly 180 degrees, which skimage never counts, get a zero magnitude.
+    """
+    magnitude = np.hypot(g_col, g_row)
+    orientation = np.rad2deg(np.arctan2(g_row, g_col)) % 180
+    # Bin i holds orientations in [180 / o * i, 180 / o * (i + 1)), so counting the upper edges
+    # that are <= orientation gives the bin index with exactly skimage's comparisons
+    upper_edges = (180. / orientations) * np.arange(1, orientations + 1)
+    orientation_bin = np.searchsorted(upper_edges, orientation, side="right")
+    magnitude = np.where(orientation_bin < orientations, magnitude, 0.)
+    orientation_bin = np.minimum(orientation_bin, orientations - 1)
+    return magnitude, orientation_bin.astype(np.intp)
+
+
+@functools.lru_cache(maxsize=None)
+def _uint8_tables(orientations):
+    """
+    Tabulate magnitude and orientation bin for every gradient pair of a uint8 image.
+    Central differences of uint8 pixels lie in [-255, 255], so a 511x511 table indexed by
+    (g_row + 255) * 511 + (g_col + 255) replaces hypot/arctan2 with two lookups.
+    """
+    values = np.arange(-255, 256, dtype=np.float64)
+    g_row, g_col = np.meshgrid(values, values, indexing="ij")
+    magnitude, orientation_bin = _magnitude_and_bin(g_row.ravel(), g_col.ravel(), orientations)
+    return magnitude, orientation_bin
+
+
+def _gradients(stack, dtype):
+    """
+    Central differences along rows and columns, zero on the border (as in skimage's _hog_channel_gradient).
+    """
+    image = stack.astype(dtype)
+    g_row = np.zeros_like(image)
+    g_col = np.zeros_like(image)
+    g_row[:, 1:-1, :] = image[:, 2:, :] - image[:, :-2, :]
+    g_col[:, :, 1:-1] = image[:, :, 2:] - image[:, :, :-2]
+    return g_row, g_col
+
+
+def _cell_histograms(stack, orientations, pixels_per_cell):
+    """
+    Compute the (N, n_cells_row, n_cells_col, orientations) orientation histograms of an image stack.
+    """
+    n_images, s_row, s_col = stack.shape
+    c_row, c_col = pixels_per_cell
+    n_cells_row = s_row // c_row
+    n_cells_col = s_col // c_col
+    # Only pixels covered by whole cells contribute to the histograms
+    rows, cols = n_cells_row * c_row, n_cells_col * c_col
+    # Regrouping pixels as (row in cell, column in cell, image, cell row, cell column) makes
+    # every in-cell offset a contiguous slice covering all cells of all images
+    shape = (n_images, n_cells_row, c_row, n_cells_col, c_col)
+    order = (2, 4, 0, 1, 3)
+    if stack.dtype == np.uint8:
+        g_row, g_col = _gradients(stack, np.int32)
+        table_index = (g_row[:, :rows, :cols] + 255) * 511 + (g_col[:, :rows, :cols] + 255)
+        table_index = np.ascontiguousarray(table_index.reshape(shape).transpose(order))
+        magnitude_table, bin_table = _uint8_tables(orientations)
+        magnitude = magnitude_table[table_index]
+        orientation_bin = bin_table[table_index]
+    else:
+        g_row, g_col = _gradients(stack, np.float64)
+        magnitude, orientation_bin = _magnitude_and_bin(g_row[:, :rows, :cols], g_col[:, :rows, :cols],
+                                                        orientations)
+        magnitude = np.ascontiguousarray(magnitude.reshape(shape).transpose(order))
+        orientation_bin = np.ascontiguousarray(orientation_bin.reshape(shape).transpose(order))
+    # skimage accumulates every cell in a float32 running total, pixel by pixel in row-major order.
+    # Walking the in-cell offsets in the same order, for all cells at once, reproduces that rounding.
+    n_cells = n_images * n_cells_row * n_cells_col
+    cell_offset = np.arange(n_cells) * orientations
+    totals = np.zeros(n_cells * orientations, dtype=np.float32)
+    for d_row in range(c_row):
+        for d_col in range(c_col):
+            index = cell_offset + orientation_bin[d_row, d_col].ravel()
+            totals[index] = totals[index] + magnitude[d_row, d_col].ravel()
+    histograms = totals.reshape(n_images, n_cells_row, n_cells_col, orientations)
+    return (histograms / np.float32(c_row * c_col)).astype(np.float64)
+
+
+def _l2_hys(histograms):
+    """
+    Apply skimage's L2-Hys normalization to every (1, 1) block along the last axis.
+    """
+    out = histograms / np.sqrt(np.sum(histograms ** 2, axis=-1, keepdims=True) + _EPS ** 2)
+    out = np.minimum(out, 0.2)
+    return out / np.sqrt(np.sum(out ** 2, axis=-1, keepdims=True) + _EPS ** 2)
+
+
+def extract_hog_batch(images, orientations=ORIENTATIONS, pixels_per_cell=PIXELS_PER_CELL,
+                      cells_per_block=CELLS_PER_BLOCK, chunk_size=CHUNK_SIZE):
+    """
+    Extract HOG descriptors for a stack of grayscale images in vectorized passes.
+    Parameters:
+    - images: array-like of shape (N, H, W), typically uint8 300x300 images.
+    - orientations, pixels_per_cell: HOG parameters, as in skimage.feature.hog.
+    - cells_per_block: only (1, 1) blocks are supported.
+    - chunk_size: number of images per vectorized pass.
+    Returns:
+    - A float64 NumPy array of shape (N, n_features).
+    """
+    if tuple(cells_per_block) != (1, 1):
+        raise ValueError(f"Only cells_per_block=(1, 1) is supported, got {cells_per_block}.")
+    stack = np.asarray(images)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    if stack.ndim != 3:
+        raise ValueError(f"Expected a (N, H, W) image stack, got shape {stack.shape}.")
+    n_features = feature_length(stack.shape[1:], orientations, pixels_per_cell)
+    features = np.empty((stack.shape[0], n_features), dtype=np.float64)
+    for start in range(0, stack.shape[0], chunk_size):
+        chunk = stack[start:start + chunk_size]
+        histograms = _cell_histograms(chunk, orientations, pixels_per_cell)
+        features[start:start + chunk.shape[0]] = _l2_hys(histograms).reshape(chunk.shape[0], -1)
+    return features
+
+
+def extract_hog(image, **kwargs):
+    """
+    Extract the HOG descriptor of a single grayscale image.
+    Returns:
+    - A 1-D float64 NumPy array.
+    """
+    return extract_hog_batch(np.asarray(image)[np.newaxis], **kwargs)[0]
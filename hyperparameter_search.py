@@ -0,0 +1,204 @@
+"""
+Parallel, cross-validated hyperparameter search for the SVC trained by create_model.py.
+
+The expensive part of every SVC trial is the kernel matrix, an (N, N) product of the HOG features. It is computed
+once: the Gram matrix X X^T and the squared norms are written to a .npy file in a work directory, and every trial
+maps the same file read-only (np.load(mmap_mode="r")), so the worker processes share its pages instead of copying
+it and no trial touches the features again. A trial only slices the rows and columns of its fold and applies its
+kernel to them,
+- rbf: exp(-gamma (|x|^2 + |y|^2 - 2 x.y)),
+- linear: x.y,
+- poly: (gamma x.y + 1)^3,
+and fits SVC(kernel="precomputed"); the trials are independent, so joblib spreads them over all cores (n_jobs) and
+the wall-clock time falls close to linearly with the core count. The search is a plain GridSearchCV or a
+HalvingGridSearchCV (successive halving: all candidates on a small sample, the best third on three times as many
+images, and so on) over SharedGramSVC, whose X holds row indices into the shared matrix; with mlflow.autolog()
+active every candidate is logged as a child run. The best parameters are then used to train an ordinary SVC on the
+features, which create_model.py exports as usual.
+Usage (features from the feature store, extracted once and reused by every search):
+    python hyperparameter_search.py [--method halving] [--folds 3] [--jobs -1] [--output modell.pkl]
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn import svm
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+# Default search space: C and gamma around the production values (C=1, gamma=0.01), plus linear and poly kernels
+PARAM_GRID = [
+    {"kernel": ["rbf"], "C": [0.3, 1, 3, 10], "gamma": [0.003, 0.01, 0.03]},
+    {"kernel": ["linear"], "C": [0.01, 0.1, 1]},
+    {"kernel": ["poly"], "C": [0.1, 1, 10], "gamma": [0.003, 0.01]},
+]
+SEARCH_METHODS = ("grid", "halving")
+GRAM_NAME = "gram.npy"
+NORMS_NAME = "norms.npy"
+_open_matrices = {}
+
+
+def write_gram(features, work_dir):
+    """
+    Compute the Gram matrix and squared norms of features once and save them to work_dir.
+    Returns:
+    - The work directory, to pass as SharedGramSVC(gram_dir=...).
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    features = np.asarray(features, dtype=np.float64)
+    np.save(work_dir / GRAM_NAME, features @ features.T, allow_pickle=False)
+    np.save(work_dir / NORMS_NAME, np.einsum("ij,ij->i", features, features), allow_pickle=False)
+    return str(work_dir)
+
+
+def _shared_matrices(gram_dir):
+    """
+    The memory-mapped Gram matrix and norms of gram_dir, opened once per process.
+    """
+    if gram_dir not in _open_matrices:
+        _open_matrices[gram_dir] = (np.load(Path(gram_dir) / GRAM_NAME, mmap_mode="r", allow_pickle=False),
+                                    np.load(Path(gram_dir) / NORMS_NAME, mmap_mode="r", allow_pickle=False))
+    return _open_matrices[gram_dir]
+
+
+class SharedGramSVC(ClassifierMixin, BaseEstimator):
+    """
+    An SVC whose samples are row indices into the Gram matrix written by write_gram().
+    X has shape (N, 1) and holds the indices; fit() and predict() slice the shared matrix and apply the kernel.
+    """
+
+    def __init__(self, kernel="rbf", C=1.0, gamma=0.01, gram_dir=None):
+        self.kernel = kernel
+        self.C = C
+        self.gamma = gamma
+        self.gram_dir = gram_dir
+
+    def _kernel(self, rows, columns):
+        gram, norms = _shared_matrices(self.gram_dir)
+        product = gram[np.ix_(rows, columns)]
+        if self.kernel == "linear":
+            return product
+        if self.kernel == "poly":
+            return (self.gamma * product + 1) ** 3
+        if self.kernel == "rbf":
+            squared_distances = norms[rows][:, np.newaxis] + norms[columns] - 2 * product
+            return np.exp(-self.gamma * np.maximum(squared_distances, 0))
+        raise ValueError(f"Unsupported kernel {self.kernel!r}; expected rbf, linear or poly.")
+
+    def fit(self, X, y):
+        self.train_rows_ = np.asarray(X, dtype=np.intp).ravel()
+        self.svc_ = svm.SVC(kernel="precomputed", C=self.C).fit(self._kernel(self.train_rows_, self.train_rows_), y)
+        self.classes_ = self.svc_.classes_
+        return self
+
+    def decision_function(self, X):
+        rows = np.asarray(X, dtype=np.intp).ravel()
+        return self.svc_.decision_function(self._kernel(rows, self.train_rows_))
+
+    def predict(self, X):
+        rows = np.asarray(X, dtype=np.intp).ravel()
+        return self.svc_.predict(self._kernel(rows, self.train_rows_))
+
+
+def best_estimator(params):
+    """
+    The production SVC configuration with the given search result applied.
+    """
+    return svm.SVC(kernel=params["kernel"], C=params["C"], gamma=params.get("gamma", "scale"),
+                   degree=3, coef0=1)
+
+
+def search(features, labels, param_grid=None, method="grid", folds=3, n_jobs=-1, random_state=42, work_dir=None,
+           verbose=0):
+    """
+    Cross-validate every candidate of param_grid in parallel on one shared Gram matrix.
+    Parameters:
+    - method: "grid" (every candidate on every fold) or "halving" (successive halving over the number of images).
+    - n_jobs: worker processes (-1: all cores).
+    - work_dir: where the Gram matrix is written (a temporary directory by default).
+    Returns:
+    - The fitted GridSearchCV/HalvingGridSearchCV (cv_results_, best_params_, best_score_), not refitted; train the
+      final model with best_estimator(result.best_params_).
+    """
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"Unknown search method {method!r}; expected one of {SEARCH_METHODS}.")
+    with tempfile.TemporaryDirectory(dir=work_dir) as gram_dir:
+        write_gram(features, gram_dir)
+        param_grid = [dict(grid, gram_dir=[gram_dir]) for grid in (param_grid or PARAM_GRID)]
+        cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+        if method == "halving":
+            from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+            from sklearn.model_selection import HalvingGridSearchCV
+
+            searcher = HalvingGridSearchCV(SharedGramSVC(), param_grid, cv=cv, factor=3, resource="n_samples",
+                                           min_resources="exhaust", refit=False, n_jobs=n_jobs,
+                                           random_state=random_state, verbose=verbose)
+        else:
+            searcher = GridSearchCV(SharedGramSVC(), param_grid, cv=cv, refit=False, n_jobs=n_jobs, verbose=verbose)
+        rows = np.arange(len(labels)).reshape(-1, 1)
+        searcher.fit(rows, np.asarray(labels))
+        _open_matrices.pop(gram_dir, None)
+    # The temporary directory is gone; report parameters without it
+    searcher.best_params_ = {key: value for key, value in searcher.best_params_.items() if key != "gram_dir"}
+    return searcher
+
+
+def summarize(result, top=10):
+    """
+    Lines describing the best candidates of a search, best first; for successive halving, candidates that reached
+    later iterations (more images) come first.
+    """
+    results = result.cv_results_
+    iterations = results.get("iter", np.zeros(len(results["params"])))
+    order = np.lexsort((-results["mean_test_score"], -np.asarray(iterations)))[:top]
+    resources = results.get("n_resources")
+    lines = []
+    for index in order:
+        params = {key: value for key, value in results["params"][index].items() if key != "gram_dir"}
+        prefix = f"{resources[index]:>6} images  " if resources is not None else ""
+        lines.append(f"{prefix}{results['mean_test_score'][index]:.4f} +- {results['std_test_score'][index]:.4f} "
+                     f"{results['mean_fit_time'][index]:>7.2f} s  {params}")
+    return lines
+
+
+if __name__ == "__main__":
+    import pickle
+
+    from sklearn.preprocessing import LabelEncoder
+
+    import feature_store
+
+    parser = argparse.ArgumentParser(description="Cross-validated SVC hyperparameter search on cached HOG features.")
+    parser.add_argument("--train-dir", default="datapp/train")
+    parser.add_argument("--store", default="feature_store/train", help="feature store directory for --train-dir")
+    parser.add_argument("--method", choices=SEARCH_METHODS, default="grid")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=int(os.environ.get("REFLASK_SEARCH_JOBS", -1)))
+    parser.add_argument("--output", default=None, help="train the best model on all images and pickle it here")
+    parser.add_argument("--no-mlflow", action="store_true", help="do not log the search to MLflow")
+    args = parser.parse_args()
+
+    if not args.no_mlflow:
+        import mlflow
+
+        # One child run per candidate instead of autolog's default of the best five
+        mlflow.sklearn.autolog(max_tuning_runs=None, log_models=False)
+    store = feature_store.FeatureStore(args.store)
+    train_features, train_names = store.sync(args.train_dir)
+    # Encoded as in create_model.py, so the pickle predicts the labels app.py expects
+    train_labels = LabelEncoder().fit_transform(train_names)
+    print(f"Feature store: {store.last_sync}")
+    start = time.perf_counter()
+    result = search(train_features, train_labels, method=args.method, folds=args.folds, n_jobs=args.jobs)
+    print(f"Searched {len(result.cv_results_['params'])} candidates in {time.perf_counter() - start:.1f} s")
+    print("\n".join(summarize(result)))
+    print(f"Best: {result.best_params_} ({result.best_score_:.4f})")
+    if args.output:
+        model = best_estimator(result.best_params_).fit(train_features, train_labels)
+        with open(args.output, "wb") as file:
+            pickle.dump(model, file)
+        print(f"Best model written to {args.output}")
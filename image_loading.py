@@ -0,0 +1,113 @@
+"""
+Parallel loading of the 300x300 grayscale training images.
+
+cv2.imread releases the GIL while it decodes, so a thread pool decodes the JPEGs concurrently,
+each thread writing straight into its row of a preallocated (N, 300, 300) uint8 array. Labels are
+kept as a compact integer array plus the list of label names. Files that cannot be read are
+reported and left out without stopping the load, as the serial loader in create_model.py did.
+"""
+import concurrent.futures
+import os
+
+import cv2
+import numpy as np
+
+IMAGE_SIZE = (300, 300)
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg")
+# Number of decoding threads
+LOAD_WORKERS = int(os.environ.get("REFLASK_LOAD_WORKERS", os.cpu_count() or 1))
+
+
+def list_images(directory):
+    """
+    List (path, label) pairs in os.walk order, labelling each image with the name of its directory.
+    """
+    entries = []
+    for rootdir, _, anyfiles in os.walk(directory):
+        request_label = os.path.basename(rootdir)
+        for file in anyfiles:
+            if file.endswith(IMAGE_EXTENSIONS):
+                entries.append((os.path.join(rootdir, file), request_label))
+    return entries
+
+
+def read_image(path, image_size=IMAGE_SIZE):
+    """
+    Read an image as grayscale uint8, resized to image_size when needed.
+    """
+    image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Could not read image: {path}")
+    if image.shape != image_size:
+        image = cv2.resize(image, image_size)
+    return image
+
+
+def load_images(paths, image_size=IMAGE_SIZE, workers=None, out=None):
+    """
+    Decode images in parallel into a preallocated uint8 array.
+    Parameters:
+    - paths: image paths.
+    - workers: number of decoding threads; defaults to REFLASK_LOAD_WORKERS.
+    - out: optional (len(paths), H, W) uint8 array to fill.
+    Returns:
+    - (images, errors): the filled array, with zeros in the rows of failed files, and
+      {index in paths: error message} for those files.
+    """
+    workers = LOAD_WORKERS if workers is None else workers
+    images = np.empty((len(paths),) + tuple(image_size), dtype=np.uint8) if out is None else out
+    errors = {}
+
+    def load(index):
+        try:
+            images[index] = read_image(paths[index], image_size)
+        except Exception as error:
+            images[index] = 0
+            errors[index] = str(error)
+
+    if workers > 1 and len(paths) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            # Consuming the iterator waits for every file
+            list(executor.map(load, range(len(paths))))
+    else:
+        for index in range(len(paths)):
+            load(index)
+    return images, errors
+
+
+def load_dataset(directory_path, image_size=IMAGE_SIZE, workers=None):
+    """
+    Load every image below directory_path with its directory name as label.
+    Returns:
+    - images: (N, H, W) uint8 array of the images that could be read, in os.walk order.
+    - label_codes: (N,) uint8 (or wider, if needed) array indexing label_names.
+    - label_names: sorted list of label names.
+    - errors: {path: error message} for the files that could not be read.
+    """
+    entries = list_images(directory_path)
+    paths = [path for path, _ in entries]
+    images, errors = load_images(paths, image_size, workers)
+    if errors:
+        # Compacting in place keeps the peak memory at one copy of the dataset
+        kept = [index for index in range(len(entries)) if index not in errors]
+        for row, index in enumerate(kept):
+            if row != index:
+                images[row] = images[index]
+        images = images[:len(kept)]
+        entries = [entries[index] for index in kept]
+    label_names = sorted({label for _, label in entries})
+    code_dtype = np.min_scalar_type(max(len(label_names) - 1, 0))
+    codes = {label: code for code, label in enumerate(label_names)}
+    label_codes = np.fromiter((codes[label] for _, label in entries), dtype=code_dtype, count=len(entries))
+    return images, label_codes, label_names, {paths[index]: message for index, message in errors.items()}
+
+
+def load_images_and_labels(directory_path, image_size=IMAGE_SIZE, workers=None):
+    """
+    Parallel replacement for the serial loader create_model.py once had: returns (images, labels) with the
+    labels as a string array, and prints the files that could not be read.
+    """
+    images, label_codes, label_names, errors = load_dataset(directory_path, image_size, workers)
+    for path, message in errors.items():
+        print(f"Error loading image {path}: {message}")
+    return images, np.array(label_names)[label_codes]
@@ -0,0 +1,184 @@
+"""
+In-process request metrics for the Flask app, rendered in the Prometheus text exposition format.
+
+Counters and histograms are plain Python objects guarded by one lock each; recording an observation
+is a bisect into the bucket bounds and a few additions, so the instrumentation can stay on in
+production. The app times each stage of /predict and /predict_batch (upload parsing, cache lookup,
+decoding, HOG extraction, prediction) with stage_timer(), which also counts the stage's errors, and
+serves everything at /metrics.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond cache hits to large batches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels; by convention its name ends in _total.
+    """
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket upper bounds and optional labels.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *label_values):
+        """
+        Return (cumulative bucket counts, sum, count) for one label combination.
+        """
+        with self._lock:
+            counts, total, count = self._series.get(label_values, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            counts = list(counts)
+        cumulative = [sum(counts[:index + 1]) for index in range(len(counts))]
+        return cumulative, total, count
+
+    def samples(self):
+        with self._lock:
+            label_sets = sorted(self._series)
+        for label_values in label_sets:
+            cumulative, total, count = self.snapshot(*label_values)
+            for bound, bucket_count in zip(self.buckets + (math.inf,), cumulative):
+                labels = _format_labels(self.label_names, label_values, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {bucket_count}"
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    """
+    Collection of metrics rendered together; collectors add gauges or counters read at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, label_names=()):
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect, kind="gauge"):
+        """
+        Register collect(), returning [(name, documentation, value)] or [(name, documentation, value, labels)]
+        read at every scrape.
+        Parameters:
+        - kind: the Prometheus type of the values, "gauge" or "counter" for totals since the process started
+          (named with a _total suffix).
+        """
+        self._collectors.append((collect, kind))
+
+    def render(self):
+        """
+        Return all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collect, kind in self._collectors:
+            for name, documentation, value, *labels in collect():
+                labels = labels[0] if labels else {}
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    "reflask_request_duration_seconds", "End-to-end request latency by endpoint and status code.",
+    ("endpoint", "status"))
+stage_latency = registry.histogram(
+    "reflask_stage_duration_seconds", "Latency of each processing stage by endpoint.", ("endpoint", "stage"))
+stage_errors = registry.counter(
+    "reflask_stage_errors_total", "Errors raised (or files rejected) in each processing stage by endpoint.",
+    ("endpoint", "stage"))
+batch_size = registry.histogram(
+    "reflask_batch_size", "Number of images per request.", ("endpoint",), BATCH_SIZE_BUCKETS)
+
+
+@contextmanager
+def stage_timer(endpoint, stage):
+    """
+    Time a block as one stage of endpoint; an exception escaping it is counted as an error of that stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(endpoint, stage)
+        raise
+    finally:
+        stage_latency.observe(time.perf_counter() - start, endpoint, stage)
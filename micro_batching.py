@@ -0,0 +1,143 @@
+"""
+Dynamic micro-batching for the single-image /predict endpoint.
+
+Each /predict request carries one feature row, and the per-call overhead of the predictor is paid
+once per image. With micro-batching enabled, request threads hand their rows to a single worker
+thread, which waits up to max_wait seconds (or until max_batch_size rows are queued), runs one
+batched predict, and hands every caller back its own rows of the result. A caller can name the predict
+function for its rows, e.g. the predictor of the model version its request started with; rows are only batched
+with rows of the same function, so a model swap while requests are queued never predicts them with another
+version.
+"""
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+# Opt-in: micro-batching only pays off under concurrent load
+MICROBATCH_ENABLED = os.environ.get("REFLASK_MICROBATCH", "0") == "1"
+# Longest time the first request of a batch waits for others to join
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("REFLASK_MICROBATCH_MAX_WAIT_MS", 5))
+# Largest number of feature rows predicted in one call
+MICROBATCH_MAX_SIZE = int(os.environ.get("REFLASK_MICROBATCH_MAX_SIZE", 32))
+
+
+class MicroBatcher:
+    """
+    Collect concurrent predict calls into batched calls of predict_fn on a worker thread.
+    """
+
+    def __init__(self, predict_fn=None, max_batch_size=None, max_wait=None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = MICROBATCH_MAX_SIZE if max_batch_size is None else max_batch_size
+        self.max_wait = MICROBATCH_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Achieved batch sizes, as {rows per predict call: number of calls}
+        self._batch_sizes = Counter()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="reflask-microbatcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, features, predict_fn=None):
+        """
+        Queue a (n, n_features) block of feature rows.
+        Parameters:
+        - predict_fn: the function predicting these rows; defaults to the batcher's.
+        Returns:
+        - A concurrent.futures.Future resolving to the predictions of exactly these rows.
+        Raises:
+        - ValueError if neither the batcher nor the call names a predict function.
+        """
+        predict_fn = predict_fn or self.predict_fn
+        if predict_fn is None:
+            raise ValueError("No predict function for the micro-batch.")
+        features = np.asarray(features)
+        if features.ndim == 1:
+            features = features[np.newaxis]
+        future = concurrent.futures.Future()
+        self._ensure_worker()
+        self._queue.put((features, future, predict_fn))
+        return future
+
+    def predict(self, features, predict_fn=None):
+        """
+        Predict the given rows as part of the next batch, blocking until the result is ready.
+        """
+        return self.submit(features, predict_fn).result()
+
+    def _collect(self):
+        """
+        Block for the first request, then gather more until the batch is full or the window closes.
+        """
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            # Callers that cancelled their future while queued are dropped
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            # One predict call per function, in order of arrival
+            groups = []
+            for item in batch:
+                group = next((group for group in groups if group[0][2] == item[2]), None)
+                if group is None:
+                    groups.append([item])
+                else:
+                    group.append(item)
+            for group in groups:
+                self._predict_group(group)
+
+    def _predict_group(self, group):
+        try:
+            predictions = group[0][2](np.concatenate([features for features, _, _ in group]))
+        except Exception as e:
+            logging.error(f"Micro-batched prediction failed for {len(group)} request(s): {e}")
+            for _, future, _ in group:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self._batch_sizes[len(predictions)] += 1
+        start = 0
+        for features, future, _ in group:
+            future.set_result(predictions[start:start + len(features)])
+            start += len(features)
+
+    def stats(self):
+        """
+        Return the configured knobs and the achieved batch sizes.
+        """
+        with self._lock:
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+        batches = sum(batch_sizes.values())
+        rows = sum(size * count for size, count in batch_sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "rows": rows,
+            "mean_batch_size": rows / batches if batches else 0.0,
+            "max_achieved_batch_size": max(batch_sizes, default=0),
+            "batch_size_histogram": batch_sizes,
+        }
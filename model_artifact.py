@@ -0,0 +1,261 @@
+"""
+Pickle-free model artifact for the RBF SVM served by app.py.
+
+A model directory holds
+- support_vectors-<generation>.npy: the (n_support_vectors, n_features) support vector matrix,
+- dual_coef-<generation>.npy: the (n_support_vectors,) dual coefficients,
+- or, for a random Fourier features model (format reflask-rff-linear, see approx_kernel.py), rff_weights, rff_offset
+  and coef arrays in their place; a Nystroem model is stored as an SVM over its landmarks,
+- pca_mean-<generation>.npy and pca_components-<generation>.npy when the model was trained on PCA-reduced HOG
+  features (see feature_reduction.py),
+- manifest.json: format version, model type, current generation, kernel, gamma, intercept, classes and label names,
+  the HOG parameters the model was trained with, the feature reduction, and the SHA-256 of each array file.
+load_artifact() reads the manifest and memory-maps the arrays (np.load(mmap_mode="r"), pickles refused), so
+start-up costs no unpickling, support vector pages are read on first use, and every process serving the
+same artifact shares those pages through the page cache. The arrays are stored in the engine's serving
+dtype (float32 by default), so the engine uses the mapping as is, unless they were saved in a smaller storage
+dtype (float16), which is widened on load. Models with a PCA projection are loaded as a ReducedPredictor that
+takes raw HOG features; they are written as format version 2 so that servers without it refuse them. As in
+feature_store.py, saving writes a new generation and switches the manifest to it last, so a running server never
+sees a half-written model.
+Convert an existing pickle (trusted input, unpickled once) with:
+    python model_artifact.py convert modell.pkl model
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+
+import numpy as np
+
+import approx_kernel
+import feature_reduction
+import hog_features
+import svm_engine
+
+FORMAT = "reflask-svm-rbf"
+FORMAT_VERSION = 1
+# Written for models with a PCA projection, which version 1 readers would serve without it
+REDUCED_FORMAT_VERSION = 2
+RFF_FORMAT = "reflask-rff-linear"
+RFF_FORMAT_VERSION = 1
+SUPPORTED_FORMATS = {FORMAT: (FORMAT_VERSION, REDUCED_FORMAT_VERSION), RFF_FORMAT: (RFF_FORMAT_VERSION,)}
+# Model type of SVM artifacts written before the manifest recorded one
+DEFAULT_MODEL_TYPE = "rbf-svc"
+MANIFEST_NAME = "manifest.json"
+# Default artifact directory, next to the legacy modell.pkl
+DEFAULT_MODEL_DIR = "model"
+
+
+def hog_parameters():
+    return {"image_size": list(hog_features.IMAGE_SIZE), "orientations": hog_features.ORIENTATIONS,
+            "pixels_per_cell": list(hog_features.PIXELS_PER_CELL)}
+
+
+def manifest_path(model_dir):
+    return Path(model_dir) / MANIFEST_NAME
+
+
+def is_artifact(path):
+    """
+    True when path is a model directory with a manifest (rather than a pickle file).
+    """
+    return manifest_path(path).is_file()
+
+
+def model_type(model_dir):
+    """
+    The model type recorded in a model directory's manifest, or None if the manifest cannot be read.
+    """
+    try:
+        with open(manifest_path(model_dir)) as f:
+            return json.load(f).get("model_type", DEFAULT_MODEL_TYPE)
+    except (OSError, ValueError):
+        return None
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(engine, model_dir, label_names=None, metadata=None, projection=None, storage_dtype=None,
+                  model_type=DEFAULT_MODEL_TYPE):
+    """
+    Write a KernelSVMEngine's or ApproxKernelEngine's arrays and manifest to model_dir as a new generation.
+    Parameters:
+    - label_names: names of engine.classes in order, e.g. ["approved", "rejected"].
+    - metadata: extra JSON-serializable information stored in the manifest (e.g. training accuracy).
+    - projection: the feature_reduction.PCAProjection the engine's features were reduced with, if any.
+    - storage_dtype: dtype the support vectors (or random Fourier weights) and PCA components are stored in
+      (e.g. float16); defaults to the engine's dtype.
+    - model_type: recorded in the manifest, e.g. "rbf-svc" or "nystroem-linear"; taken from an ApproxKernelEngine.
+    Returns:
+    - The manifest as written.
+    """
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    generation = f"{time.time_ns():x}"
+    storage_dtype = np.dtype(storage_dtype or engine.dtype)
+    if isinstance(engine, approx_kernel.ApproxKernelEngine):
+        model_type = engine.model_type
+        arrays = {"rff_weights": engine.feature_map.weights.astype(storage_dtype, copy=False),
+                  "rff_offset": engine.feature_map.offset, "coef": engine.coef}
+        model_fields = {"format": RFF_FORMAT, "format_version": RFF_FORMAT_VERSION,
+                        "gamma": engine.feature_map.gamma, "n_components": int(engine.feature_map.n_components)}
+    else:
+        arrays = {"support_vectors": engine.support_vectors.astype(storage_dtype, copy=False),
+                  "dual_coef": engine.dual_coef}
+        model_fields = {"format": FORMAT,
+                        "format_version": FORMAT_VERSION if projection is None else REDUCED_FORMAT_VERSION,
+                        "gamma": float(engine.gamma), "n_support_vectors": int(engine.support_vectors.shape[0])}
+    if projection is not None:
+        arrays.update({"pca_mean": projection.mean, "pca_components": projection.components.astype(storage_dtype)})
+    files = {}
+    for name, array in arrays.items():
+        file_name = f"{name}-{generation}.npy"
+        np.save(model_dir / file_name, np.ascontiguousarray(array), allow_pickle=False)
+        files[name] = {"file": file_name, "sha256": file_sha256(model_dir / file_name)}
+    reduction = feature_reduction.FeatureReduction(projection.n_components if projection is not None else None,
+                                                   storage_dtype if storage_dtype != engine.dtype else None)
+    manifest = {
+        "format": model_fields.pop("format"),
+        "format_version": model_fields.pop("format_version"),
+        "model_type": model_type,
+        "generation": generation,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "kernel": "rbf",
+        **model_fields,
+        "intercept": float(engine.intercept),
+        "classes": np.asarray(engine.classes).tolist(),
+        "label_names": list(label_names) if label_names is not None else None,
+        "dtype": engine.dtype.name,
+        "storage_dtype": storage_dtype.name,
+        "n_features": int(engine.n_features),
+        "input_features": int(projection.n_features if projection is not None else engine.n_features),
+        "reduction": str(reduction),
+        "hog": hog_parameters(),
+        "arrays": files,
+        "metadata": metadata or {},
+    }
+    temporary_manifest = model_dir / (MANIFEST_NAME + ".tmp")
+    with open(temporary_manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary_manifest, manifest_path(model_dir))
+    _remove_stale_generations(model_dir, {entry["file"] for entry in files.values()})
+    return manifest
+
+
+def _remove_stale_generations(model_dir, current_files):
+    for path in model_dir.glob("*-*.npy"):
+        if path.name not in current_files:
+            try:
+                path.unlink()
+            except OSError:
+                # Still memory-mapped (Windows); removed by a later save
+                pass
+
+
+def export_model(model, model_dir, label_names=None, dtype=np.float32, metadata=None, projection=None,
+                 storage_dtype=None):
+    """
+    Save a fitted binary RBF SVC or approx_kernel.ApproxKernelClassifier (trained on features reduced by
+    projection, if given) as an artifact. Raises ValueError for models the engines cannot serve.
+    """
+    if isinstance(model, approx_kernel.ApproxKernelClassifier):
+        engine, model_type = model.engine(dtype=dtype), model.model_type
+    else:
+        engine, model_type = svm_engine.KernelSVMEngine.from_model(model, dtype=dtype), DEFAULT_MODEL_TYPE
+    return save_artifact(engine, model_dir, label_names, metadata, projection, storage_dtype, model_type)
+
+
+def read_manifest(model_dir):
+    """
+    Read and validate a model directory's manifest.
+    Raises:
+    - ValueError for an unknown format or HOG parameters that differ from hog_features.py.
+    """
+    with open(manifest_path(model_dir)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") not in SUPPORTED_FORMATS.get(manifest.get("format"), ()):
+        raise ValueError(f"Unsupported model artifact format in {model_dir}: "
+                         f"{manifest.get('format')} v{manifest.get('format_version')}.")
+    if manifest["hog"] != hog_parameters():
+        raise ValueError(f"Model in {model_dir} was trained with HOG parameters {manifest['hog']}, "
+                         f"but hog_features.py extracts {hog_parameters()}.")
+    return manifest
+
+
+def load_artifact(model_dir, verify=False, chunk_size=svm_engine.CHUNK_SIZE):
+    """
+    Load a model directory as a KernelSVMEngine (or ApproxKernelEngine) backed by read-only memory maps, wrapped
+    in a feature_reduction.ReducedPredictor when the model has a PCA projection.
+    Parameters:
+    - verify: check the SHA-256 of the array files first (reads them completely).
+    Returns:
+    - (predictor, manifest)
+    """
+    model_dir = Path(model_dir)
+    manifest = read_manifest(model_dir)
+    if verify:
+        verify_artifact(model_dir, manifest)
+    arrays = {name: np.load(model_dir / entry["file"], mmap_mode="r", allow_pickle=False)
+              for name, entry in manifest["arrays"].items()}
+    if manifest["format"] == RFF_FORMAT:
+        feature_map = approx_kernel.RandomFourierMap(arrays["rff_weights"], arrays["rff_offset"], manifest["gamma"],
+                                                     manifest["dtype"])
+        engine = approx_kernel.ApproxKernelEngine(feature_map, arrays["coef"], manifest["intercept"],
+                                                  manifest["classes"], chunk_size=chunk_size)
+    else:
+        engine = svm_engine.KernelSVMEngine(arrays["support_vectors"], arrays["dual_coef"], manifest["intercept"],
+                                            manifest["gamma"], manifest["classes"], dtype=manifest["dtype"],
+                                            chunk_size=chunk_size)
+    if "pca_components" in arrays:
+        projection = feature_reduction.PCAProjection(arrays["pca_mean"], arrays["pca_components"], manifest["dtype"])
+        return feature_reduction.ReducedPredictor(projection, engine), manifest
+    return engine, manifest
+
+
+def verify_artifact(model_dir, manifest=None):
+    """
+    Raise ValueError if an array file does not match the checksum in the manifest.
+    """
+    model_dir = Path(model_dir)
+    manifest = manifest or read_manifest(model_dir)
+    for name, entry in manifest["arrays"].items():
+        if file_sha256(model_dir / entry["file"]) != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for {name} in {model_dir}.")
+
+
+def convert_pickle(pickle_path, model_dir, label_names=None, dtype=np.float32):
+    """
+    Convert a pickled SVC (e.g. modell.pkl) into a model directory. Only convert pickles you trust.
+    """
+    with open(pickle_path, "rb") as file:
+        model = pickle.load(file)
+    return export_model(model, model_dir, label_names, dtype, metadata={"converted_from": str(pickle_path)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert and check Reflask model artifacts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="convert a pickled SVC into a model directory")
+    convert.add_argument("pickle_path")
+    convert.add_argument("model_dir", nargs="?", default=DEFAULT_MODEL_DIR)
+    convert.add_argument("--label-names", nargs="+", default=["approved", "rejected"])
+    convert.add_argument("--dtype", choices=["float32", "float64"], default="float32")
+    verify = commands.add_parser("verify", help="check a model directory's manifest and checksums")
+    verify.add_argument("model_dir", nargs="?", default=DEFAULT_MODEL_DIR)
+    args = parser.parse_args()
+    if args.command == "convert":
+        written = convert_pickle(args.pickle_path, args.model_dir, args.label_names, args.dtype)
+        print(f"Wrote {written['n_support_vectors']} support vectors ({written['dtype']}) to {args.model_dir}.")
+    else:
+        verify_artifact(args.model_dir)
+        print(f"{args.model_dir} is a valid model artifact.")
@@ -0,0 +1,352 @@
+"""
+Versioned models with zero-downtime reloads for app.py.
+
+Every subdirectory of the models directory (REFLASK_MODELS_DIR, "models" by default) that holds a
+model_artifact.py artifact is a version; version names sort chronologically (create_model.py names them
+by timestamp). The registry serves the newest version, or a single artifact/pickle when there are none.
+A new version is loaded and warmed (one prediction, so its support vector pages are read) off the
+request path, by the watcher thread or an admin call, and then swapped in with a single reference
+assignment. A request takes current() once and uses that model throughout, so in-flight requests finish
+on the version they started with. Previously active versions are kept loaded for rollback(); the watcher
+only promotes versions newer than any it has seen, so a rolled-back version stays retired.
+Every process (each pre-forked worker, see gunicorn.conf.py) has its own registry. A rollback or a reload of a named
+version therefore pins that version in the models directory's PIN_FILE; every watcher activates the pinned version
+and promotes no newer ones while it is there, and start() serves it after a restart. Reloading without a version
+lifts the pin, and every watcher moves to the newest version. A deployment can
+restrict itself to one model type (REFLASK_MODEL_TYPE, e.g. "nystroem-linear" for the low-latency approximate
+model of approx_kernel.py) and then ignores versions of other types in a shared models directory.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import calibration
+import model_artifact
+import prediction_cache
+import svm_engine
+
+MODELS_DIR = os.environ.get("REFLASK_MODELS_DIR", "models")
+# Seconds between checks of the models directory for new versions; 0 disables the watcher
+WATCH_INTERVAL = float(os.environ.get("REFLASK_MODEL_WATCH_SECONDS", 10))
+# Number of previously active versions kept loaded for rollback
+HISTORY_SIZE = int(os.environ.get("REFLASK_MODEL_HISTORY", 2))
+# Only serve versions of this model type ("rbf-svc", "nystroem-linear", "rff-linear"); empty serves any
+MODEL_TYPE = os.environ.get("REFLASK_MODEL_TYPE") or None
+# File in the models directory naming the version every process serves, written by rollbacks and reloads
+PIN_FILE = "pinned_version"
+
+logger = logging.getLogger("reflask")
+
+
+class ModelVersion:
+    """
+    A loaded model: its predictor, version name, cache fingerprint and (for artifacts) manifest.
+    """
+
+    def __init__(self, version, predictor, path, fingerprint, manifest=None):
+        self.version = version
+        self.predictor = predictor
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self.manifest = manifest
+        self.loaded_at = time.time()
+        # Platt scaling fitted by create_model.py; None for pickles and older artifacts
+        self.calibration = calibration.PlattScaling.from_dict(
+            (manifest or {}).get("metadata", {}).get("calibration"))
+
+    @property
+    def model_type(self):
+        # Pickles are always exact SVCs
+        return (self.manifest or {}).get("model_type", model_artifact.DEFAULT_MODEL_TYPE)
+
+    def describe(self):
+        return {"version": self.version, "path": self.path, "format": "artifact" if self.manifest else "pickle",
+                "model_type": self.model_type, "loaded_at": self.loaded_at,
+                "calibrated": self.calibration is not None}
+
+    def decide(self, features):
+        """
+        Labels and decision values of a batch from a single decision_function pass; the labels are the ones
+        predict returns.
+        Returns:
+        - (labels, decision values) arrays of shape (N,).
+        Raises:
+        - ValueError for models with more than two classes.
+        """
+        decision = np.asarray(self.predictor.decision_function(features))
+        if decision.ndim != 1:
+            raise ValueError("Decision scores are only available for binary models.")
+        # The engines expose classes, a pickled sklearn SVC classes_
+        classes = getattr(self.predictor, "classes", None)
+        classes = np.asarray(self.predictor.classes_ if classes is None else classes)
+        return classes[(decision > 0).astype(np.intp)], decision
+
+
+def load_model(path, version=None):
+    """
+    Load a model artifact directory (memory-mapped) or a legacy pickle as a ModelVersion.
+    A pickled SVC is served through the kernel engine unless REFLASK_KERNEL_ENGINE=0.
+    """
+    path = Path(path)
+    if model_artifact.is_artifact(path):
+        predictor, manifest = model_artifact.load_artifact(path)
+        fingerprint = prediction_cache.file_fingerprint(model_artifact.manifest_path(path))
+        return ModelVersion(version or path.name, predictor, path, fingerprint, manifest)
+    logger.warning(f"Loading pickled model {path}; convert it with "
+                   f"'python model_artifact.py convert {path}' for faster, pickle-free start-up.")
+    with open(path, 'rb') as file:
+        model = pickle.load(file)
+    predictor = model
+    if os.environ.get("REFLASK_KERNEL_ENGINE", "1") != "0":
+        try:
+            predictor = svm_engine.KernelSVMEngine.from_model(model)
+        except ValueError as e:
+            logger.warning(f"Kernel engine unavailable, falling back to model.predict: {e}")
+    return ModelVersion(version or path.name, predictor, path, prediction_cache.file_fingerprint(path))
+
+
+def new_version_name():
+    """
+    Name for a new version directory; timestamps sort chronologically.
+    """
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def warm(model):
+    """
+    Run one prediction so the first request does not pay for page faults and lazy initialization.
+    """
+    n_features = getattr(model.predictor, "n_features", None) or model.predictor.n_features_in_
+    model.predictor.predict(np.zeros((1, n_features)))
+
+
+class ModelRegistry:
+    """
+    Holds the active ModelVersion and the previously active ones, and swaps between them.
+    """
+
+    def __init__(self, models_dir=None, watch_interval=None, history_size=None, model_type=None):
+        self.models_dir = Path(MODELS_DIR if models_dir is None else models_dir)
+        self.model_type = MODEL_TYPE if model_type is None else model_type
+        self.watch_interval = WATCH_INTERVAL if watch_interval is None else watch_interval
+        self.history_size = HISTORY_SIZE if history_size is None else history_size
+        self.reloads = 0
+        self.rollbacks = 0
+        self._active = None
+        self._history = []
+        # Newest version ever seen; the watcher only promotes versions after it
+        self._newest_seen = None
+        # Pinned version this process follows; None while serving the newest version
+        self._pin = None
+        # Whether the watcher promotes new versions, or only follows pins
+        self.follow_newest = True
+        # Serializes loads and swaps; serving never takes it
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._listeners = []
+
+    def current(self):
+        """
+        The active ModelVersion. Take it once per request and use it throughout.
+        """
+        return self._active
+
+    def add_listener(self, listener):
+        """
+        Call listener(new, old) after every swap, e.g. to log or update metrics.
+        """
+        self._listeners.append(listener)
+
+    def versions(self):
+        """
+        Names of the versions in the models directory (of the registry's model type, if it has one), oldest first.
+        """
+        if not self.models_dir.is_dir():
+            return []
+        return sorted(entry.name for entry in self.models_dir.iterdir() if model_artifact.is_artifact(entry)
+                      and (not self.model_type or model_artifact.model_type(entry) == self.model_type))
+
+    def pinned(self):
+        """
+        The version named in the models directory's PIN_FILE, or None.
+        """
+        try:
+            return (self.models_dir / PIN_FILE).read_text().strip() or None
+        except OSError:
+            return None
+
+    def _write_pin(self, version):
+        # Replaced atomically, so other processes never read a partial name
+        path = self.models_dir / PIN_FILE
+        if version is None:
+            path.unlink(missing_ok=True)
+        else:
+            temporary = path.with_name(f".{PIN_FILE}.{os.getpid()}")
+            temporary.write_text(version + "\n")
+            os.replace(temporary, path)
+        self._pin = version
+
+    def start(self, fallback_path=None):
+        """
+        Activate the pinned version, or else the newest one, or the model at fallback_path when the models
+        directory has none.
+        """
+        versions = self.versions()
+        pin = self.pinned()
+        if versions:
+            with self._lock:
+                self._pin = pin if pin in versions else None
+                self._load_and_activate(self._pin or versions[-1])
+        elif fallback_path is not None:
+            self.activate_path(fallback_path)
+        else:
+            raise FileNotFoundError(f"No model versions in {self.models_dir} and no fallback model.")
+
+    def activate_path(self, path):
+        """
+        Load, warm and activate the model artifact or pickle at path, outside the models directory.
+        """
+        model = load_model(path)
+        warm(model)
+        with self._lock:
+            self._activate(model)
+        return model
+
+    def reload(self, version=None, pin=True):
+        """
+        Load, warm and activate a version (the newest by default). The active model keeps serving until the
+        swap. Returns the new ModelVersion.
+        Parameters:
+        - pin: pin a named version for every process, or lift the pin when reloading the newest one. The
+          watcher passes False when it follows another process's pin.
+        """
+        with self._lock:
+            versions = self.versions()
+            named = version is not None
+            if version is None:
+                if not versions:
+                    raise LookupError(f"No model versions in {self.models_dir}.")
+                version = versions[-1]
+            elif version not in versions:
+                raise LookupError(f"Unknown model version {version!r}.")
+            model = self._load_and_activate(version)
+            if pin:
+                self._write_pin(version if named else None)
+            self.reloads += 1
+            return model
+
+    def _load_and_activate(self, version):
+        model = load_model(self.models_dir / version, version)
+        warm(model)
+        self._see(version)
+        self._activate(model)
+        return model
+
+    def _see(self, version):
+        if self._newest_seen is None or version > self._newest_seen:
+            self._newest_seen = version
+
+    def rollback(self):
+        """
+        Reactivate the previously active version. Returns it.
+        """
+        with self._lock:
+            if not self._history:
+                raise LookupError("No previous model version to roll back to.")
+            previous = self._history.pop()
+            old, self._active = self._active, previous
+            self.rollbacks += 1
+            if previous.version in self.versions():
+                self._write_pin(previous.version)
+            else:
+                logger.warning(f"Model {previous.version} is not a version in {self.models_dir}; the rollback "
+                               f"only applies to this process.")
+        logger.info(f"Rolled back from model version {old.version} to {previous.version}.")
+        self._notify(previous, old)
+        return previous
+
+    def _activate(self, model):
+        old, self._active = self._active, model
+        if old is not None:
+            self._history.append(old)
+            self._history = self._history[-self.history_size:] if self.history_size > 0 else []
+        logger.info(f"Serving model version {model.version} from {model.path}.")
+        self._notify(model, old)
+
+    def _notify(self, new, old):
+        for listener in self._listeners:
+            try:
+                listener(new, old)
+            except Exception as e:
+                logger.error(f"Model swap listener failed: {e}")
+
+    def loaded(self):
+        """
+        The active ModelVersion followed by the ones kept for rollback, newest first.
+        """
+        active = self._active
+        return ([active] if active else []) + list(reversed(self._history))
+
+    def status(self):
+        active = self._active
+        return {"active": active.describe() if active else None,
+                "previous": [model.version for model in reversed(self._history)],
+                "available": self.versions(), "model_type": self.model_type, "reloads": self.reloads,
+                "rollbacks": self.rollbacks, "watching": self._watcher is not None, "pinned": self.pinned()}
+
+    def start_watching(self, follow_newest=True):
+        """
+        Poll the models directory, following pins and (with follow_newest) activating versions newer than any seen
+        before.
+        """
+        self.follow_newest = follow_newest
+        if self.watch_interval <= 0 or self._watcher is not None:
+            return
+        versions = self.versions()
+        if versions:
+            self._see(versions[-1])
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="reflask-model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def check_for_new_version(self):
+        """
+        Activate the pinned version if another process pinned one, the newest version if the pin was lifted, or
+        else the newest version if it is newer than any seen before. Returns the new ModelVersion or None.
+        """
+        versions = self.versions()
+        pin = self.pinned()
+        active = self._active
+        if pin in versions:
+            self._pin = pin
+            if active is None or active.version != pin:
+                return self.reload(pin, pin=False)
+            return None
+        if self._pin is not None:
+            self._pin = None
+            if versions and (active is None or active.version != versions[-1]):
+                return self.reload(versions[-1], pin=False)
+            return None
+        if self.follow_newest and versions and (self._newest_seen is None or versions[-1] > self._newest_seen):
+            return self.reload(versions[-1], pin=False)
+        return None
+
+    def _watch(self):
+        while not self._stop.wait(self.watch_interval):
+            try:
+                self.check_for_new_version()
+            except Exception as e:
+                # A half-copied or broken version is retried on the next poll
+                logger.error(f"Could not load new model version: {e}")
@@ -0,0 +1,178 @@
+"""
+Content-hash prediction cache for repeated uploads to /predict and /predict_batch.
+
+Entries are keyed by a BLAKE2b hash of the raw upload bytes plus a fingerprint of the model file,
+so a re-sent casting photo skips decoding, HOG extraction and the SVM. The in-memory store is an
+LRU bounded by entry count; an optional SQLite file keeps entries across restarts. The model file
+is re-stat'ed on every lookup: when its size or modification time changes, the fingerprint is
+recomputed, the in-memory entries are dropped and the on-disk entries of other fingerprints are
+deleted. When the app hot-swaps model versions it passes each version's fingerprint explicitly
+instead (model_path=None), and prunes the on-disk entries of retired versions with retain().
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Set to 0 to disable the cache
+PREDICTION_CACHE_ENABLED = os.environ.get("REFLASK_PREDICTION_CACHE", "1") != "0"
+# Largest number of predictions kept in memory
+PREDICTION_CACHE_SIZE = int(os.environ.get("REFLASK_PREDICTION_CACHE_SIZE", 4096))
+# Optional SQLite file backing the cache across restarts
+PREDICTION_CACHE_PATH = os.environ.get("REFLASK_PREDICTION_CACHE_PATH") or None
+
+
+def content_hash(raw):
+    """
+    Return the hex digest identifying a raw upload.
+    """
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def file_fingerprint(path, block_size=1 << 20):
+    """
+    Return a hex digest of a file's content, e.g. of modell.pkl.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    LRU cache of JSON-serializable predictions keyed by upload content and model fingerprint.
+    """
+
+    def __init__(self, model_path, max_entries=None, db_path=None):
+        self.model_path = model_path
+        self.max_entries = PREDICTION_CACHE_SIZE if max_entries is None else max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_stat = None
+        self._fingerprint = None
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS predictions ("
+                             "model_fingerprint TEXT NOT NULL, content_hash TEXT NOT NULL, prediction TEXT NOT NULL, "
+                             "PRIMARY KEY (model_fingerprint, content_hash))")
+            self._db.commit()
+
+    @property
+    def fingerprint(self):
+        """
+        Fingerprint of the current model file, recomputed (and the memory store cleared) when it changes.
+        """
+        if self.model_path is None:
+            raise ValueError("This cache has no model file; pass the model fingerprint explicitly.")
+        stat = os.stat(self.model_path)
+        model_stat = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if model_stat != self._model_stat:
+                fingerprint = file_fingerprint(self.model_path)
+                if self._fingerprint is not None and fingerprint != self._fingerprint:
+                    self._entries.clear()
+                    self.invalidations += 1
+                    if self._db is not None:
+                        self._db.execute("DELETE FROM predictions WHERE model_fingerprint != ?", (fingerprint,))
+                        self._db.commit()
+                    logging.info(f"Model file {self.model_path} changed, prediction cache invalidated.")
+                self._model_stat = model_stat
+                self._fingerprint = fingerprint
+            return self._fingerprint
+
+    def get(self, key, fingerprint=None):
+        """
+        Return the cached prediction for a content hash, or None.
+        fingerprint identifies the model explicitly (e.g. a hot-swapped model version); by default it is
+        taken from the model file.
+        """
+        fingerprint = fingerprint or self.fingerprint
+        with self._lock:
+            if (fingerprint, key) in self._entries:
+                self._entries.move_to_end((fingerprint, key))
+                self.hits += 1
+                return self._entries[(fingerprint, key)]
+            prediction = None
+            if self._db is not None:
+                row = self._db.execute("SELECT prediction FROM predictions WHERE model_fingerprint = ? "
+                                       "AND content_hash = ?", (fingerprint, key)).fetchone()
+                if row is not None:
+                    prediction = json.loads(row[0])
+                    self._store(fingerprint, key, prediction)
+            if prediction is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return prediction
+
+    def put(self, key, prediction, fingerprint=None):
+        """
+        Cache a JSON-serializable prediction for a content hash.
+        """
+        self.put_many([(key, prediction)], fingerprint)
+
+    def put_many(self, items, fingerprint=None):
+        """
+        Cache several (content hash, prediction) pairs with a single disk write.
+        """
+        fingerprint = fingerprint or self.fingerprint
+        with self._lock:
+            for key, prediction in items:
+                self._store(fingerprint, key, prediction)
+            if self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                                     [(fingerprint, key, json.dumps(prediction)) for key, prediction in items])
+                self._db.commit()
+
+    def retain(self, fingerprints):
+        """
+        Delete the entries of every model whose fingerprint is not in fingerprints.
+        """
+        fingerprints = set(fingerprints)
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry[0] not in fingerprints]:
+                del self._entries[entry]
+            if self._db is not None:
+                placeholders = ", ".join("?" * len(fingerprints))
+                self._db.execute(f"DELETE FROM predictions WHERE model_fingerprint NOT IN ({placeholders})",
+                                 tuple(fingerprints))
+                self._db.commit()
+
+    def _store(self, fingerprint, key, prediction):
+        # Entries of other models are never looked up again and age out of the LRU
+        self._entries[(fingerprint, key)] = prediction
+        self._entries.move_to_end((fingerprint, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "invalidations": self.invalidations,
+                "model_fingerprint": self._fingerprint,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
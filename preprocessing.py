@@ -0,0 +1,204 @@
+"""
+Image preprocessing shared by the Flask endpoints, with an optional process-pool stage.
+
+Decoding, grayscale conversion, resizing and HOG extraction are CPU-bound and hold the GIL for
+most of their runtime, so large batches are split into chunks that worker processes decode and
+encode in parallel. Chunks come back in input order, and files that fail are reported by index
+instead of aborting the whole batch. A worker process that dies (killed for memory, or crashed in a
+decoder) breaks the whole pool; it is then replaced and the batch retried once on the new pool. Workers are
+started by a forkserver (spawned where there is none), never forked from the server: its model watcher,
+micro-batcher, job and cache threads may hold locks (logging, SQLite, BLAS) that a forked child would
+inherit locked and deadlock on.
+
+Decoding goes straight to grayscale with a single conversion. Large JPEGs are decoded with libjpeg's
+DCT-domain downscaling (PIL's Image.draft, luma only) to the smallest 1/2, 1/4 or 1/8 scale that
+keeps at least FAST_DECODE_KEEP_SCALE times the 300x300 model input, and then resized once.
+The model was trained on sharp, point-sampled pixels, and reducing all the way down to 300x300
+smooths them enough to flip a few percent of predictions; keeping 4x (1200x1200) agreed with the
+full-decode pipeline on 99-100% of predictions while decoding 2400-6000 px photos 4-11x faster
+(benchmarks/bench_decode.py). Images too small for a reduction, and all images with
+REFLASK_FAST_DECODE=0, give exactly the pixels of the original RGB -> BGR -> GRAY -> resize pipeline.
+Images whose header declares more than REFLASK_MAX_IMAGE_PIXELS pixels are rejected before any pixel is
+decoded, so a small compressed upload cannot expand into gigabytes of memory (a decompression bomb).
+"""
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import hog_features
+
+IMAGE_SIZE = (300, 300)
+# Number of worker processes; 0 or 1 keeps preprocessing in the calling thread. The CPU count suits a single
+# server process (python app.py); gunicorn.conf.py sets 1, as its workers take the cores, and any other
+# multi-process setup should set it explicitly so the pools do not add up to several times the core count
+PREPROCESS_WORKERS = int(os.environ.get("REFLASK_PREPROCESS_WORKERS", os.cpu_count() or 1))
+# How pool workers are started; "fork" would copy the server's threads' held locks into them
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Number of files a worker decodes and encodes per task
+PREPROCESS_CHUNK_SIZE = int(os.environ.get("REFLASK_PREPROCESS_CHUNK_SIZE", 16))
+# Set to 0 to always decode JPEGs at full size
+FAST_DECODE = os.environ.get("REFLASK_FAST_DECODE", "1") != "0"
+# Reduced-size JPEG decoding keeps at least this many times IMAGE_SIZE on each side
+FAST_DECODE_KEEP_SCALE = int(os.environ.get("REFLASK_FAST_DECODE_KEEP_SCALE", 4))
+# Largest accepted width x height of an upload (64 megapixels, e.g. 8000x8000); 0 disables the check
+MAX_IMAGE_PIXELS = int(os.environ.get("REFLASK_MAX_IMAGE_PIXELS", 64_000_000))
+
+# Features of the files that could be preprocessed, in input order, plus the failures
+# as {input index: error message}
+BatchFeatures = namedtuple("BatchFeatures", ["features", "indices", "errors"])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def to_model_input(image, fast_decode=None):
+    """
+    Convert a PIL image into the 300x300 grayscale uint8 array the model is trained on.
+    Parameters:
+    - image: PIL.Image.Image; reduced-size decoding only applies to JPEGs that are not loaded yet.
+    - fast_decode: use reduced-size JPEG decoding for large images; defaults to REFLASK_FAST_DECODE.
+    Raises:
+    - ValueError if the image has more than REFLASK_MAX_IMAGE_PIXELS pixels.
+    """
+    fast_decode = FAST_DECODE if fast_decode is None else fast_decode
+    keep_size = (IMAGE_SIZE[0] * FAST_DECODE_KEEP_SCALE, IMAGE_SIZE[1] * FAST_DECODE_KEEP_SCALE)
+    # The size comes from the header; nothing has been decoded yet
+    width, height = image.size
+    if MAX_IMAGE_PIXELS and width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"Image of {width}x{height} pixels exceeds the limit of {MAX_IMAGE_PIXELS} pixels.")
+    # Only worth it (and only inexact) when at least a 1/2 DCT scale fits above keep_size
+    if fast_decode and image.format == "JPEG" and width >= 2 * keep_size[0] and height >= 2 * keep_size[1]:
+        # Decoding only the luma channel at a reduced DCT scale
+        image.draft("L", keep_size)
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGB")
+    pixels = np.asarray(image)
+    if pixels.ndim == 2:
+        # Grayscale pixels come out of the old RGB -> BGR -> GRAY round trip unchanged
+        grayscale = pixels
+    elif pixels.shape[2] == 4:
+        grayscale = cv2.cvtColor(pixels, cv2.COLOR_RGBA2GRAY)
+    else:
+        # One conversion with the same weights as RGB -> BGR -> GRAY
+        grayscale = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+    return cv2.resize(grayscale, IMAGE_SIZE)
+
+
+def decode_image(item):
+    """
+    Decode raw upload bytes (or pass through an already opened PIL image) into model input.
+    """
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        item = Image.open(io.BytesIO(item))
+    return to_model_input(item)
+
+
+def _preprocess_chunk(items):
+    """
+    Decode and HOG-encode one chunk of images. Runs inside the worker processes.
+    Returns:
+    - (features of the successful images, their positions in the chunk, [(position, error message)])
+    """
+    resized_images = np.empty((len(items),) + IMAGE_SIZE, dtype=np.uint8)
+    positions = []
+    errors = []
+    for position, item in enumerate(items):
+        try:
+            resized_images[len(positions)] = decode_image(item)
+            positions.append(position)
+        except Exception as e:
+            errors.append((position, str(e)))
+    features = hog_features.extract_hog_batch(resized_images[:len(positions)])
+    return features, positions, errors
+
+
+def get_pool(workers=None):
+    """
+    Return the module-level process pool, creating it on first use.
+    The worker count only applies when the pool is created; call shutdown_pool() to change it.
+    """
+    global _pool
+    workers = PREPROCESS_WORKERS if workers is None else workers
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
+            logging.info(f"Started preprocessing pool with {workers} worker processes.")
+        return _pool
+
+
+def _replace_broken_pool(broken):
+    """
+    Drop a broken pool, unless another thread replaced it already, so the next get_pool() starts a new one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+def _map_in_pool(chunks, workers):
+    for attempt in range(2):
+        pool = get_pool(workers)
+        try:
+            return list(pool.map(_preprocess_chunk, chunks))
+        except BrokenProcessPool:
+            _replace_broken_pool(pool)
+            if attempt:
+                raise
+            logging.warning("A preprocessing worker process died; retrying the batch on a new pool.")
+
+
+def shutdown_pool():
+    """
+    Stop the worker processes, e.g. before changing the worker count.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def preprocess_batch(items, workers=None, chunk_size=None):
+    """
+    Decode and HOG-encode a batch of images, in parallel when the batch is large enough.
+    Parameters:
+    - items: list of raw image bytes or PIL.Image.Image objects.
+    - workers: number of worker processes; defaults to REFLASK_PREPROCESS_WORKERS.
+    - chunk_size: number of images per worker task; defaults to REFLASK_PREPROCESS_CHUNK_SIZE.
+    Returns:
+    - A BatchFeatures tuple with the features of the successful images in input order.
+    """
+    workers = PREPROCESS_WORKERS if workers is None else workers
+    chunk_size = PREPROCESS_CHUNK_SIZE if chunk_size is None else chunk_size
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+    # Shipping a single chunk to another process only adds IPC overhead
+    if workers > 1 and len(chunks) > 1:
+        chunk_results = _map_in_pool(chunks, workers)
+    else:
+        chunk_results = map(_preprocess_chunk, chunks)
+    feature_blocks = []
+    indices = []
+    errors = {}
+    for chunk_number, (features, positions, chunk_errors) in enumerate(chunk_results):
+        offset = chunk_number * chunk_size
+        feature_blocks.append(features)
+        indices.extend(offset + position for position in positions)
+        errors.update((offset + position, message) for position, message in chunk_errors)
+    if feature_blocks:
+        features = np.concatenate(feature_blocks)
+    else:
+        features = np.empty((0, hog_features.feature_length(IMAGE_SIZE)))
+    return BatchFeatures(features, indices, errors)
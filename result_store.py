@@ -0,0 +1,344 @@
+"""
+Compact columnar result files for night_predict, and a reader for the result history in every output format.
+
+The JSON writer stores each result as an indented object repeating the keys "File", "Raw prediction" and
+"Decision", and only writes the day's file when a run ends; neither it nor the JSON-lines file can be read without
+parsing every record. A columnar file (batch_results_YYYYMMDD.npb) instead gets one block per chunk, appended as
+results arrive. A block is three arrays written back to back with numpy.save:
+- records: one row per result with the file name (UTF-8), label code, decision code, decision score (NaN when the
+  server sent none), model version code and the time the result was saved (ms since the epoch),
+- decisions / versions: the strings the decision and model version codes index (dictionary encoding).
+Any block can be read with numpy.load; iter_blocks reads them itself and parses each distinct array header only
+once, since parsing it costs more than reading a 32-result block. When a run or day is over, compact() rewrites
+the file as a single block, so reading history costs a few reads per day. A block cut short by a crash is dropped
+(repair()), and its files are sent again like those of a truncated JSON line.
+
+Usage (history summary, e.g. counts and mean score per day and decision since 1 March):
+    python result_store.py [--folder night_predict] [--since 20260301] [--until 20260331] [--decision rejected]
+                           [--model-version VERSION] [--file 'cast_*'] [--by date,decision]
+"""
+import argparse
+import fnmatch
+import io
+import json
+import math
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+SUFFIX = ".npb"
+RESULT_FILE_RE = re.compile(r"^batch_results_(\d{8})(\.json|\.jsonl|\.npb)$")
+# Columns of a history table, as returned by load_history
+COLUMNS = ("date", "file", "label", "decision", "score", "model_version", "time")
+# Label code of a result without "Raw prediction"
+MISSING_LABEL = -1
+# Parsed .npy headers (shape, element count, dtype) by their raw bytes; blocks of equal size share them
+_HEADER_CACHE = {}
+_HEADER_CACHE_SIZE = 1024
+
+
+def _records_dtype(name_width):
+    return np.dtype([("file", f"S{max(name_width, 1)}"), ("label", "i1"), ("decision", "u1"), ("score", "<f4"),
+                     ("version", "<u2"), ("time_ms", "<i8")])
+
+
+def _codes(values):
+    """
+    Dictionary-encode values: (unique strings in first-seen order, code of each value).
+    """
+    dictionary = {}
+    codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+    return np.array(list(dictionary), dtype=str), codes
+
+
+def encode_block(results, time_ms=None):
+    """
+    The arrays of one block for results as returned by /predict_batch.
+    Parameters:
+    - time_ms: the time stored with every result, defaults to now.
+    Returns:
+    - (records, decisions, versions) arrays.
+    """
+    time_ms = int(time.time() * 1000) if time_ms is None else time_ms
+    names = [result["File"].encode("utf-8") for result in results]
+    decisions, decision_codes = _codes([result.get("Decision", "") for result in results])
+    versions, version_codes = _codes([result.get("Model version") or "" for result in results])
+    records = np.empty(len(results), dtype=_records_dtype(max(map(len, names), default=1)))
+    records["file"] = names
+    records["label"] = [MISSING_LABEL if result.get("Raw prediction") is None else result["Raw prediction"]
+                        for result in results]
+    records["decision"] = decision_codes
+    records["score"] = [np.nan if result.get("Decision score") is None else result["Decision score"]
+                        for result in results]
+    records["version"] = version_codes
+    records["time_ms"] = time_ms
+    return records, decisions, versions
+
+
+def append_block(path, results, time_ms=None):
+    """
+    Append results to a columnar file as one block, synced to disk before returning.
+    """
+    if not results:
+        return
+    with open(path, "ab") as f:
+        for array in encode_block(results, time_ms):
+            np.save(f, array, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_array(f):
+    """
+    Read one array written by numpy.save from f, as a read-only array.
+    Raises:
+    - ValueError if f ends within the array or holds no .npy data at its position.
+    """
+    magic = f.read(np.lib.format.MAGIC_LEN)
+    if len(magic) < np.lib.format.MAGIC_LEN or not magic.startswith(np.lib.format.MAGIC_PREFIX):
+        raise ValueError("Not a .npy array")
+    length_size = 2 if magic[-2] == 1 else 4
+    length_bytes = f.read(length_size)
+    header = length_bytes + f.read(int.from_bytes(length_bytes, "little"))
+    parsed = _HEADER_CACHE.get(header)
+    if parsed is None:
+        read_header = np.lib.format.read_array_header_1_0 if length_size == 2 else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(io.BytesIO(header))
+        if dtype.hasobject or fortran_order:
+            raise ValueError("Unsupported .npy array")
+        parsed = (shape, math.prod(shape), dtype)
+        if len(_HEADER_CACHE) >= _HEADER_CACHE_SIZE:
+            _HEADER_CACHE.clear()
+        _HEADER_CACHE[header] = parsed
+    shape, count, dtype = parsed
+    data = f.read(count * dtype.itemsize)
+    if len(data) < count * dtype.itemsize:
+        raise ValueError("Truncated .npy array")
+    return np.frombuffer(data, dtype=dtype, count=count).reshape(shape)
+
+
+def iter_blocks(path):
+    """
+    Yield (records, decisions, versions, end offset) for each complete block of a columnar file, stopping at a
+    block cut short by a crash.
+    """
+    if not Path(path).exists():
+        return
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        while f.tell() < size:
+            try:
+                records, decisions, versions = (_read_array(f) for _ in range(3))
+            except ValueError:
+                return
+            yield records, decisions, versions, f.tell()
+
+
+def repair(path):
+    """
+    Truncate a columnar file after its last complete block, so new blocks can be appended to it.
+    """
+    path = Path(path)
+    if not path.exists():
+        return
+    end = 0
+    for *_, end in iter_blocks(path):
+        pass
+    if end < path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(end)
+
+
+def compact(path):
+    """
+    Rewrite a columnar file as a single block with merged dictionaries, atomically. Rows keep their order.
+    """
+    path = Path(path)
+    blocks = [block[:3] for block in iter_blocks(path)]
+    if len(blocks) < 2:
+        return
+    decisions, decision_codes = _codes([value for _, block_decisions, _ in blocks for value in block_decisions.tolist()])
+    versions, version_codes = _codes([value for _, _, block_versions in blocks for value in block_versions.tolist()])
+    width = max(records.dtype["file"].itemsize for records, _, _ in blocks)
+    merged = np.concatenate([records.astype(_records_dtype(width)) for records, _, _ in blocks])
+    # Each block's codes index its own dictionary; map them into the merged ones
+    decision_offset = version_offset = 0
+    start = 0
+    for records, block_decisions, block_versions in blocks:
+        end = start + len(records)
+        merged["decision"][start:end] = np.asarray(decision_codes[decision_offset:decision_offset + len(block_decisions)],
+                                                   dtype="u1")[records["decision"]]
+        merged["version"][start:end] = np.asarray(version_codes[version_offset:version_offset + len(block_versions)],
+                                                  dtype="<u2")[records["version"]]
+        decision_offset += len(block_decisions)
+        version_offset += len(block_versions)
+        start = end
+    temporary_path = path.with_name(path.name + ".tmp")
+    with open(temporary_path, "wb") as f:
+        for array in (merged, decisions, versions):
+            np.save(f, array, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+def read_file_names(path):
+    """
+    The file names stored in a columnar file.
+    """
+    return [name.decode("utf-8") for records, *_ in iter_blocks(path) for name in records["file"].tolist()]
+
+
+def _read_columnar(path):
+    """
+    The columns of a columnar file, with the dictionary codes resolved.
+    """
+    parts = {column: [] for column in COLUMNS if column != "date"}
+    names = []
+    for records, decisions, versions, _ in iter_blocks(path):
+        names.append(records["file"])
+        parts["label"].append(records["label"])
+        parts["decision"].append(decisions[records["decision"]])
+        parts["score"].append(records["score"])
+        parts["model_version"].append(versions[records["version"]])
+        parts["time"].append(records["time_ms"].astype("datetime64[ms]"))
+    # Decoded once per file rather than once per block
+    parts["file"].append(np.char.decode(np.concatenate(names), "utf-8") if names else np.empty(0, dtype=str))
+    return parts
+
+
+def _read_json(path):
+    """
+    The columns of a JSON or JSON-lines result file; these keep no save time.
+    """
+    if path.suffix == ".json":
+        with open(path) as f:
+            results = json.load(f).get("Batch results", [])
+    else:
+        results = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except ValueError:
+                    continue
+    return {
+        "file": [np.array([result["File"] for result in results], dtype=str)],
+        "label": [np.array([MISSING_LABEL if result.get("Raw prediction") is None else result["Raw prediction"]
+                            for result in results], dtype="i1")],
+        "decision": [np.array([result.get("Decision", "") for result in results], dtype=str)],
+        "score": [np.array([np.nan if result.get("Decision score") is None else result["Decision score"]
+                            for result in results], dtype="f4")],
+        "model_version": [np.array([result.get("Model version") or "" for result in results], dtype=str)],
+        "time": [np.full(len(results), np.datetime64("NaT"), dtype="datetime64[ms]")],
+    }
+
+
+def result_files(folder, since=None, until=None):
+    """
+    The result files of folder as (date stamp, path), oldest first, optionally limited to dates YYYYMMDD between
+    since and until (inclusive). Dates are taken from the file names, so other days are not opened.
+    """
+    files = []
+    for path in Path(folder).iterdir():
+        match = RESULT_FILE_RE.match(path.name)
+        if match is None:
+            continue
+        date_stamp = match.group(1)
+        if (since is None or date_stamp >= since) and (until is None or date_stamp <= until):
+            files.append((date_stamp, path))
+    return sorted(files)
+
+
+def load_history(folder, since=None, until=None):
+    """
+    Load the results of every result file in folder (JSON, JSON-lines and columnar) into one table.
+    Returns:
+    - A dict of equal-length arrays, one per name in COLUMNS: date (YYYYMMDD of the file), file, label (-1 when
+      missing), decision, score (NaN when missing), model_version ("" when missing) and time (NaT when missing).
+    """
+    parts = {column: [] for column in COLUMNS}
+    for date_stamp, path in result_files(folder, since, until):
+        columns = _read_columnar(path) if path.suffix == SUFFIX else _read_json(path)
+        for column, arrays in columns.items():
+            parts[column].extend(arrays)
+        parts["date"].append(np.full(sum(len(array) for array in columns["file"]), date_stamp, dtype="U8"))
+    empty = {"date": "U8", "file": str, "label": "i1", "decision": str, "score": "f4", "model_version": str,
+             "time": "datetime64[ms]"}
+    return {column: np.concatenate(arrays) if arrays else np.empty(0, dtype=empty[column])
+            for column, arrays in parts.items()}
+
+
+def filter_history(table, decision=None, model_version=None, file_pattern=None):
+    """
+    The rows of a history table matching every given condition; file_pattern is a shell-style pattern.
+    """
+    mask = np.ones(len(table["file"]), dtype=bool)
+    if decision is not None:
+        mask &= table["decision"] == decision
+    if model_version is not None:
+        mask &= table["model_version"] == model_version
+    if file_pattern is not None:
+        mask &= np.fromiter((fnmatch.fnmatchcase(name, file_pattern) for name in table["file"].tolist()),
+                            dtype=bool, count=len(mask))
+    return {column: values[mask] for column, values in table.items()}
+
+
+def summarize(table, by=("date", "decision")):
+    """
+    Group a history table by the given columns.
+    Returns:
+    - A list of (key tuple, count, mean score or None), sorted by key.
+    """
+    count = len(table["file"])
+    if count == 0:
+        return []
+    keys = []
+    group_codes = np.zeros(count, dtype=np.int64)
+    for column in by:
+        uniques, codes = np.unique(table[column], return_inverse=True)
+        keys.append(uniques)
+        group_codes = group_codes * len(uniques) + codes
+    groups, first_rows, inverse, counts = np.unique(group_codes, return_index=True, return_inverse=True,
+                                                    return_counts=True)
+    scores = table["score"].astype(np.float64)
+    scored = ~np.isnan(scores)
+    score_sums = np.bincount(inverse, weights=np.where(scored, scores, 0.0), minlength=len(groups))
+    scored_counts = np.bincount(inverse, weights=scored, minlength=len(groups))
+    summary = []
+    for group, row in enumerate(first_rows):
+        key = tuple(table[column][row].item() for column in by)
+        mean_score = score_sums[group] / scored_counts[group] if scored_counts[group] else None
+        summary.append((key, int(counts[group]), mean_score))
+    return sorted(summary, key=lambda item: tuple(str(part) for part in item[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the batch results in night_predict")
+    parser.add_argument("--folder", default=Path(os.getcwd()).resolve().parent / "reflask" / "night_predict")
+    parser.add_argument("--since", help="first day, YYYYMMDD")
+    parser.add_argument("--until", help="last day, YYYYMMDD")
+    parser.add_argument("--decision")
+    parser.add_argument("--model-version")
+    parser.add_argument("--file", help="shell-style file name pattern")
+    parser.add_argument("--by", default="date,decision", help=f"comma-separated columns out of {', '.join(COLUMNS)}")
+    args = parser.parse_args()
+    by = [column.strip() for column in args.by.split(",") if column.strip()]
+    unknown = set(by) - set(COLUMNS)
+    if unknown:
+        parser.error(f"unknown columns: {', '.join(sorted(unknown))}")
+    started = time.perf_counter()
+    table = filter_history(load_history(args.folder, args.since, args.until), decision=args.decision,
+                           model_version=args.model_version, file_pattern=args.file)
+    summary = summarize(table, by)
+    for key, count, mean_score in summary:
+        score = "" if mean_score is None else f"  mean score {mean_score:.3f}"
+        print("  ".join(str(part) for part in key) + f"  {count}{score}")
+    print(f"{len(table['file'])} results in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Precomputed support-vector kernel engine for serving the RBF SVM trained by create_model.py.
+
+sklearn's SVC.predict goes through libsvm's general-purpose kernel loop, one sample and one
+support vector at a time. For the binary RBF model that is all we serve, the decision value is
+    f(x) = sum_i dual_coef_i * exp(-gamma * ||x - sv_i||^2) + intercept
+and ||x - sv_i||^2 = ||x||^2 - 2 x.sv_i + ||sv_i||^2, so a whole batch needs one BLAS matrix
+product against the support vectors plus a vectorized exp. The support vectors, their squared
+norms, the dual coefficients and the intercept are exported once into contiguous arrays.
+Tolerance: with the default float32 arrays the decision values match SVC.decision_function to
+a few 1e-4 on the production model (2.1e-4 on datapp/test, with identical labels); pass
+dtype=np.float64 when exact agreement near the boundary matters.
+"""
+import numpy as np
+
+# Number of samples per matrix product, bounding the (chunk, n_support_vectors) kernel block
+CHUNK_SIZE = 1024
+
+
+def rbf_kernel(features, vectors, vector_norms, gamma):
+    """
+    exp(-gamma * ||x - v||^2) for every row x of features and v of vectors, with one matrix product.
+    Parameters:
+    - vector_norms: the squared norms of the rows of vectors, precomputed by the caller.
+    Returns:
+    - A new (len(features), len(vectors)) array.
+    """
+    sample_norms = np.einsum("ij,ij->i", features, features)
+    squared_distances = features @ vectors.T
+    squared_distances *= -2
+    squared_distances += sample_norms[:, np.newaxis]
+    squared_distances += vector_norms
+    # Rounding can push distances of near-identical vectors slightly below zero
+    np.maximum(squared_distances, 0, out=squared_distances)
+    squared_distances *= -gamma
+    return np.exp(squared_distances, out=squared_distances)
+
+
+class KernelSVMEngine:
+    """
+    Batched decision function and predict for a fitted binary sklearn SVC with an RBF kernel.
+    """
+
+    def __init__(self, support_vectors, dual_coef, intercept, gamma, classes, dtype=np.float32,
+                 chunk_size=CHUNK_SIZE):
+        self.dtype = np.dtype(dtype)
+        self.support_vectors = np.ascontiguousarray(support_vectors, dtype=self.dtype)
+        self.dual_coef = np.ascontiguousarray(np.ravel(dual_coef), dtype=self.dtype)
+        self.intercept = self.dtype.type(np.ravel(intercept)[0])
+        self.gamma = self.dtype.type(gamma)
+        self.classes = np.asarray(classes)
+        self.chunk_size = chunk_size
+        if self.support_vectors.shape[0] != self.dual_coef.shape[0]:
+            raise ValueError(f"Got {self.support_vectors.shape[0]} support vectors "
+                             f"but {self.dual_coef.shape[0]} dual coefficients.")
+        # Precomputed once, reused by every batch
+        self.support_norms = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+
+    @classmethod
+    def from_model(cls, model, dtype=np.float32, chunk_size=CHUNK_SIZE):
+        """
+        Export the support vectors, dual coefficients and intercept of a fitted SVC.
+        Raises:
+        - ValueError if the model is not a binary SVC with an RBF kernel.
+        """
+        if getattr(model, "kernel", None) != "rbf":
+            raise ValueError(f"Only RBF kernels are supported, got {getattr(model, 'kernel', None)!r}.")
+        if len(model.classes_) != 2:
+            raise ValueError(f"Only binary models are supported, got {len(model.classes_)} classes.")
+        # _gamma holds the numeric value when the model was built with gamma="scale" or "auto"
+        gamma = getattr(model, "_gamma", model.gamma)
+        return cls(model.support_vectors_, model.dual_coef_, model.intercept_, gamma, model.classes_,
+                   dtype=dtype, chunk_size=chunk_size)
+
+    @property
+    def n_features(self):
+        return self.support_vectors.shape[1]
+
+    def _decision_chunk(self, features):
+        """
+        Decision values of one chunk: one matrix product, one exp, one matrix-vector product.
+        """
+        kernel = rbf_kernel(features, self.support_vectors, self.support_norms, self.gamma)
+        return kernel @ self.dual_coef + self.intercept
+
+    def decision_function(self, features):
+        """
+        Compute decision values for a batch, as SVC.decision_function does for binary models.
+        Parameters:
+        - features: array-like of shape (N, n_features) or (n_features,).
+        Returns:
+        - A NumPy array of shape (N,); positive values vote for classes[1].
+        """
+        features = np.asarray(features, dtype=self.dtype)
+        if features.ndim == 1:
+            features = features[np.newaxis]
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f"Expected features of shape (N, {self.n_features}), got {features.shape}.")
+        decision = np.empty(features.shape[0], dtype=self.dtype)
+        for start in range(0, features.shape[0], self.chunk_size):
+            decision[start:start + self.chunk_size] = self._decision_chunk(features[start:start + self.chunk_size])
+        return decision
+
+    def predict(self, features):
+        """
+        Predict class labels for a batch, with the same labels as SVC.predict.
+        """
+        return self.classes[(self.decision_function(features) > 0).astype(np.intp)]
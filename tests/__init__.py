@@ -3,4 +3,27 @@ Unit tests for Reflask application.
 
 This package contains test modules for various components:
 - test_werkzeug_security.py: Tests for Werkzeug security vulnerabilities
+- test_hog_features.py: Parity tests for the vectorized HOG extractor
+- test_preprocessing.py: Tests for the batch preprocessing pool
+- test_svm_engine.py: Parity tests for the precomputed SVM kernel engine
+- test_micro_batching.py: Tests for micro-batching of /predict requests
+- test_prediction_cache.py: Tests for the content-hash prediction cache
+- test_batch_predict.py: Tests for the streaming batch client
+- test_db_access.py: Tests for the pooled database access layer
+- test_feature_store.py: Tests for the persistent HOG feature store
+- test_image_loading.py: Tests for the parallel image loader
+- test_batch_jobs.py: Tests for the asynchronous batch job queue
+- test_metrics.py: Tests for the request metrics and /metrics rendering
+- test_model_artifact.py: Tests for the pickle-free model artifact format
+- test_model_registry.py: Tests for versioned models and zero-downtime reloads
+- test_feature_reduction.py: Tests for the optional feature reduction stored with the model
+- test_approx_kernel.py: Tests for the approximate-kernel linear models
+- test_hyperparameter_search.py: Tests for the parallel hyperparameter search
+- test_upload_stream.py: Tests for the streaming /predict_batch ingestion
+- test_directory_watcher.py: Tests for the directory watcher of the batch client's watch mode
+- test_result_store.py: Tests for the columnar result files and the result history reader
+- test_calibration.py: Tests for the Platt scaling of decision values
+- test_batch_response.py: Tests for the vectorized /predict_batch response encoding
+- test_serving.py: Tests for the app factory, readiness and the gunicorn configuration
+- test_run_suite.py: Tests for the regression check of the benchmark suite
 """
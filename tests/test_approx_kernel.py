@@ -0,0 +1,123 @@
+"""
+Unit tests for the approximate-kernel linear models.
+
+Tests cover:
+1. The random Fourier and Nystroem maps approximating the RBF kernel
+2. Exported engines matching the trained classifier, through model artifacts
+3. Continuing a saved model with partial_fit and choosing model types per deployment
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("sklearn.linear_model")
+svm = pytest.importorskip("sklearn.svm")
+
+import approx_kernel
+import model_artifact
+import model_registry
+import svm_engine
+
+
+@pytest.fixture(scope="module")
+def data():
+    """HOG-sized features of two shifted classes, split into training and test rows."""
+    random_state = np.random.RandomState(0)
+    features = random_state.rand(400, 2592) * 0.2
+    labels = np.repeat([0, 1], 200)
+    features[labels == 1, :1296] += 0.05
+    order = random_state.permutation(400)
+    features, labels = features[order], labels[order]
+    return features[:300], labels[:300], features[300:], labels[300:]
+
+
+def exact_kernel(features, gamma):
+    """The exact RBF kernel matrix of features."""
+    return svm_engine.rbf_kernel(features, features, np.einsum("ij,ij->i", features, features), gamma)
+
+
+class TestFeatureMaps:
+    """Tests for the kernel approximations."""
+
+    def test_random_fourier_features_approximate_kernel(self, data):
+        """Ensures inner products of random Fourier features approach the RBF kernel."""
+        features = data[0][:20]
+        feature_map = approx_kernel.RandomFourierMap.fit(features, 20000, gamma=0.01, dtype=np.float64)
+        mapped = feature_map.transform(features)
+        assert np.abs(mapped @ mapped.T - exact_kernel(features, 0.01)).max() < 0.05
+
+    def test_nystroem_is_exact_on_landmarks(self, data):
+        """Verifies that the Nystroem map reproduces the kernel between its own landmarks."""
+        features = data[0][:50]
+        feature_map = approx_kernel.NystroemMap.fit(features, 50, gamma=0.01, dtype=np.float64)
+        mapped = feature_map.transform(features)
+        np.testing.assert_allclose(mapped @ mapped.T, exact_kernel(features, 0.01), atol=1e-6)
+
+    def test_nystroem_needs_enough_images(self, data):
+        """Ensures sampling more landmarks than images fails."""
+        with pytest.raises(ValueError):
+            approx_kernel.NystroemMap.fit(data[0][:10], 20, gamma=0.01)
+
+
+class TestExport:
+    """Tests for serving approximate models from artifacts."""
+
+    @pytest.mark.parametrize("method, engine_class", [("nystroem", svm_engine.KernelSVMEngine),
+                                                      ("rff", approx_kernel.ApproxKernelEngine)])
+    def test_artifact_matches_classifier(self, data, tmp_path, method, engine_class):
+        """Ensures the loaded engine gives the classifier's decisions and records the model type."""
+        train_features, train_labels, test_features, _ = data
+        classifier = approx_kernel.ApproxKernelClassifier(method, 200, gamma=0.01).fit(train_features, train_labels)
+        manifest = model_artifact.export_model(classifier, tmp_path, label_names=["approved", "rejected"])
+        engine, _ = model_artifact.load_artifact(tmp_path, verify=True)
+        assert isinstance(engine, engine_class)
+        assert manifest["model_type"] == approx_kernel.MODEL_TYPES[method]
+        np.testing.assert_allclose(engine.decision_function(test_features),
+                                   classifier.decision_function(test_features), atol=1e-4)
+        np.testing.assert_array_equal(engine.predict(test_features), classifier.predict(test_features))
+
+    def test_accuracy_close_to_exact_svc(self, data):
+        """Verifies that a Nystroem model classifies the separable toy data about as well as the exact SVC."""
+        train_features, train_labels, test_features, test_labels = data
+        exact = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(train_features, train_labels)
+        approximate = approx_kernel.ApproxKernelClassifier("nystroem", 200, gamma=0.01).fit(train_features,
+                                                                                             train_labels)
+        exact_accuracy = np.mean(exact.predict(test_features) == test_labels)
+        assert np.mean(approximate.predict(test_features) == test_labels) >= exact_accuracy - 0.05
+
+
+class TestIncrementalTraining:
+    """Tests for growing a model with partial_fit and serving it by type."""
+
+    def test_resume_from_training_state(self, data, tmp_path):
+        """Ensures a saved classifier continues with partial_fit on new images and keeps its feature map."""
+        train_features, train_labels, _, _ = data
+        classifier = approx_kernel.ApproxKernelClassifier("nystroem", 100, gamma=0.01)
+        classifier.partial_fit(train_features[:150], train_labels[:150], classes=[0, 1])
+        approx_kernel.save_training_state(classifier, tmp_path)
+        resumed = approx_kernel.load_training_state(tmp_path)
+        coef = resumed.linear.coef_.copy()
+        resumed.partial_fit(train_features[150:], train_labels[150:])
+        assert resumed.n_seen == 300
+        np.testing.assert_array_equal(resumed.feature_map.landmarks, classifier.feature_map.landmarks)
+        assert not np.array_equal(resumed.linear.coef_, coef)
+
+    def test_registry_serves_selected_model_type(self, data, tmp_path):
+        """Verifies that a deployment restricted to one model type ignores newer versions of other types."""
+        train_features, train_labels, _, _ = data
+        approximate = approx_kernel.ApproxKernelClassifier("nystroem", 50, gamma=0.01).fit(train_features,
+                                                                                           train_labels)
+        model_artifact.export_model(approximate, tmp_path / "20260101-000000")
+        exact = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(train_features, train_labels)
+        model_artifact.export_model(exact, tmp_path / "20260201-000000")
+        registry = model_registry.ModelRegistry(tmp_path, watch_interval=0, model_type="nystroem-linear")
+        registry.start()
+        assert registry.versions() == ["20260101-000000"]
+        assert registry.current().describe()["model_type"] == "nystroem-linear"
+        assert model_registry.ModelRegistry(tmp_path, watch_interval=0, model_type="").versions() == [
+            "20260101-000000", "20260201-000000"]
@@ -0,0 +1,144 @@
+"""
+Unit tests for the SQLite-backed asynchronous batch job queue.
+
+Tests cover:
+1. Submitting a job and reading its status and results in input order
+2. Per-file errors and failed jobs
+3. Jobs surviving a restart and resuming with their unfinished files
+4. Streaming results while a job is still running
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import batch_jobs
+
+
+def label_by_length(raw_images):
+    """Stand-in classifier: rejects uploads with an odd number of bytes, fails on empty ones."""
+    return [{"error": "empty upload"} if not raw else {"Raw prediction": len(raw) % 2}
+            for raw in raw_images]
+
+
+def wait_for(queue, job_id, timeout=10):
+    """Polls the job until it is finished and returns its final status."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.status(job_id)
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish: {queue.status(job_id)}")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite")
+
+
+class TestJobQueue:
+    """Tests for batch_jobs.JobQueue."""
+
+    def test_results_in_input_order(self, db_path):
+        """Ensures every file gets its result, in input order, across several chunks."""
+        queue = batch_jobs.JobQueue(label_by_length, db_path=db_path, chunk_size=2)
+        files = [(f"img{i}.jpg", b"x" * (i + 1)) for i in range(5)]
+        job_id = queue.submit(files)
+        status = wait_for(queue, job_id)
+        queue.stop()
+        assert (status["status"], status["total"], status["completed"], status["failed"]) == ("done", 5, 5, 0)
+        results = list(queue.iter_results(job_id, wait=False))
+        assert [result["File"] for result in results] == [name for name, _ in files]
+        assert [result["Raw prediction"] for result in results] == [1, 0, 1, 0, 1]
+
+    def test_file_errors_do_not_fail_the_job(self, db_path):
+        """Verifies that an unreadable upload is reported per file while the others are classified."""
+        queue = batch_jobs.JobQueue(label_by_length, db_path=db_path)
+        job_id = queue.submit([("good.jpg", b"ab"), ("empty.jpg", b"")])
+        status = wait_for(queue, job_id)
+        queue.stop()
+        assert (status["status"], status["failed"]) == ("done", 1)
+        results = list(queue.iter_results(job_id, wait=False))
+        assert results[1] == {"File": "empty.jpg", "error": "empty upload"}
+
+    def test_exception_fails_the_job(self, db_path):
+        """Ensures an exception from the classifier marks the job failed with its message."""
+        def broken(raw_images):
+            raise RuntimeError("model unavailable")
+
+        queue = batch_jobs.JobQueue(broken, db_path=db_path)
+        job_id = queue.submit([("a.jpg", b"a")])
+        status = wait_for(queue, job_id)
+        queue.stop()
+        assert (status["status"], status["error"]) == ("failed", "model unavailable")
+
+    def test_unknown_job(self, db_path):
+        """Verifies that an unknown job id has no status."""
+        queue = batch_jobs.JobQueue(label_by_length, db_path=db_path)
+        assert queue.status("missing") is None
+
+    def test_job_survives_restart(self, db_path):
+        """Ensures a job queued before a restart is picked up by the next process's queue."""
+        first = batch_jobs.JobQueue(label_by_length, db_path=db_path)
+        # Storing the job without starting workers, as if the process died right after the POST
+        first.start = lambda: None
+        job_id = first.submit([("a.jpg", b"a"), ("b.jpg", b"bb")])
+        assert first.status(job_id)["status"] == "queued"
+
+        second = batch_jobs.JobQueue(label_by_length, db_path=db_path)
+        second.resume_pending()
+        status = wait_for(second, job_id)
+        second.stop()
+        assert (status["status"], status["completed"]) == ("done", 2)
+
+    def test_abandoned_job_resumes_with_unfinished_files(self, db_path):
+        """Verifies that a stale running job is claimed again and only its unfinished files are redone."""
+        seen = []
+        first = batch_jobs.JobQueue(label_by_length, db_path=db_path, chunk_size=1)
+
+        def crash_after_first_chunk(raw_images):
+            # Stopping the worker loop leaves the job "running" after one chunk, like a killed process
+            first._stop.set()
+            seen.extend(raw_images)
+            return label_by_length(raw_images)
+
+        first.process_fn = crash_after_first_chunk
+        first.start = lambda: None
+        job_id = first.submit([("a.jpg", b"a"), ("b.jpg", b"bb")])
+        assert first._claim() == job_id
+        first._process(job_id)
+        assert first.status(job_id)["status"] == "running"
+
+        def record(raw_images):
+            seen.extend(raw_images)
+            return label_by_length(raw_images)
+
+        second = batch_jobs.JobQueue(record, db_path=db_path, stale_seconds=0)
+        second.start()
+        status = wait_for(second, job_id)
+        second.stop()
+        assert (status["status"], status["completed"]) == ("done", 2)
+        assert seen == [b"a", b"bb"]
+        assert [result["File"] for result in second.iter_results(job_id, wait=False)] == ["a.jpg", "b.jpg"]
+
+    def test_streaming_waits_for_running_job(self, db_path):
+        """Ensures iter_results keeps yielding until the job is finished."""
+        release = threading.Event()
+
+        def slow(raw_images):
+            release.wait(5)
+            return label_by_length(raw_images)
+
+        queue = batch_jobs.JobQueue(slow, db_path=db_path, chunk_size=1)
+        job_id = queue.submit([("a.jpg", b"a"), ("b.jpg", b"bb")])
+        assert list(queue.iter_results(job_id, wait=False)) == []
+        threading.Timer(0.1, release.set).start()
+        results = list(queue.iter_results(job_id, poll_interval=0.02))
+        queue.stop()
+        assert [result["File"] for result in results] == ["a.jpg", "b.jpg"]
@@ -0,0 +1,323 @@
+"""
+Unit tests for the streaming batch client in batch_predict.py.
+
+Tests cover:
+1. Chunking, bounded in-flight requests and per-chunk bookkeeping
+2. JSON and JSON-lines result files and resuming from them
+3. Failed chunks being left for the next run
+4. The watch mode sending images as they arrive and resuming from its checkpoint
+5. Sharded runs claiming files through the database and merging their results
+6. Requesting scores and reading the compact columns layout
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("mysql.connector")
+pytest.importorskip("requests")
+
+import batch_predict
+import batch_response
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = json.dumps(payload)
+        self.headers = {"X-Model-Version": "20260101-000000"} if status_code == 200 else {}
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Answers /predict_batch like the Flask app and tracks concurrent requests."""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.chunks = []
+        self.urls = []
+        self.params = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def post(self, url, files, timeout, params=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            names = [name for _, (name, _) in files]
+            self.chunks.append(names)
+            self.urls.append(url)
+            self.params.append(params or {})
+            if self.fail_on in names:
+                return FakeResponse(400, {"error": "Error processing one of the files"})
+            params = params or {}
+            scores = [0.5] * len(names) if params.get("scores") else None
+            return FakeResponse(200, json.loads(batch_response.encode_batch(
+                names, [0] * len(names), scores, params.get("scores"), params.get("layout", "records"))))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def image_folder(tmp_path):
+    """Creates ten small stand-in images plus a file the client must ignore."""
+    folder = tmp_path / "night_img"
+    folder.mkdir()
+    for index in range(10):
+        (folder / f"cast_{index:02d}.jpeg").write_bytes(b"jpeg bytes")
+    (folder / "notes.txt").write_text("not an image")
+    return folder
+
+
+class TestStreamBatches:
+    """Tests for batch_predict.stream_batches."""
+
+    def test_chunks_and_bookkeeping(self, image_folder, tmp_path):
+        """Ensures every image is sent once, in chunks, and marked processed per chunk."""
+        session = FakeSession()
+        writer = batch_predict.JsonResultWriter(tmp_path / "results.json")
+        marked = []
+        names = batch_predict.iter_pending_files(image_folder, set())
+        completed, failed = batch_predict.stream_batches(names, writer, marked.append, session, folder=image_folder,
+                                                         chunk_size=4, max_in_flight=2)
+        assert (completed, failed) == (10, 0)
+        assert session.params[0] == {"layout": "columns"}
+        assert [len(chunk) for chunk in marked] == [4, 4, 2]
+        assert session.max_in_flight <= 2
+        writer.close()
+        saved = json.loads((tmp_path / "results.json").read_text())["Batch results"]
+        assert sorted(result["File"] for result in saved) == [f"cast_{index:02d}.jpeg" for index in range(10)]
+
+    def test_failed_chunk_is_left_for_next_run(self, image_folder, tmp_path):
+        """Verifies that one failing chunk does not discard or mark the others."""
+        names = sorted(batch_predict.iter_pending_files(image_folder, set()))
+        session = FakeSession(fail_on=names[5])
+        writer = batch_predict.JsonLinesResultWriter(tmp_path / "results.jsonl")
+        marked = []
+        completed, failed = batch_predict.stream_batches(names, writer, marked.extend, session, folder=image_folder,
+                                                         chunk_size=4, max_in_flight=3)
+        assert (completed, failed) == (6, 1)
+        assert names[5] not in marked
+        assert writer.done_files() == set(marked)
+
+    def test_scores_are_requested_and_saved(self, image_folder, tmp_path):
+        """Verifies that requested scores are sent as a parameter and kept with every result."""
+        session = FakeSession()
+        writer = batch_predict.JsonLinesResultWriter(tmp_path / "results.jsonl")
+        names = batch_predict.iter_pending_files(image_folder, set())
+        batch_predict.stream_batches(names, writer, lambda chunk: None, session, folder=image_folder, chunk_size=4,
+                                     scores="probability")
+        assert all(params == {"layout": "columns", "scores": "probability"} for params in session.params)
+        saved = [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+        assert len(saved) == 10
+        assert all(result["Probability"] == 0.5 and result["Decision"] == "approved" for result in saved)
+
+    def test_skips_processed_files(self, image_folder):
+        """Ensures already processed files and non-images are never listed."""
+        pending = set(batch_predict.iter_pending_files(image_folder, {"cast_00.jpeg"}))
+        assert len(pending) == 9
+        assert "cast_00.jpeg" not in pending and "notes.txt" not in pending
+
+
+class TestResultWriters:
+    """Tests for resuming from the result files."""
+
+    def test_json_writer_resumes_and_replaces_resent_files(self, tmp_path):
+        """Verifies that a reopened JSON file keeps earlier results, an interrupted run's journal is picked up and
+        a re-sent file replaces its entry."""
+        path = tmp_path / "results.json"
+        first = batch_predict.JsonResultWriter(path)
+        first.append([{"File": "a.jpeg", "Raw prediction": 0}])
+        first.close()
+        interrupted = batch_predict.JsonResultWriter(path)
+        interrupted.append([{"File": "a.jpeg", "Raw prediction": 1}])
+        resumed = batch_predict.JsonResultWriter(path)
+        assert resumed.done_files() == {"a.jpeg"}
+        resumed.append([{"File": "b.jpeg", "Raw prediction": 0}])
+        assert json.loads(path.read_text())["Batch results"] == [{"File": "a.jpeg", "Raw prediction": 0}]
+        resumed.close()
+        saved = json.loads(path.read_text())["Batch results"]
+        assert saved == [{"File": "a.jpeg", "Raw prediction": 1}, {"File": "b.jpeg", "Raw prediction": 0}]
+        assert not resumed.journal.path.exists()
+
+    def test_jsonl_writer_ignores_truncated_line(self, tmp_path):
+        """Ensures a line cut short by a crash does not stop the resume."""
+        path = tmp_path / "results.jsonl"
+        batch_predict.JsonLinesResultWriter(path).append([{"File": "a.jpeg", "Raw prediction": 0}])
+        with open(path, "a") as f:
+            f.write('{"File": "b.jp')
+        assert batch_predict.JsonLinesResultWriter(path).done_files() == {"a.jpeg"}
+
+    def test_columnar_writer_streams_chunks_with_model_version(self, image_folder, tmp_path):
+        """Verifies that each chunk becomes one block, with the model version of the response kept."""
+        path = tmp_path / "batch_results_20260301.npb"
+        names = batch_predict.iter_pending_files(image_folder, set())
+        batch_predict.stream_batches(names, batch_predict.ColumnarResultWriter(path), lambda chunk: None,
+                                     FakeSession(), folder=image_folder, chunk_size=4)
+        assert len(list(batch_predict.result_store.iter_blocks(path))) == 3
+        assert batch_predict.ColumnarResultWriter(path).done_files() == {f"cast_{index:02d}.jpeg"
+                                                                          for index in range(10)}
+        history = batch_predict.result_store.load_history(tmp_path)
+        assert set(history["model_version"].tolist()) == {"20260101-000000"}
+
+
+class TestWatch:
+    """Tests for batch_predict.watch."""
+
+    def run_watch(self, monkeypatch, folder, output, session, finished, add_files=()):
+        """Runs the watcher in a thread, adds files while it runs and stops it once finished(marked) is true."""
+        marked = []
+        monkeypatch.setattr(batch_predict, "iter_unprocessed_files",
+                            lambda names: [name for name in names if name != "old.jpeg"])
+        monkeypatch.setattr(batch_predict, "mark_files_processed", marked.extend)
+        monkeypatch.setattr(batch_predict, "make_session", lambda max_in_flight: session)
+        monkeypatch.setattr(FakeSession, "__enter__", lambda self: self, raising=False)
+        monkeypatch.setattr(FakeSession, "__exit__", lambda self, *args: None, raising=False)
+        stop = threading.Event()
+        result = {}
+        thread = threading.Thread(target=lambda: result.setdefault(
+            "stats", batch_predict.watch(batch_size=4, max_wait=0.1, folder=folder, output=output, stop=stop,
+                                         poll_interval=0.2)))
+        thread.start()
+        for name in add_files:
+            (folder / name).write_bytes(b"jpeg bytes")
+        deadline = time.monotonic() + 10
+        while not finished(marked) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stop.set()
+        thread.join(10)
+        return marked, result["stats"]
+
+    def test_sends_new_images_and_resumes(self, image_folder, tmp_path, monkeypatch):
+        """Ensures existing and new images are sent once in small batches, and a restart sends only newer ones."""
+        (image_folder / "old.jpeg").write_bytes(b"jpeg bytes")
+        output = tmp_path / "night_predict"
+        session = FakeSession()
+        marked, stats = self.run_watch(monkeypatch, image_folder, output, session, lambda marked: len(marked) == 11,
+                                       add_files=["new_0.jpeg"])
+        assert sorted(marked) == sorted(path.name for path in image_folder.glob("cast_*.jpeg")) + ["new_0.jpeg"]
+        assert all(len(chunk) <= 4 for chunk in session.chunks)
+        assert stats.total == 11
+        # Processed outside the watcher: checkpointed, never sent
+        assert "old.jpeg" not in sum(session.chunks, [])
+        assert (output / batch_predict.WATCH_CHECKPOINT_NAME).exists()
+
+        restarted = FakeSession()
+        marked, _ = self.run_watch(monkeypatch, image_folder, output, restarted, lambda marked: len(marked) == 1,
+                                   add_files=["new_1.jpeg"])
+        assert marked == ["new_1.jpeg"]
+        assert restarted.chunks == [["new_1.jpeg"]]
+
+    def test_failed_files_are_retried(self, image_folder, tmp_path, monkeypatch):
+        """Verifies that a failing chunk is re-sent a limited number of times while the others are saved."""
+        monkeypatch.setattr(batch_predict, "WATCH_RETRIES", 1)
+        session = FakeSession(fail_on="cast_03.jpeg")
+        sends = lambda: sum(chunk.count("cast_03.jpeg") for chunk in session.chunks)
+        marked, _ = self.run_watch(monkeypatch, image_folder, tmp_path / "night_predict", session,
+                                   lambda marked: sends() == 2 and len(marked) >= 6)
+        assert "cast_03.jpeg" not in marked and len(marked) >= 6
+        assert sends() == 2
+
+
+class FakeClaims:
+    """The claim bookkeeping of predicted_images, in memory."""
+
+    def __init__(self):
+        self.claimed_by = {}
+        self.processed = []
+        self.released = []
+        self.lock = threading.Lock()
+
+    def claim(self, config, names, worker_id, lease_seconds):
+        with self.lock:
+            return [name for name in names
+                    if name not in self.processed and self.claimed_by.setdefault(name, worker_id) == worker_id]
+
+    def release(self, config, names, worker_id):
+        with self.lock:
+            self.released.extend(names)
+            for name in names:
+                if self.claimed_by.get(name) == worker_id:
+                    del self.claimed_by[name]
+
+    def mark(self, names):
+        # Marking is an upsert: a worker re-marking results found in the shared shard file adds nothing
+        with self.lock:
+            self.processed.extend(name for name in names if name not in self.processed)
+
+
+class TestShards:
+    """Tests for the sharded batch mode."""
+
+    @pytest.fixture
+    def claims(self, monkeypatch):
+        """Routes claims and bookkeeping to a FakeClaims and makes every session a FakeSession."""
+        claims = FakeClaims()
+        monkeypatch.setattr(batch_predict.dbAccessFunctions, "claim_files", claims.claim)
+        monkeypatch.setattr(batch_predict.dbAccessFunctions, "release_claims", claims.release)
+        monkeypatch.setattr(batch_predict, "mark_files_processed", claims.mark)
+        monkeypatch.setattr(batch_predict, "iter_unprocessed_files",
+                            lambda names: [name for name in names if name not in claims.processed])
+        monkeypatch.setattr(FakeSession, "__enter__", lambda self: self, raising=False)
+        monkeypatch.setattr(FakeSession, "__exit__", lambda self, *args: None, raising=False)
+        return claims
+
+    def test_shards_are_stable_and_cover_every_file(self):
+        """Ensures every name belongs to exactly one shard, the same on every call."""
+        names = [f"cast_{index}.jpeg" for index in range(400)]
+        shards = [batch_predict.shard_of(name, 4) for name in names]
+        assert shards == [batch_predict.shard_of(name, 4) for name in names]
+        assert all(60 < shards.count(shard) < 140 for shard in range(4))
+
+    def test_shards_send_each_file_once_and_merge(self, image_folder, tmp_path, monkeypatch, claims):
+        """Verifies that concurrent shard workers, two of them on the same shard, send every image once."""
+        session = FakeSession()
+        monkeypatch.setattr(batch_predict, "make_session", lambda max_in_flight: session)
+        output = tmp_path / "night_predict"
+        endpoints = ["http://127.0.0.1:5001/predict_batch", "http://127.0.0.1:5002/predict_batch"]
+        workers = [threading.Thread(target=batch_predict.run_shard, args=(shard, 3, endpoints[shard % 2]),
+                                    kwargs={"chunk_size": 2, "folder": image_folder, "output": output,
+                                            "worker_id": f"worker-{index}"})
+                   for index, shard in enumerate([0, 1, 2, 2])]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(10)
+        sent = sum(session.chunks, [])
+        assert sorted(sent) == [f"cast_{index:02d}.jpeg" for index in range(10)]
+        for names, endpoint in zip(session.chunks, session.urls):
+            assert all(endpoints[batch_predict.shard_of(name, 3) % 2] == endpoint for name in names)
+        assert sorted(claims.processed) == sorted(sent)
+
+        assert batch_predict.merge_shard_results(output, "json") == 10
+        merged = next(output.glob("batch_results_*.json"))
+        assert sorted(result["File"] for result in json.loads(merged.read_text())["Batch results"]) == sorted(sent)
+        assert not list((output / batch_predict.SHARD_FOLDER_NAME).iterdir())
+        # A second run finds nothing left to do
+        assert batch_predict.run_shard(0, 3, folder=image_folder, output=output) == (0, 0)
+
+    def test_failed_chunk_releases_its_claims(self, image_folder, tmp_path, monkeypatch, claims):
+        """Ensures the files of a failed chunk are released for another worker."""
+        session = FakeSession(fail_on="cast_00.jpeg")
+        monkeypatch.setattr(batch_predict, "make_session", lambda max_in_flight: session)
+        shard = batch_predict.shard_of("cast_00.jpeg", 2)
+        completed, failed = batch_predict.run_shard(shard, 2, chunk_size=1, folder=image_folder,
+                                                    output=tmp_path / "night_predict", worker_id="worker")
+        assert failed == 1 and claims.released == ["cast_00.jpeg"]
+        assert "cast_00.jpeg" not in claims.claimed_by and "cast_00.jpeg" not in claims.processed
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,55 @@
+"""
+Unit tests for the vectorized /predict_batch response encoding.
+
+Tests cover:
+1. Mapping label codes to decisions, including unknown codes
+2. The records and columns layouts, with and without scores
+3. Rejecting unknown layouts and score kinds
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import batch_response
+
+
+class TestBatchResponse:
+    """Tests for batch_response.encode_batch and its helpers."""
+
+    def test_decision_names(self):
+        """Ensures every label code gets its decision and other codes are unknown."""
+        names = batch_response.decision_names(np.array([0, 1, 2, -1, 1]))
+        assert names.tolist() == ["approved", "rejected", "unknown", "unknown", "rejected"]
+
+    def test_records_layout(self):
+        """Verifies that the default layout lists one result object per file, as before."""
+        body = json.loads(batch_response.encode_batch(["a.jpg", "b.jpg"], np.array([0, 1])))
+        assert body == {"Batch results": [
+            {"File": "a.jpg", "Raw prediction": 0, "Decision": "approved"},
+            {"File": "b.jpg", "Raw prediction": 1, "Decision": "rejected"},
+        ]}
+
+    def test_columns_layout_with_scores(self):
+        """Ensures the columns layout holds parallel arrays with rounded scores and converts back to records."""
+        body = json.loads(batch_response.encode_batch(["a.jpg", "b.jpg"], np.array([0, 1]),
+                                                      scores=np.array([0.123456, 0.98766]),
+                                                      score_kind="probability", layout="columns"))
+        columns = body["Batch columns"]
+        assert columns["File"] == ["a.jpg", "b.jpg"]
+        assert columns["Decision"] == ["approved", "rejected"]
+        assert columns["Probability"] == [0.1235, 0.9877]
+        assert batch_response.columns_to_results(columns)[1] == {
+            "File": "b.jpg", "Raw prediction": 1, "Decision": "rejected", "Probability": 0.9877}
+
+    def test_invalid_options(self):
+        """Verifies that unknown layouts and score kinds raise ValueError."""
+        with pytest.raises(ValueError):
+            batch_response.encode_batch(["a.jpg"], [0], layout="rows")
+        with pytest.raises(ValueError):
+            batch_response.encode_batch(["a.jpg"], [0], scores=[0.5], score_kind="margin")
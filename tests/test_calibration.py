@@ -0,0 +1,97 @@
+"""
+Unit tests for Platt scaling of SVM decision values.
+
+Tests cover:
+1. Recovering a known sigmoid from sampled labels
+2. Agreement with scikit-learn's sigmoid calibration
+3. Serializing the fitted parameters
+4. Out-of-fold decision values of the training set
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import calibration
+
+
+class TestPlattScaling:
+    """Tests for calibration.fit_platt and calibration.PlattScaling."""
+
+    def test_recovers_known_sigmoid(self):
+        """Ensures the fit recovers the sigmoid the labels were drawn from."""
+        random_state = np.random.RandomState(0)
+        decision_values = random_state.uniform(-3, 3, 20000)
+        true_probabilities = 1 / (1 + np.exp(-1.5 * decision_values + 0.5))
+        positive = random_state.rand(decision_values.size) < true_probabilities
+        scaling = calibration.fit_platt(decision_values, positive)
+        assert scaling.a == pytest.approx(-1.5, abs=0.1)
+        assert scaling.b == pytest.approx(0.5, abs=0.1)
+        np.testing.assert_allclose(scaling.probability(decision_values), true_probabilities, atol=0.03)
+
+    def test_matches_sklearn(self):
+        """Verifies that the parameters agree with scikit-learn's sigmoid calibration."""
+        sklearn_calibration = pytest.importorskip("sklearn.calibration")
+        random_state = np.random.RandomState(1)
+        decision_values = np.concatenate([random_state.normal(-1, 1, 300), random_state.normal(1, 1, 200)])
+        positive = np.repeat([False, True], [300, 200])
+        scaling = calibration.fit_platt(decision_values, positive)
+        a, b = sklearn_calibration._sigmoid_calibration(decision_values, positive.astype(int))
+        assert scaling.a == pytest.approx(a, rel=1e-3)
+        assert scaling.b == pytest.approx(b, rel=1e-3, abs=1e-4)
+
+    def test_probability_does_not_overflow(self):
+        """Ensures extreme decision values give probabilities of 0 and 1 without overflowing."""
+        scaling = calibration.PlattScaling(-1.0, 0.0)
+        with np.errstate(over="raise", invalid="raise"):
+            np.testing.assert_allclose(scaling.probability([-1e4, 1e4]), [0.0, 1.0])
+
+    def test_round_trip(self):
+        """Verifies that to_dict and from_dict round-trip and unknown calibrations are ignored."""
+        scaling = calibration.PlattScaling.from_dict(calibration.PlattScaling(-2.5, 0.25).to_dict())
+        assert (scaling.a, scaling.b) == (-2.5, 0.25)
+        assert calibration.PlattScaling.from_dict(None) is None
+        assert calibration.PlattScaling.from_dict({"method": "isotonic"}) is None
+        with pytest.raises(ValueError):
+            calibration.fit_platt([], [])
+
+
+class TestOutOfFoldDecisionValues:
+    """Tests for calibration.out_of_fold_decision_values."""
+
+    def test_matches_cross_val_predict(self):
+        """Ensures the decision values equal cross_val_predict's for the same stratified folds."""
+        svm = pytest.importorskip("sklearn.svm")
+        model_selection = pytest.importorskip("sklearn.model_selection")
+        random_state = np.random.RandomState(2)
+        features = random_state.rand(60, 5)
+        labels = np.repeat([0, 1], 30)
+        features[labels == 1] += 0.3
+        values = calibration.out_of_fold_decision_values(lambda: svm.SVC(gamma=0.5), features, labels, folds=3)
+        folds = model_selection.StratifiedKFold(3, shuffle=True, random_state=0)
+        expected = model_selection.cross_val_predict(svm.SVC(gamma=0.5), features, labels, cv=folds,
+                                                     method="decision_function")
+        np.testing.assert_allclose(values, expected)
+
+    def test_passes_fit_params(self):
+        """Verifies that fit parameters reach every fold's fit, for classifiers scikit-learn cannot clone."""
+        fitted = []
+
+        class MeanClassifier:
+            def fit(self, features, labels, epochs):
+                fitted.append((len(features), epochs))
+                self.mean = features[labels == 1].mean()
+                return self
+
+            def decision_function(self, features):
+                return features[:, 0] - self.mean
+
+        features = np.arange(20, dtype=np.float64).reshape(-1, 1)
+        labels = np.repeat([0, 1], 10)
+        values = calibration.out_of_fold_decision_values(MeanClassifier, features, labels, folds=5, epochs=3)
+        assert fitted == [(16, 3)] * 5
+        assert values.shape == (20,)
@@ -0,0 +1,168 @@
+"""
+Unit tests for the pooled database access layer in dbAccessFunctions.py.
+
+Tests cover:
+1. One pool per configuration, sized from the configuration
+2. Bulk writes issuing a single executemany and a single commit
+3. Upserts and batched processed-file lookups against the indexed schema
+4. Atomic claims of files for sharded batch workers
+"""
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("mysql.connector")
+
+import dbAccessFunctions
+import db_schema
+
+DB_CONFIG = {"host": "localhost", "user": "root", "password": "", "database": "reflask", "pool_size": 3}
+
+
+@pytest.fixture
+def pool_class():
+    """Replaces MySQLConnectionPool so no server is needed, and forgets pools between tests."""
+    dbAccessFunctions._pools.clear()
+    with patch("mysql.connector.pooling.MySQLConnectionPool") as pool_class:
+        yield pool_class
+    dbAccessFunctions._pools.clear()
+
+
+class TestConnectionPool:
+    """Tests for dbAccessFunctions.get_pool and get_db_connection."""
+
+    def test_pool_is_created_once_per_configuration(self, pool_class):
+        """Ensures repeated calls reuse the pool and pool_size comes from the configuration."""
+        first = dbAccessFunctions.get_pool(**DB_CONFIG)
+        second = dbAccessFunctions.get_pool(**DB_CONFIG)
+        assert first is second
+        pool_class.assert_called_once()
+        kwargs = pool_class.call_args.kwargs
+        assert kwargs["pool_size"] == 3
+        assert kwargs["database"] == "reflask"
+
+    def test_connections_come_from_the_pool(self, pool_class):
+        """Verifies that helpers take their connection from the pool."""
+        connection = dbAccessFunctions.get_db_connection(**DB_CONFIG)
+        assert connection is pool_class.return_value.get_connection.return_value
+
+
+class TestBulkWrites:
+    """Tests for the batched INSERT helpers."""
+
+    def test_save_processed_files_commits_once(self, pool_class):
+        """Ensures a chunk of files is one executemany, one commit and one returned connection."""
+        connection = pool_class.return_value.get_connection.return_value
+        dbAccessFunctions.save_processed_files(DB_CONFIG, ["a.jpeg", "b.jpeg", "c.jpeg"])
+        cursor = connection.cursor.return_value
+        cursor.executemany.assert_called_once()
+        assert cursor.executemany.call_args.args[1] == [("a.jpeg",), ("b.jpeg",), ("c.jpeg",)]
+        connection.commit.assert_called_once()
+        connection.close.assert_called_once()
+
+    def test_store_results_commits_once(self, pool_class):
+        """Ensures classification results are written with a single executemany."""
+        connection = pool_class.return_value.get_connection.return_value
+        dbAccessFunctions.store_results_to_db(DB_CONFIG, [0, 1], [0, 0], ["x.jpeg", "y.jpeg"])
+        cursor = connection.cursor.return_value
+        assert cursor.executemany.call_args.args[1] == [("x.jpeg", 0, 0), ("y.jpeg", 1, 0)]
+        connection.commit.assert_called_once()
+
+    def test_empty_chunk_skips_the_database(self, pool_class):
+        """Verifies that nothing is sent for an empty list of files."""
+        dbAccessFunctions.save_processed_files(DB_CONFIG, [])
+        pool_class.assert_not_called()
+
+
+class TestIndexedLookups:
+    """Tests for the index-backed duplicate handling and processed-file lookups."""
+
+    def test_insert_uses_insert_ignore(self, pool_class):
+        """Ensures image metadata is inserted without a COUNT(*) pre-check."""
+        connection = pool_class.return_value.get_connection.return_value
+        dbAccessFunctions.insert_image_metadata(DB_CONFIG, "datapp/test/a.jpeg", "approved")
+        cursor = connection.cursor.return_value
+        cursor.execute.assert_called_once()
+        assert cursor.execute.call_args.args[0].startswith("INSERT IGNORE INTO images")
+
+    def test_unprocessed_files_are_looked_up_in_batches(self, pool_class):
+        """Verifies the set difference is computed from batched IN queries, keeping candidate order."""
+        cursor = pool_class.return_value.get_connection.return_value.cursor.return_value
+        cursor.fetchall.side_effect = [[("b.jpeg",)], [("e.jpeg",)]]
+        names = ["a.jpeg", "b.jpeg", "c.jpeg", "d.jpeg", "e.jpeg"]
+        unprocessed = dbAccessFunctions.fetch_unprocessed_files(DB_CONFIG, names, batch_size=3)
+        assert unprocessed == ["a.jpeg", "c.jpeg", "d.jpeg"]
+        queries = [call.args for call in cursor.execute.call_args_list]
+        assert [params for _, params in queries] == [names[:3], names[3:]]
+        assert all("WHERE file_name IN (" in query for query, _ in queries)
+
+    def test_no_candidates_skip_the_database(self, pool_class):
+        """Ensures an empty candidate list never opens a connection."""
+        assert dbAccessFunctions.fetch_unprocessed_files(DB_CONFIG, []) == []
+        pool_class.assert_not_called()
+
+    def test_schema_declares_unique_indexes(self, pool_class):
+        """Verifies that every table is created with its unique index."""
+        cursor = pool_class.return_value.get_connection.return_value.cursor.return_value
+        db_schema.create_tables(DB_CONFIG)
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        assert len(statements) == len(db_schema.TABLES)
+        for (table_name, index_name, column), statement in zip(db_schema.UNIQUE_INDEXES, statements):
+            assert f"CREATE TABLE IF NOT EXISTS {table_name}" in statement
+            assert f"UNIQUE KEY {index_name} ({column})" in statement
+
+
+class TestClaims:
+    """Tests for the claim helpers used by sharded batch workers."""
+
+    def test_claim_is_one_upsert_then_a_lookup(self, pool_class):
+        """Ensures a claim only takes unprocessed rows whose lease expired, and returns this worker's claims."""
+        connection = pool_class.return_value.get_connection.return_value
+        cursor = connection.cursor.return_value
+        cursor.fetchall.return_value = [("b.jpeg",)]
+        claimed = dbAccessFunctions.claim_files(DB_CONFIG, ["a.jpeg", "b.jpeg"], "host:1:0", 900)
+        assert claimed == ["b.jpeg"]
+        upsert, rows = cursor.executemany.call_args.args
+        assert "ON DUPLICATE KEY UPDATE" in upsert
+        assert "prediction_date IS NULL AND (claimed_until IS NULL OR claimed_until < NOW())" in upsert
+        assert rows == [("a.jpeg", "host:1:0", 900), ("b.jpeg", "host:1:0", 900)]
+        lookup, params = cursor.execute.call_args.args
+        assert "claimed_by = %s AND prediction_date IS NULL" in lookup
+        assert params == ["a.jpeg", "b.jpeg", "host:1:0"]
+        connection.commit.assert_called_once()
+
+    def test_processing_ends_claims_and_release_is_scoped(self, pool_class):
+        """Verifies that saving a file clears its claim and a worker only releases its own claims."""
+        cursor = pool_class.return_value.get_connection.return_value.cursor.return_value
+        dbAccessFunctions.save_processed_files(DB_CONFIG, ["a.jpeg"])
+        assert "claimed_by = NULL" in cursor.executemany.call_args.args[0]
+        dbAccessFunctions.release_claims(DB_CONFIG, ["a.jpeg"], "host:1:0")
+        query, params = cursor.execute.call_args.args
+        assert query.startswith("UPDATE predicted_images SET claimed_by = NULL")
+        assert "AND claimed_by = %s" in query and params == ["a.jpeg", "host:1:0"]
+
+    def test_claimed_rows_count_as_unprocessed(self, pool_class):
+        """Ensures lookups of processed files ignore rows that are only claimed."""
+        cursor = pool_class.return_value.get_connection.return_value.cursor.return_value
+        cursor.fetchall.return_value = []
+        dbAccessFunctions.fetch_unprocessed_files(DB_CONFIG, ["a.jpeg"])
+        assert "prediction_date IS NOT NULL" in cursor.execute.call_args.args[0]
+
+    def test_schema_adds_claim_columns(self, pool_class):
+        """Verifies that existing predicted_images tables get the claim columns."""
+        cursor = pool_class.return_value.get_connection.return_value.cursor.return_value
+        cursor.fetchone.return_value = (0,)
+        db_schema.ensure_columns(DB_CONFIG)
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        assert "ALTER TABLE predicted_images ADD COLUMN claimed_by VARCHAR(64)" in statements
+        assert "ALTER TABLE predicted_images ADD COLUMN claimed_until DATETIME" in statements
+        assert "claimed_by VARCHAR(64)" in db_schema.TABLES["predicted_images"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
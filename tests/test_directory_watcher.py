@@ -0,0 +1,159 @@
+"""
+Unit tests for the directory watcher behind the watch mode of batch_predict.py.
+
+Tests cover:
+1. Completed files detected through inotify and through polling, never half-written ones
+2. The checkpoint skipping processed files and history after a restart
+3. Size- and time-bounded batches
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import directory_watcher
+
+EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def poll_until(watcher, count, timeout=5.0):
+    """Polls until count files were reported or timeout seconds passed."""
+    arrivals = []
+    deadline = time.monotonic() + timeout
+    while len(arrivals) < count and time.monotonic() < deadline:
+        arrivals.extend(watcher.poll(0.05))
+    return arrivals
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """An empty watched folder."""
+    folder = tmp_path / "night_img"
+    folder.mkdir()
+    return folder
+
+
+class TestCheckpoint:
+    """Tests for the processed-files checkpoint."""
+
+    def test_restart_skips_recorded_files_and_history(self, tmp_path):
+        """Ensures a reloaded checkpoint rejects recorded names and files older than its window."""
+        path = tmp_path / "checkpoint.json"
+        checkpoint = directory_watcher.Checkpoint(path, window_seconds=60)
+        assert checkpoint.is_new("old.jpg", 1)
+        checkpoint.record({"a.jpg": 100 * 10 ** 9, "b.jpg": 200 * 10 ** 9})
+        reloaded = directory_watcher.Checkpoint(path, window_seconds=60)
+        assert not reloaded.is_new("b.jpg", 200 * 10 ** 9)
+        # Older than the window before the newest file: history, whatever its name
+        assert not reloaded.is_new("old.jpg", 100 * 10 ** 9)
+        assert reloaded.is_new("late.jpg", 150 * 10 ** 9)
+        # Names outside the window are no longer stored
+        assert set(reloaded.recent) == {"b.jpg"}
+
+
+class TestDirectoryWatcher:
+    """Tests for detecting completed files."""
+
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_detects_new_files_once(self, folder, tmp_path, use_inotify):
+        """Verifies that files present at start-up and files added later are each reported once."""
+        (folder / "before.jpg").write_bytes(b"jpeg")
+        (folder / "notes.txt").write_text("not an image")
+        checkpoint = directory_watcher.Checkpoint(tmp_path / "checkpoint.json")
+        watcher = directory_watcher.DirectoryWatcher(folder, checkpoint, EXTENSIONS, poll_interval=0.1,
+                                                     use_inotify=use_inotify)
+        try:
+            assert [arrival.name for arrival in poll_until(watcher, 1)] == ["before.jpg"]
+            (folder / "after.png").write_bytes(b"png")
+            assert [arrival.name for arrival in poll_until(watcher, 1)] == ["after.png"]
+            assert poll_until(watcher, 1, timeout=0.5) == []
+        finally:
+            watcher.close()
+
+    def test_inotify_reports_moved_in_file(self, folder, tmp_path):
+        """Ensures a file renamed into the folder is reported without a scan."""
+        checkpoint = directory_watcher.Checkpoint(tmp_path / "checkpoint.json")
+        watcher = directory_watcher.DirectoryWatcher(folder, checkpoint, EXTENSIONS, poll_interval=0.1)
+        if watcher.mode != "inotify":
+            pytest.skip("inotify is not available")
+        try:
+            poll_until(watcher, 1, timeout=0.3)
+            (tmp_path / "upload.jpg.part").write_bytes(b"jpeg")
+            os.replace(tmp_path / "upload.jpg.part", folder / "upload.jpg")
+            assert [arrival.name for arrival in poll_until(watcher, 1)] == ["upload.jpg"]
+        finally:
+            watcher.close()
+
+    def test_polling_waits_for_file_to_settle(self, folder, tmp_path):
+        """Verifies that a file still growing between two scans is not reported yet."""
+        checkpoint = directory_watcher.Checkpoint(tmp_path / "checkpoint.json")
+        watcher = directory_watcher.DirectoryWatcher(folder, checkpoint, EXTENSIONS, poll_interval=0.5,
+                                                     use_inotify=False)
+        with open(folder / "growing.jpg", "wb") as f:
+            f.write(b"first half")
+            f.flush()
+            assert watcher.poll(1) == []
+            time.sleep(0.4)
+            f.write(b"second half")
+            f.flush()
+            # The next scan, 0.1 s later, sees a new size
+            assert watcher.poll(1) == []
+        assert [arrival.name for arrival in poll_until(watcher, 1)] == ["growing.jpg"]
+
+    def test_recorded_and_released_files(self, folder, tmp_path):
+        """Ensures recorded files stay skipped while released ones are reported again."""
+        for name in ("a.jpg", "b.jpg"):
+            (folder / name).write_bytes(b"jpeg")
+        checkpoint = directory_watcher.Checkpoint(tmp_path / "checkpoint.json")
+        watcher = directory_watcher.DirectoryWatcher(folder, checkpoint, EXTENSIONS, poll_interval=0.1,
+                                                     use_inotify=False)
+        arrivals = {arrival.name: arrival.time_ns for arrival in poll_until(watcher, 2)}
+        checkpoint.record({"a.jpg": arrivals["a.jpg"]})
+        watcher.done(["a.jpg"])
+        watcher.release(["b.jpg"])
+        assert [arrival.name for arrival in poll_until(watcher, 1)] == ["b.jpg"]
+        # A restarted watcher only finds the file that was not recorded
+        restarted = directory_watcher.DirectoryWatcher(folder, directory_watcher.Checkpoint(checkpoint.path),
+                                                       EXTENSIONS, poll_interval=0.1, use_inotify=False)
+        assert [arrival.name for arrival in poll_until(restarted, 1)] == ["b.jpg"]
+
+
+class FakeWatcher:
+    """Reports prepared arrivals, one list per poll."""
+
+    def __init__(self, polls):
+        self.polls = list(polls)
+
+    def poll(self, timeout):
+        if self.polls:
+            return self.polls.pop(0)
+        time.sleep(timeout)
+        return []
+
+
+class TestIterBatches:
+    """Tests for size- and time-bounded batching."""
+
+    def test_full_batches_are_sent_at_once(self):
+        """Ensures a burst is split into batches of at most batch_size."""
+        arrivals = [directory_watcher.Arrival(f"{index}.jpg", index) for index in range(5)]
+        batches = directory_watcher.iter_batches(FakeWatcher([arrivals]), batch_size=2, max_wait=10)
+        assert [len(next(batches)) for _ in range(2)] == [2, 2]
+
+    def test_partial_batch_is_sent_after_max_wait(self):
+        """Verifies that a lone file is sent once it has waited max_wait."""
+        stop = threading.Event()
+        watcher = FakeWatcher([[directory_watcher.Arrival("a.jpg", 0)]])
+        start = time.monotonic()
+        sent = []
+        for batch in directory_watcher.iter_batches(watcher, batch_size=8, max_wait=0.2, stop=stop):
+            if batch:
+                sent.append((time.monotonic() - start, [name for name, _ in batch]))
+                stop.set()
+        assert len(sent) == 1 and sent[0][1] == ["a.jpg"]
+        assert 0.15 <= sent[0][0] < 1.0
@@ -0,0 +1,104 @@
+"""
+Unit tests for the optional feature reduction stored with the model.
+
+Tests cover:
+1. Parsing reduction settings
+2. The PCA projection matching sklearn's PCA
+3. Reduced and float16 artifacts round-tripping into predictors that take raw HOG features
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+svm = pytest.importorskip("sklearn.svm")
+
+import feature_reduction
+import model_artifact
+import model_registry
+
+
+@pytest.fixture(scope="module")
+def data():
+    """HOG-sized features of two shifted classes, split into training and test rows."""
+    random_state = np.random.RandomState(0)
+    features = random_state.rand(160, 2592) * 0.2
+    labels = np.repeat([0, 1], 80)
+    features[labels == 1, :1296] += 0.05
+    return features[::2], labels[::2], features[1::2]
+
+
+class TestSettings:
+    """Tests for feature_reduction.FeatureReduction.parse."""
+
+    @pytest.mark.parametrize("setting, n_components, storage_dtype", [
+        ("none", None, None), ("float16", None, np.float16), ("pca:256", 256, None),
+        ("PCA:64+float16", 64, np.float16), (None, None, None)])
+    def test_valid_settings(self, setting, n_components, storage_dtype):
+        """Ensures every documented setting is parsed and printed back in canonical form."""
+        reduction = feature_reduction.FeatureReduction.parse(setting)
+        assert reduction.n_components == n_components
+        assert reduction.storage_dtype == (np.dtype(storage_dtype) if storage_dtype else None)
+        assert feature_reduction.FeatureReduction.parse(str(reduction)).n_components == n_components
+
+    @pytest.mark.parametrize("setting", ["pca", "pca:abc", "pca:0", "int8", "pca:8+pca:4", "float16:2"])
+    def test_invalid_settings(self, setting):
+        """Verifies that malformed settings are rejected."""
+        with pytest.raises(ValueError):
+            feature_reduction.FeatureReduction.parse(setting)
+
+
+class TestPCAProjection:
+    """Tests for feature_reduction.PCAProjection."""
+
+    def test_matches_sklearn_pca(self, data):
+        """Ensures the projection equals sklearn's PCA up to the sign of each component."""
+        decomposition = pytest.importorskip("sklearn.decomposition")
+        train, _, test = data
+        projection = feature_reduction.PCAProjection.fit(train, 16, dtype=np.float64)
+        reference = decomposition.PCA(n_components=16, svd_solver="full").fit(train)
+        signs = np.sign(np.sum(projection.components * reference.components_, axis=1))
+        np.testing.assert_allclose(projection.transform(test), reference.transform(test) * signs, atol=1e-8)
+        assert projection.explained_variance_ratio == pytest.approx(reference.explained_variance_ratio_.sum())
+
+    def test_too_many_components(self, data):
+        """Verifies that asking for more components than features fails."""
+        with pytest.raises(ValueError):
+            feature_reduction.PCAProjection.fit(data[0][:, :8], 9)
+
+
+class TestReducedArtifact:
+    """Tests for saving and serving reduced models."""
+
+    def test_pca_model_takes_raw_features(self, data, tmp_path):
+        """Ensures a PCA artifact loads as a predictor that reduces raw HOG features itself."""
+        train, labels, test = data
+        reduction = feature_reduction.FeatureReduction.parse("pca:32")
+        projection = reduction.fit(train)
+        model = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(projection.transform(train), labels)
+        manifest = model_artifact.export_model(model, tmp_path, projection=projection)
+        predictor, _ = model_artifact.load_artifact(tmp_path, verify=True)
+        assert isinstance(predictor, feature_reduction.ReducedPredictor)
+        assert (predictor.n_features, manifest["n_features"], manifest["reduction"]) == (2592, 32, "pca:32")
+        assert manifest["format_version"] == model_artifact.REDUCED_FORMAT_VERSION
+        np.testing.assert_array_equal(predictor.predict(test), model.predict(projection.transform(test)))
+        served = model_registry.load_model(tmp_path)
+        model_registry.warm(served)
+        np.testing.assert_array_equal(served.predictor.predict(test), predictor.predict(test))
+
+    def test_float16_storage(self, data, tmp_path):
+        """Verifies that float16 storage halves the support vectors on disk and serves in float32."""
+        train, labels, test = data
+        model = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(train, labels)
+        full = model_artifact.export_model(model, tmp_path / "full")
+        half = model_artifact.export_model(model, tmp_path / "half", storage_dtype=np.float16)
+        size = lambda directory, manifest: (directory / manifest["arrays"]["support_vectors"]["file"]).stat().st_size
+        assert size(tmp_path / "half", half) < 0.51 * size(tmp_path / "full", full)
+        assert (half["reduction"], half["format_version"]) == ("float16", model_artifact.FORMAT_VERSION)
+        engine, _ = model_artifact.load_artifact(tmp_path / "half")
+        assert engine.support_vectors.dtype == np.float32
+        np.testing.assert_array_equal(engine.predict(test), model.predict(test))
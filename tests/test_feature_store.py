@@ -0,0 +1,116 @@
+"""
+Unit tests for the persistent HOG feature store.
+
+Tests cover:
+1. Features and labels identical to extracting from scratch, loaded as memory maps
+2. Incremental updates: only new or changed images are re-extracted
+3. Unreadable images, touched files and HOG parameter changes
+"""
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("cv2")
+
+import feature_store
+import hog_features
+import image_loading
+
+DATAPP_TEST_DIR = Path(__file__).resolve().parent.parent / "datapp" / "test"
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """Copies a few approved and rejected castings into a scratch dataset."""
+    for label in ("approved", "rejected"):
+        paths = sorted((DATAPP_TEST_DIR / label).glob("*.jpeg"))[:4]
+        if not paths:
+            pytest.skip("datapp/test images are not available")
+        (tmp_path / "images" / label).mkdir(parents=True)
+        for path in paths:
+            shutil.copy(path, tmp_path / "images" / label / path.name)
+    return tmp_path / "images"
+
+
+def expected_features(image_dir):
+    """Extracts the features of the scratch dataset from scratch, in store order."""
+    entries = image_loading.list_images(image_dir)
+    images = np.stack([image_loading.read_image(path) for path, _ in entries])
+    return hog_features.extract_hog_batch(images), [label for _, label in entries]
+
+
+class TestFeatureStore:
+    """Tests for feature_store.FeatureStore."""
+
+    def test_first_sync_matches_direct_extraction(self, image_dir, tmp_path):
+        """Ensures the stored matrix equals a from-scratch extraction and is memory-mapped."""
+        store = feature_store.FeatureStore(tmp_path / "store")
+        features, labels = store.sync(image_dir)
+        expected, expected_labels = expected_features(image_dir)
+        assert isinstance(features, np.memmap)
+        np.testing.assert_array_equal(features, expected)
+        assert list(labels) == expected_labels
+        assert store.last_sync == {"reused": 0, "extracted": 8, "failed": 0}
+        assert len(store.paths) == 8
+
+    def test_unchanged_dataset_is_reused(self, image_dir, tmp_path):
+        """Verifies that a second sync extracts nothing and returns the same rows."""
+        first, _ = feature_store.FeatureStore(tmp_path / "store").sync(image_dir)
+        store = feature_store.FeatureStore(tmp_path / "store")
+        second, _ = store.sync(image_dir)
+        assert store.last_sync == {"reused": 8, "extracted": 0, "failed": 0}
+        np.testing.assert_array_equal(first, second)
+
+    def test_only_new_and_changed_images_are_extracted(self, image_dir, tmp_path):
+        """Ensures incremental updates re-extract just the affected images and drop deleted ones."""
+        feature_store.FeatureStore(tmp_path / "store").sync(image_dir)
+        approved = sorted((image_dir / "approved").glob("*.jpeg"))
+        rejected = sorted((image_dir / "rejected").glob("*.jpeg"))
+        shutil.copy(rejected[0], approved[0])
+        shutil.copy(rejected[1], image_dir / "approved" / "new.jpeg")
+        rejected[2].unlink()
+        store = feature_store.FeatureStore(tmp_path / "store")
+        features, labels = store.sync(image_dir)
+        assert store.last_sync == {"reused": 6, "extracted": 2, "failed": 0}
+        expected, expected_labels = expected_features(image_dir)
+        np.testing.assert_array_equal(features, expected)
+        assert list(labels) == expected_labels
+
+    def test_touched_file_keeps_its_row(self, image_dir, tmp_path):
+        """Verifies that a new mtime with the same content is resolved by the content hash."""
+        feature_store.FeatureStore(tmp_path / "store").sync(image_dir)
+        path = sorted((image_dir / "approved").glob("*.jpeg"))[0]
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        store = feature_store.FeatureStore(tmp_path / "store")
+        store.sync(image_dir)
+        assert store.last_sync["extracted"] == 0
+
+    def test_unreadable_image_is_skipped_until_it_changes(self, image_dir, tmp_path):
+        """Ensures a broken file is left out, reported once, and not retried while unchanged."""
+        (image_dir / "approved" / "broken.jpeg").write_bytes(b"not a jpeg")
+        store = feature_store.FeatureStore(tmp_path / "store")
+        features, _ = store.sync(image_dir)
+        assert features.shape[0] == 8
+        assert store.last_sync["failed"] == 1
+        store.sync(image_dir)
+        assert store.last_sync == {"reused": 8, "extracted": 0, "failed": 1}
+
+    def test_parameter_change_rebuilds(self, image_dir, tmp_path):
+        """Verifies that a store built with other HOG parameters is not reused."""
+        feature_store.FeatureStore(tmp_path / "store").sync(image_dir)
+        store = feature_store.FeatureStore(tmp_path / "store", orientations=9)
+        features, _ = store.sync(image_dir)
+        assert store.last_sync["extracted"] == 8
+        assert features.shape[1] == hog_features.feature_length(orientations=9)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,98 @@
+"""
+Unit tests for the vectorized HOG feature extractor.
+
+Tests cover:
+1. Bit-for-bit parity with skimage.feature.hog on the bundled preprocessed images
+2. Parity for other image sizes, orientation counts and cell sizes
+3. Input validation
+"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+cv2 = pytest.importorskip("cv2")
+skimage_feature = pytest.importorskip("skimage.feature")
+
+import hog_features
+
+DATAPP_TEST_DIR = Path(__file__).resolve().parent.parent / "datapp" / "test"
+
+
+def reference_hog(image, orientations=8, pixels_per_cell=(16, 16)):
+    """Computes the descriptor the way the project originally did, through skimage."""
+    return skimage_feature.hog(image, orientations=orientations, pixels_per_cell=pixels_per_cell,
+                               cells_per_block=(1, 1))
+
+
+@pytest.fixture(scope="module")
+def image_stack():
+    """Loads a few approved and rejected castings from datapp/test."""
+    paths = sorted((DATAPP_TEST_DIR / "approved").glob("*.jpeg"))[:6]
+    paths += sorted((DATAPP_TEST_DIR / "rejected").glob("*.jpeg"))[:6]
+    if not paths:
+        pytest.skip("datapp/test images are not available")
+    return np.stack([cv2.imread(str(path), cv2.IMREAD_GRAYSCALE) for path in paths])
+
+
+class TestSkimageParity:
+    """Tests ensuring the vectorized extractor reproduces skimage's HOG output."""
+
+    def test_batch_matches_skimage_bit_for_bit(self, image_stack):
+        """Ensures the production HOG parameters give exactly skimage's features."""
+        expected = np.array([reference_hog(image) for image in image_stack])
+        features = hog_features.extract_hog_batch(image_stack)
+        assert features.shape == (len(image_stack), hog_features.feature_length())
+        assert features.dtype == np.float64
+        np.testing.assert_array_equal(features, expected)
+
+    def test_chunking_does_not_change_features(self, image_stack):
+        """Verifies that the chunk size only affects memory use, not the output."""
+        np.testing.assert_array_equal(hog_features.extract_hog_batch(image_stack, chunk_size=1),
+                                      hog_features.extract_hog_batch(image_stack, chunk_size=64))
+
+    def test_single_image_helper(self, image_stack):
+        """Verifies that extract_hog returns the 1-D descriptor of one image."""
+        np.testing.assert_array_equal(hog_features.extract_hog(image_stack[0]), reference_hog(image_stack[0]))
+
+    @pytest.mark.parametrize("shape, orientations, pixels_per_cell", [
+        ((301, 317), 9, (8, 8)),
+        ((300, 300), 8, (32, 32)),
+        ((64, 96), 6, (16, 12)),
+    ])
+    def test_other_layouts_match_skimage(self, shape, orientations, pixels_per_cell):
+        """Ensures parity holds for sizes that do not divide evenly into cells and other parameters."""
+        images = np.random.RandomState(0).randint(0, 256, size=(3,) + shape).astype(np.uint8)
+        expected = np.array([reference_hog(image, orientations, pixels_per_cell) for image in images])
+        features = hog_features.extract_hog_batch(images, orientations=orientations,
+                                                  pixels_per_cell=pixels_per_cell)
+        np.testing.assert_array_equal(features, expected)
+
+    def test_float_images_match_skimage(self):
+        """Verifies the non-uint8 path within the documented tolerance."""
+        images = np.random.RandomState(1).rand(2, 48, 48)
+        expected = np.array([reference_hog(image) for image in images])
+        np.testing.assert_allclose(hog_features.extract_hog_batch(images), expected, rtol=0, atol=1e-12)
+
+
+class TestInputValidation:
+    """Tests for rejecting unsupported inputs."""
+
+    def test_rejects_larger_blocks(self):
+        """Ensures block sizes other than (1, 1) are refused."""
+        with pytest.raises(ValueError):
+            hog_features.extract_hog_batch(np.zeros((1, 32, 32), dtype=np.uint8), cells_per_block=(2, 2))
+
+    def test_rejects_wrong_rank(self):
+        """Ensures colour stacks are refused instead of silently misread."""
+        with pytest.raises(ValueError):
+            hog_features.extract_hog_batch(np.zeros((1, 32, 32, 3), dtype=np.uint8))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,107 @@
+"""
+Unit tests for the parallel hyperparameter search.
+
+Tests cover:
+1. Trials on the shared Gram matrix scoring exactly like plain SVCs on the features
+2. Grid and successive-halving searches, their results and summaries
+3. Building the final model from the best parameters
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+svm = pytest.importorskip("sklearn.svm")
+model_selection = pytest.importorskip("sklearn.model_selection")
+
+import hyperparameter_search
+
+SMALL_GRID = [
+    {"kernel": ["rbf"], "C": [0.3, 3], "gamma": [0.01, 0.03]},
+    {"kernel": ["linear"], "C": [0.1]},
+    {"kernel": ["poly"], "C": [1], "gamma": [0.01]},
+]
+
+
+@pytest.fixture(scope="module")
+def data():
+    """HOG-sized features of two overlapping classes."""
+    random_state = np.random.RandomState(0)
+    features = random_state.rand(180, 2592) * 0.2
+    labels = np.repeat([0, 1], 90)
+    features[labels == 1, :1296] += 0.01
+    order = random_state.permutation(180)
+    return features[order], labels[order]
+
+
+class TestSharedGramSVC:
+    """Tests for trials on the shared Gram matrix."""
+
+    @pytest.mark.parametrize("params", [{"kernel": "rbf", "C": 3, "gamma": 0.03},
+                                        {"kernel": "linear", "C": 0.1},
+                                        {"kernel": "poly", "C": 1, "gamma": 0.01}])
+    def test_scores_match_plain_svc(self, data, params, tmp_path):
+        """Ensures a shared-Gram trial cross-validates exactly like an SVC on the features."""
+        features, labels = data
+        gram_dir = hyperparameter_search.write_gram(features, tmp_path)
+        cv = model_selection.StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+        shared = model_selection.cross_val_score(hyperparameter_search.SharedGramSVC(gram_dir=gram_dir, **params),
+                                                 np.arange(len(labels)).reshape(-1, 1), labels, cv=cv)
+        plain = model_selection.cross_val_score(hyperparameter_search.best_estimator(params), features, labels,
+                                                cv=cv)
+        np.testing.assert_allclose(shared, plain)
+
+    def test_unknown_kernel_raises(self, data, tmp_path):
+        """Verifies that kernels the Gram matrix cannot express are rejected."""
+        gram_dir = hyperparameter_search.write_gram(data[0][:10], tmp_path)
+        with pytest.raises(ValueError):
+            hyperparameter_search.SharedGramSVC(kernel="sigmoid", gram_dir=gram_dir).fit(
+                np.arange(10).reshape(-1, 1), data[1][:10])
+
+
+class TestSearch:
+    """Tests for the grid and successive-halving searches."""
+
+    def test_grid_search_evaluates_every_candidate(self, data, tmp_path):
+        """Ensures every candidate is scored and the best parameters omit the temporary Gram directory."""
+        result = hyperparameter_search.search(*data, param_grid=SMALL_GRID, n_jobs=1, work_dir=tmp_path)
+        assert len(result.cv_results_["params"]) == 6
+        assert "gram_dir" not in result.best_params_
+        assert result.best_score_ == max(result.cv_results_["mean_test_score"])
+        # The Gram matrix is removed with the search
+        assert not list(tmp_path.iterdir())
+
+    def test_halving_search_runs(self, data, tmp_path):
+        """Verifies that successive halving finishes with fewer candidates on more images."""
+        result = hyperparameter_search.search(*data, param_grid=SMALL_GRID, method="halving", n_jobs=1,
+                                              work_dir=tmp_path)
+        assert result.n_resources_[-1] > result.n_resources_[0]
+        assert result.n_candidates_[-1] < result.n_candidates_[0]
+        assert set(result.best_params_) <= {"kernel", "C", "gamma"}
+
+    def test_summary_lists_best_first(self, data, tmp_path):
+        """Ensures the summary starts with the best candidate and hides the Gram directory."""
+        result = hyperparameter_search.search(*data, param_grid=SMALL_GRID, n_jobs=1, work_dir=tmp_path)
+        lines = hyperparameter_search.summarize(result, top=3)
+        assert len(lines) == 3
+        assert lines[0].startswith(f"{result.best_score_:.4f}")
+        assert "gram_dir" not in "".join(lines)
+
+    def test_unknown_method_raises(self, data):
+        """Verifies that an unknown search method is rejected before any work is done."""
+        with pytest.raises(ValueError):
+            hyperparameter_search.search(*data, method="random")
+
+
+class TestBestEstimator:
+    """Tests for building the final model."""
+
+    def test_best_estimator_applies_parameters(self):
+        """Ensures the returned SVC uses the searched kernel, C and gamma."""
+        model = hyperparameter_search.best_estimator({"kernel": "poly", "C": 10, "gamma": 0.003})
+        assert (model.kernel, model.C, model.gamma, model.degree, model.coef0) == ("poly", 10, 0.003, 3, 1)
+        assert hyperparameter_search.best_estimator({"kernel": "linear", "C": 0.1}).kernel == "linear"
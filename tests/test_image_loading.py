@@ -0,0 +1,99 @@
+"""
+Unit tests for the parallel image loader.
+
+Tests cover:
+1. Identical output to the original serial create_model.load_images_and_labels
+2. Compact integer labels
+3. Per-file failures and resizing of other image sizes
+"""
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+cv2 = pytest.importorskip("cv2")
+
+import image_loading
+
+DATAPP_TEST_DIR = Path(__file__).resolve().parent.parent / "datapp" / "test"
+
+
+def reference_load_images_and_labels(directory_path):
+    """The serial loader create_model.py used before, kept verbatim for comparison."""
+    data = []
+    labels = []
+    for rootdir, _, anyfiles in os.walk(directory_path):
+        request_label = os.path.basename(rootdir)
+        for file in anyfiles:
+            if file.endswith(('png', 'jpg', 'jpeg')):
+                current_file_path = os.path.join(rootdir, file)
+                try:
+                    image = cv2.imread(current_file_path, cv2.IMREAD_GRAYSCALE)
+                    if image is None:
+                        print(f"Could not read image: {current_file_path}")
+                        continue
+                    if image.shape != (300, 300):  # Resizing if not 300x300
+                        image = cv2.resize(image, (300, 300))
+                    data.append(image)
+                    labels.append(request_label)
+                except Exception as error:
+                    print(f"Error loading image {current_file_path}: {error}")
+    data = np.array(data)
+    labels = np.array(labels)
+    return data, labels
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """Copies some castings, adds a broken file and an image that needs resizing."""
+    for label in ("approved", "rejected"):
+        paths = sorted((DATAPP_TEST_DIR / label).glob("*.jpeg"))[:6]
+        if not paths:
+            pytest.skip("datapp/test images are not available")
+        (tmp_path / label).mkdir()
+        for path in paths:
+            shutil.copy(path, tmp_path / label / path.name)
+    (tmp_path / "approved" / "broken.jpeg").write_bytes(b"not a jpeg")
+    cv2.imwrite(str(tmp_path / "rejected" / "large.png"),
+                np.random.RandomState(0).randint(0, 256, size=(480, 640)).astype(np.uint8))
+    return tmp_path
+
+
+class TestParallelLoader:
+    """Tests for image_loading."""
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_matches_serial_loader(self, image_dir, workers):
+        """Ensures images, labels, order, dtype and shape equal the original function's output."""
+        expected_images, expected_labels = reference_load_images_and_labels(image_dir)
+        images, labels = image_loading.load_images_and_labels(image_dir, workers=workers)
+        assert images.dtype == expected_images.dtype == np.uint8
+        np.testing.assert_array_equal(images, expected_images)
+        np.testing.assert_array_equal(labels, expected_labels)
+        assert labels.dtype == expected_labels.dtype
+
+    def test_compact_labels_and_failures(self, image_dir):
+        """Verifies integer label codes and that the broken file is reported, not raised."""
+        images, label_codes, label_names, errors = image_loading.load_dataset(image_dir, workers=4)
+        assert label_names == ["approved", "rejected"]
+        assert label_codes.dtype == np.uint8
+        assert len(label_codes) == len(images) == 13
+        assert list(errors) == [os.path.join(image_dir, "approved", "broken.jpeg")]
+
+    def test_fills_given_array(self, image_dir):
+        """Ensures load_images writes into a caller-provided buffer."""
+        paths = [path for path, _ in image_loading.list_images(image_dir / "rejected")]
+        out = np.empty((len(paths), 300, 300), dtype=np.uint8)
+        images, errors = image_loading.load_images(paths, workers=2, out=out)
+        assert images is out
+        assert errors == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,87 @@
+"""
+Unit tests for the request metrics in metrics.py.
+
+Tests cover:
+1. Histogram bucketing, sums and counts per label set
+2. Stage timers recording latencies and counting errors
+3. The Prometheus text rendering
+"""
+import os
+import sys
+
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import metrics
+
+
+class TestHistogram:
+    """Tests for metrics.Histogram."""
+
+    def test_cumulative_buckets(self):
+        """Ensures observations land in the first bucket whose bound is not below them."""
+        histogram = metrics.Histogram("h", "test", ("endpoint",), buckets=(1, 5, 10))
+        for value in (0.5, 1, 3, 7, 50):
+            histogram.observe(value, "predict")
+        cumulative, total, count = histogram.snapshot("predict")
+        assert cumulative == [2, 3, 4, 5]
+        assert (total, count) == (61.5, 5)
+
+    def test_label_sets_are_separate(self):
+        """Verifies that each label combination keeps its own series."""
+        histogram = metrics.Histogram("h", "test", ("endpoint",), buckets=(1,))
+        histogram.observe(0.1, "predict")
+        histogram.observe(0.1, "predict_batch")
+        histogram.observe(0.1, "predict_batch")
+        assert histogram.snapshot("predict")[2] == 1
+        assert histogram.snapshot("predict_batch")[2] == 2
+        assert histogram.snapshot("unused") == ([0, 0], 0.0, 0)
+
+
+class TestStageTimer:
+    """Tests for metrics.stage_timer."""
+
+    def test_records_latency(self):
+        """Ensures a stage's duration is observed under its endpoint and stage labels."""
+        before = metrics.stage_latency.snapshot("test_endpoint", "hog")[2]
+        with metrics.stage_timer("test_endpoint", "hog"):
+            pass
+        assert metrics.stage_latency.snapshot("test_endpoint", "hog")[2] == before + 1
+
+    def test_counts_errors_and_reraises(self):
+        """Verifies that an exception is counted for its stage, timed, and propagated."""
+        errors_before = metrics.stage_errors.value("test_endpoint", "decode")
+        with pytest.raises(ValueError):
+            with metrics.stage_timer("test_endpoint", "decode"):
+                raise ValueError("broken image")
+        assert metrics.stage_errors.value("test_endpoint", "decode") == errors_before + 1
+        assert metrics.stage_latency.snapshot("test_endpoint", "decode")[2] >= 1
+
+
+class TestRender:
+    """Tests for metrics.Registry.render."""
+
+    def test_prometheus_text_format(self):
+        """Ensures counters, histograms and collected gauges and counters render in the exposition format."""
+        registry = metrics.Registry()
+        counter = registry.counter("app_errors_total", "Errors.", ("stage",))
+        histogram = registry.histogram("app_seconds", "Latency.", ("stage",), buckets=(0.1, 1))
+        registry.add_collector(lambda: [("app_cache_entries", "Entries.", 3)])
+        registry.add_collector(lambda: [("app_reloads_total", "Reloads.", 2)], kind="counter")
+        counter.inc('say "hi"')
+        histogram.observe(0.5, "hog")
+        lines = registry.render().splitlines()
+        assert "# TYPE app_errors_total counter" in lines
+        assert 'app_errors_total{stage="say \\"hi\\""} 1' in lines
+        assert "# TYPE app_seconds histogram" in lines
+        assert 'app_seconds_bucket{stage="hog",le="0.1"} 0' in lines
+        assert 'app_seconds_bucket{stage="hog",le="1"} 1' in lines
+        assert 'app_seconds_bucket{stage="hog",le="+Inf"} 1' in lines
+        assert 'app_seconds_sum{stage="hog"} 0.5' in lines
+        assert 'app_seconds_count{stage="hog"} 1' in lines
+        assert "# TYPE app_cache_entries gauge" in lines
+        assert "app_cache_entries 3" in lines
+        assert "# TYPE app_reloads_total counter" in lines
+        assert "app_reloads_total 2" in lines
@@ -0,0 +1,126 @@
+"""
+Unit tests for the /predict micro-batching layer.
+
+Tests cover:
+1. Concurrent requests are merged into one predict call and get their own rows back
+2. Batch size and wait window limits
+3. Error propagation and batch-size metrics
+4. Rows of different model versions predicted separately
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import micro_batching
+
+
+class RecordingPredictor:
+    """Returns the first feature of every row and records the size of every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, features):
+        self.calls.append(len(features))
+        return features[:, 0].copy()
+
+
+def submit_concurrently(batcher, values):
+    """Submits one single-row request per value from its own thread and returns the results by value."""
+    results = {}
+    barrier = threading.Barrier(len(values))
+
+    def request(value):
+        barrier.wait()
+        results[value] = batcher.predict(np.full(4, value, dtype=float))
+
+    threads = [threading.Thread(target=request, args=(value,)) for value in values]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+class TestMicroBatcher:
+    """Tests for micro_batching.MicroBatcher."""
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Ensures concurrent callers are merged and each gets exactly its own prediction."""
+        predictor = RecordingPredictor()
+        batcher = micro_batching.MicroBatcher(predictor, max_batch_size=8, max_wait=0.5)
+        results = submit_concurrently(batcher, list(range(8)))
+        assert predictor.calls == [8]
+        for value, prediction in results.items():
+            np.testing.assert_array_equal(prediction, [value])
+
+    def test_max_batch_size_is_respected(self):
+        """Verifies that a full batch is predicted without waiting for more requests."""
+        predictor = RecordingPredictor()
+        batcher = micro_batching.MicroBatcher(predictor, max_batch_size=3, max_wait=0.2)
+        results = submit_concurrently(batcher, list(range(9)))
+        assert len(results) == 9
+        assert max(predictor.calls) <= 3
+        assert sum(predictor.calls) == 9
+
+    def test_lone_request_returns_after_window(self):
+        """Verifies that a single request is answered once the wait window closes."""
+        batcher = micro_batching.MicroBatcher(RecordingPredictor(), max_batch_size=32, max_wait=0.01)
+        prediction = batcher.predict(np.full((1, 4), 7.0))
+        np.testing.assert_array_equal(prediction, [7.0])
+
+    def test_errors_reach_every_caller(self):
+        """Ensures a failing predict call raises in each waiting request instead of hanging."""
+        def failing(features):
+            raise RuntimeError("model exploded")
+
+        batcher = micro_batching.MicroBatcher(failing, max_batch_size=2, max_wait=0.01)
+        with pytest.raises(RuntimeError):
+            batcher.predict(np.zeros(4))
+        # The worker survives the failure
+        with pytest.raises(RuntimeError):
+            batcher.predict(np.zeros(4))
+
+    def test_rows_of_different_models_are_not_mixed(self):
+        """Ensures rows naming different predict functions (model versions) are predicted by their own function."""
+        old_model, new_model = RecordingPredictor(), RecordingPredictor()
+        batcher = micro_batching.MicroBatcher(max_batch_size=8, max_wait=0.5)
+        barrier = threading.Barrier(6)
+        results = {}
+
+        def request(value):
+            barrier.wait()
+            predictor = old_model if value % 2 else new_model
+            results[value] = (batcher.predict(np.full(4, value, dtype=float), predictor), predictor)
+
+        threads = [threading.Thread(target=request, args=(value,)) for value in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        assert {value: result[0].tolist() for value, result in results.items()} == {
+            value: [value] for value in range(6)}
+        assert sum(old_model.calls) == 3 and sum(new_model.calls) == 3
+        with pytest.raises(ValueError):
+            micro_batching.MicroBatcher().submit(np.zeros(4))
+
+    def test_stats_report_batch_sizes(self):
+        """Verifies the knobs and the achieved batch-size histogram."""
+        batcher = micro_batching.MicroBatcher(RecordingPredictor(), max_batch_size=4, max_wait=0.5)
+        submit_concurrently(batcher, list(range(4)))
+        stats = batcher.stats()
+        assert stats["max_batch_size"] == 4
+        assert stats["max_wait_ms"] == pytest.approx(500)
+        assert stats["batch_size_histogram"] == {4: 1}
+        assert stats["mean_batch_size"] == 4
+        assert stats["rows"] == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
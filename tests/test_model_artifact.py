@@ -0,0 +1,94 @@
+"""
+Unit tests for the pickle-free model artifact format.
+
+Tests cover:
+1. Round trip from a fitted SVC to a memory-mapped kernel engine with identical decisions
+2. Converting a pickle and replacing an artifact with a new generation
+3. Rejecting tampered arrays, unknown formats and mismatched HOG parameters
+"""
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+svm = pytest.importorskip("sklearn.svm")
+
+import model_artifact
+import svm_engine
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    """Trains the production SVC configuration on HOG-sized features of two shifted classes."""
+    random_state = np.random.RandomState(0)
+    features = random_state.rand(120, 2592) * 0.2
+    labels = np.repeat([0, 1], 60)
+    features[labels == 1, :1296] += 0.05
+    model = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(features[::2], labels[::2])
+    return model, features[1::2]
+
+
+class TestRoundTrip:
+    """Tests for saving and loading artifacts."""
+
+    def test_loaded_engine_matches_exported_engine(self, fitted, tmp_path):
+        """Ensures the loaded engine gives the same decision values as the engine it was saved from."""
+        model, features = fitted
+        manifest = model_artifact.export_model(model, tmp_path, label_names=["approved", "rejected"])
+        engine, loaded_manifest = model_artifact.load_artifact(tmp_path, verify=True)
+        reference = svm_engine.KernelSVMEngine.from_model(model)
+        np.testing.assert_array_equal(engine.decision_function(features), reference.decision_function(features))
+        np.testing.assert_array_equal(engine.predict(features), model.predict(features))
+        assert loaded_manifest == manifest
+        assert manifest["label_names"] == ["approved", "rejected"]
+
+    def test_arrays_are_memory_mapped(self, fitted, tmp_path):
+        """Verifies that the engine serves straight from read-only memory maps."""
+        model_artifact.export_model(fitted[0], tmp_path)
+        engine, _ = model_artifact.load_artifact(tmp_path)
+        assert isinstance(engine.support_vectors.base, np.memmap) or isinstance(engine.support_vectors, np.memmap)
+        assert not engine.support_vectors.flags.writeable
+
+    def test_convert_pickle_and_new_generation(self, fitted, tmp_path):
+        """Ensures converting a pickle writes a loadable artifact and a new save replaces the old arrays."""
+        pickle_path = tmp_path / "modell.pkl"
+        with open(pickle_path, "wb") as file:
+            pickle.dump(fitted[0], file)
+        model_dir = tmp_path / "model"
+        first = model_artifact.convert_pickle(pickle_path, model_dir)
+        second = model_artifact.export_model(fitted[0], model_dir)
+        assert first["generation"] != second["generation"]
+        assert sorted(path.name for path in model_dir.glob("*.npy")) == sorted(
+            entry["file"] for entry in second["arrays"].values())
+        assert model_artifact.is_artifact(model_dir) and not model_artifact.is_artifact(pickle_path)
+
+
+class TestValidation:
+    """Tests for rejecting artifacts that cannot be served."""
+
+    def test_tampered_array_fails_verification(self, fitted, tmp_path):
+        """Ensures a modified array file is caught by its checksum."""
+        manifest = model_artifact.export_model(fitted[0], tmp_path)
+        with open(tmp_path / manifest["arrays"]["dual_coef"]["file"], "r+b") as file:
+            file.seek(-4, os.SEEK_END)
+            file.write(b"\x00\x00\x80\x7f")
+        with pytest.raises(ValueError, match="Checksum"):
+            model_artifact.load_artifact(tmp_path, verify=True)
+
+    @pytest.mark.parametrize("change", [{"format_version": 99}, {"hog": {"image_size": [128, 128],
+                                                                          "orientations": 8,
+                                                                          "pixels_per_cell": [16, 16]}}])
+    def test_incompatible_manifest(self, fitted, tmp_path, change):
+        """Verifies that unknown formats and other HOG parameters are rejected."""
+        manifest = model_artifact.export_model(fitted[0], tmp_path)
+        manifest.update(change)
+        with open(model_artifact.manifest_path(tmp_path), "w") as f:
+            json.dump(manifest, f)
+        with pytest.raises(ValueError):
+            model_artifact.load_artifact(tmp_path)
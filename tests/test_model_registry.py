@@ -0,0 +1,199 @@
+"""
+Unit tests for versioned models and zero-downtime reloads.
+
+Tests cover:
+1. Serving the newest version and falling back to a single model file
+2. Reloading, rolling back and trimming the rollback history
+3. The watcher promoting new versions but never a rolled-back one
+4. Decision values and calibrated probabilities of a served version
+5. Rollbacks and reloads pinned for every process sharing the models directory
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+svm = pytest.importorskip("sklearn.svm")
+
+import calibration
+import model_artifact
+import model_registry
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    """Trains a small RBF SVC on HOG-sized features of two shifted classes."""
+    random_state = np.random.RandomState(0)
+    features = random_state.rand(60, 2592) * 0.2
+    labels = np.repeat([0, 1], 30)
+    features[labels == 1, :1296] += 0.05
+    return svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(features, labels)
+
+
+@pytest.fixture
+def models_dir(tmp_path, fitted):
+    """A models directory holding two versions."""
+    for version in ("20260101-000000", "20260201-000000"):
+        model_artifact.export_model(fitted, tmp_path / version)
+    return tmp_path
+
+
+class TestModelRegistry:
+    """Tests for model_registry.ModelRegistry."""
+
+    def test_start_serves_newest_version(self, models_dir):
+        """Ensures start() activates the version that sorts last, ignoring other entries."""
+        (models_dir / "notes.txt").write_text("not a model")
+        registry = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        registry.start()
+        assert registry.versions() == ["20260101-000000", "20260201-000000"]
+        assert registry.current().version == "20260201-000000"
+        assert registry.current().predictor.predict(np.zeros((1, 2592))).shape == (1,)
+
+    def test_start_falls_back_without_versions(self, tmp_path, fitted):
+        """Verifies that a single artifact outside the models directory is served when it has no versions."""
+        model_artifact.export_model(fitted, tmp_path / "model")
+        registry = model_registry.ModelRegistry(tmp_path / "models", watch_interval=0)
+        registry.start(fallback_path=tmp_path / "model")
+        assert registry.current().version == "model"
+        with pytest.raises(FileNotFoundError):
+            model_registry.ModelRegistry(tmp_path / "models", watch_interval=0).start()
+
+    def test_reload_and_rollback(self, models_dir):
+        """Ensures a reload swaps models, notifies listeners and can be rolled back."""
+        registry = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        swaps = []
+        registry.add_listener(lambda new, old: swaps.append((new.version, old.version if old else None)))
+        registry.start()
+        before = registry.current()
+        registry.reload("20260101-000000")
+        assert before.version == "20260201-000000"
+        assert registry.current().version == "20260101-000000"
+        assert registry.rollback() is before
+        assert registry.current() is before
+        assert swaps == [("20260201-000000", None), ("20260101-000000", "20260201-000000"),
+                         ("20260201-000000", "20260101-000000")]
+        with pytest.raises(LookupError):
+            registry.rollback()
+        with pytest.raises(LookupError):
+            registry.reload("19990101-000000")
+
+    def test_history_is_trimmed(self, models_dir):
+        """Verifies that only history_size previous versions stay loaded."""
+        registry = model_registry.ModelRegistry(models_dir, watch_interval=0, history_size=1)
+        registry.start()
+        registry.reload("20260101-000000")
+        registry.reload("20260201-000000")
+        assert [model.version for model in registry.loaded()] == ["20260201-000000", "20260101-000000"]
+        assert registry.status()["previous"] == ["20260101-000000"]
+
+
+class TestPinnedVersions:
+    """Tests for pins, which carry rollbacks and reloads over to other processes (workers)."""
+
+    def test_rollback_reaches_other_workers(self, models_dir, fitted):
+        """Ensures a rollback in one registry is followed by another one and survives a restart."""
+        first = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        second = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        first.start()
+        second.start()
+        first.reload("20260101-000000")
+        first.rollback()
+        assert first.pinned() == "20260201-000000"
+        model_artifact.export_model(fitted, models_dir / "20260301-000000")
+        assert first.check_for_new_version() is None
+        second.reload("20260101-000000", pin=False)
+        assert second.check_for_new_version().version == "20260201-000000"
+        assert second.check_for_new_version() is None
+        restarted = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        restarted.start()
+        assert restarted.current().version == "20260201-000000"
+
+    def test_reloading_newest_lifts_the_pin(self, models_dir):
+        """Verifies that a reload without a version unpins, and other registries move to the newest version."""
+        first = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        second = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        first.start()
+        second.start()
+        first.reload("20260101-000000")
+        assert second.check_for_new_version().version == "20260101-000000"
+        first.reload()
+        assert first.pinned() is None
+        assert second.check_for_new_version().version == "20260201-000000"
+        assert second.status()["pinned"] is None
+
+    def test_pinned_model_path_only_follows_pins(self, models_dir, tmp_path, fitted):
+        """Ensures a registry serving a fixed model ignores new versions but follows a pin."""
+        model_artifact.export_model(fitted, tmp_path / "model")
+        registry = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        registry.activate_path(tmp_path / "model")
+        registry.start_watching(follow_newest=False)
+        assert registry.check_for_new_version() is None
+        model_registry.ModelRegistry(models_dir, watch_interval=0).reload("20260101-000000")
+        assert registry.check_for_new_version().version == "20260101-000000"
+
+
+class TestDecide:
+    """Tests for ModelVersion.decide and the stored calibration."""
+
+    def test_decide_matches_predict(self, tmp_path, fitted):
+        """Ensures decide returns the labels predict does and the decision values the engine computes."""
+        model_artifact.export_model(fitted, tmp_path / "model")
+        model = model_registry.load_model(tmp_path / "model")
+        features = np.random.RandomState(1).rand(20, 2592) * 0.2
+        features[10:, :1296] += 0.05
+        labels, decision = model.decide(features)
+        np.testing.assert_array_equal(labels, model.predictor.predict(features))
+        np.testing.assert_allclose(decision, fitted.decision_function(features), atol=1e-3)
+        assert model.calibration is None
+        assert model.describe()["calibrated"] is False
+
+    def test_calibration_is_read_from_metadata(self, tmp_path, fitted):
+        """Verifies that a calibration stored in the artifact's metadata turns decision values into probabilities."""
+        scaling = calibration.PlattScaling(-2.0, 0.0)
+        model_artifact.export_model(fitted, tmp_path / "model", metadata={"calibration": scaling.to_dict()})
+        model = model_registry.load_model(tmp_path / "model")
+        assert model.describe()["calibrated"] is True
+        np.testing.assert_allclose(model.calibration.probability([0.0, 1.0]), [0.5, 1 / (1 + np.exp(-2.0))])
+
+
+class TestWatcher:
+    """Tests for picking up new versions from the models directory."""
+
+    def test_new_version_is_promoted(self, models_dir, fitted):
+        """Ensures a version newer than any seen before is activated."""
+        registry = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        registry.start()
+        assert registry.check_for_new_version() is None
+        model_artifact.export_model(fitted, models_dir / "20260301-000000")
+        assert registry.check_for_new_version().version == "20260301-000000"
+        assert registry.current().version == "20260301-000000"
+
+    def test_rolled_back_version_stays_retired(self, models_dir, fitted):
+        """Verifies that the watcher does not re-promote a version an operator rolled back from."""
+        registry = model_registry.ModelRegistry(models_dir, watch_interval=0)
+        registry.start()
+        model_artifact.export_model(fitted, models_dir / "20260301-000000")
+        registry.check_for_new_version()
+        registry.rollback()
+        assert registry.check_for_new_version() is None
+        assert registry.current().version == "20260201-000000"
+
+    def test_watcher_thread(self, models_dir, fitted):
+        """Ensures the background watcher swaps in a new version without a request."""
+        registry = model_registry.ModelRegistry(models_dir, watch_interval=0.05)
+        registry.start()
+        registry.start_watching()
+        try:
+            model_artifact.export_model(fitted, models_dir / "20260301-000000")
+            for _ in range(100):
+                if registry.current().version == "20260301-000000":
+                    break
+                registry._stop.wait(0.05)
+            assert registry.current().version == "20260301-000000"
+        finally:
+            registry.stop_watching()
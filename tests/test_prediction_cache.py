@@ -0,0 +1,110 @@
+"""
+Unit tests for the content-hash prediction cache.
+
+Tests cover:
+1. Hits, misses and LRU eviction
+2. Invalidation when the model file changes
+3. The optional on-disk store surviving a restart
+4. Explicit per-model fingerprints and pruning retired models
+"""
+import os
+import sys
+
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import prediction_cache
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    """Writes a stand-in model file."""
+    path = tmp_path / "modell.pkl"
+    path.write_bytes(b"model version 1")
+    return path
+
+
+def replace_model(path, content):
+    """Overwrites the model file and moves its modification time so the change is always visible."""
+    path.write_bytes(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestPredictionCache:
+    """Tests for prediction_cache.PredictionCache."""
+
+    def test_hit_and_miss_counters(self, model_path):
+        """Ensures a repeated upload is a hit and an unseen one a miss."""
+        cache = prediction_cache.PredictionCache(model_path, max_entries=8)
+        key = prediction_cache.content_hash(b"casting photo")
+        assert cache.get(key) is None
+        cache.put(key, [1])
+        assert cache.get(key) == [1]
+        assert cache.get(prediction_cache.content_hash(b"other photo")) is None
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+    def test_content_hash_depends_on_bytes_only(self):
+        """Verifies that identical bytes give identical keys and different bytes different keys."""
+        assert prediction_cache.content_hash(b"abc") == prediction_cache.content_hash(bytearray(b"abc"))
+        assert prediction_cache.content_hash(b"abc") != prediction_cache.content_hash(b"abd")
+
+    def test_lru_eviction(self, model_path):
+        """Ensures the least recently used entry is evicted once the cache is full."""
+        cache = prediction_cache.PredictionCache(model_path, max_entries=2)
+        cache.put("a", [0])
+        cache.put("b", [1])
+        assert cache.get("a") == [0]
+        cache.put("c", [1])
+        assert cache.get("b") is None
+        assert cache.get("a") == [0]
+        assert cache.get("c") == [1]
+
+    def test_model_change_invalidates(self, model_path):
+        """Ensures entries stop being served once the model file has different content."""
+        cache = prediction_cache.PredictionCache(model_path)
+        cache.put("a", [0])
+        replace_model(model_path, b"model version 2")
+        assert cache.get("a") is None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_touching_model_keeps_entries(self, model_path):
+        """Verifies that a new modification time with the same content does not drop the cache."""
+        cache = prediction_cache.PredictionCache(model_path)
+        cache.put("a", [0])
+        replace_model(model_path, b"model version 1")
+        assert cache.get("a") == [0]
+
+    def test_disk_store_survives_restart(self, model_path, tmp_path):
+        """Ensures a new cache instance reads entries written by the previous one."""
+        db_path = tmp_path / "predictions.sqlite"
+        cache = prediction_cache.PredictionCache(model_path, db_path=db_path)
+        cache.put_many([("a", [0]), ("b", [1])])
+        cache.close()
+        restarted = prediction_cache.PredictionCache(model_path, db_path=db_path)
+        assert restarted.get("b") == [1]
+        assert restarted.stats()["hits"] == 1
+        replace_model(model_path, b"model version 2")
+        assert restarted.get("a") is None
+        restarted.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
+
+    def test_explicit_fingerprints_are_separate(self, tmp_path):
+        """Ensures two models served side by side never share answers and retain() drops retired ones."""
+        cache = prediction_cache.PredictionCache(None, max_entries=8, db_path=tmp_path / "cache.sqlite")
+        cache.put("a", [0], fingerprint="v1")
+        cache.put("a", [1], fingerprint="v2")
+        assert cache.get("a", fingerprint="v1") == [0]
+        assert cache.get("a", fingerprint="v2") == [1]
+        cache.retain(["v2"])
+        assert cache.get("a", fingerprint="v1") is None
+        assert cache.get("a", fingerprint="v2") == [1]
+        reopened = prediction_cache.PredictionCache(None, db_path=tmp_path / "cache.sqlite")
+        assert reopened.get("a", fingerprint="v1") is None
+        assert reopened.get("a", fingerprint="v2") == [1]
@@ -0,0 +1,143 @@
+"""
+Unit tests for the batch preprocessing stage used by /predict_batch.
+
+Tests cover:
+1. Features from the process pool match the in-thread path, in input order
+2. Per-file error reporting without aborting the batch
+3. The grayscale and reduced-size decode path against the original decode pipeline
+4. Replacing a pool whose worker process died
+5. Pool workers not forked from the server process
+"""
+import io
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+cv2 = pytest.importorskip("cv2")
+PIL_Image = pytest.importorskip("PIL.Image")
+
+import hog_features
+import preprocessing
+
+DATAPP_TEST_DIR = Path(__file__).resolve().parent.parent / "datapp" / "test"
+
+
+def reference_model_input(raw):
+    """The decode stage before the fast path: full decode, RGB -> BGR -> GRAY, resize."""
+    image_cv2 = cv2.cvtColor(np.array(PIL_Image.open(io.BytesIO(raw))), cv2.COLOR_RGB2BGR)
+    return cv2.resize(cv2.cvtColor(image_cv2, cv2.COLOR_BGR2GRAY), preprocessing.IMAGE_SIZE)
+
+
+def encode(pixels, format="JPEG"):
+    """Encodes a NumPy image as upload bytes."""
+    buffer = io.BytesIO()
+    PIL_Image.fromarray(pixels).save(buffer, format=format, quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def raw_images():
+    """Reads the raw bytes of a few datapp/test images."""
+    paths = sorted(DATAPP_TEST_DIR.rglob("*.jpeg"))[:10]
+    if not paths:
+        pytest.skip("datapp/test images are not available")
+    return [path.read_bytes() for path in paths]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def stop_pool():
+    """Stops the worker processes once the module is done."""
+    yield
+    preprocessing.shutdown_pool()
+
+
+class TestPreprocessBatch:
+    """Tests for preprocessing.preprocess_batch."""
+
+    def test_matches_single_image_pipeline(self, raw_images):
+        """Ensures every row equals the features of the same image encoded on its own."""
+        batch = preprocessing.preprocess_batch(raw_images, workers=1, chunk_size=4)
+        expected = np.array([hog_features.extract_hog(preprocessing.decode_image(raw)) for raw in raw_images])
+        assert batch.indices == list(range(len(raw_images)))
+        assert batch.errors == {}
+        np.testing.assert_array_equal(batch.features, expected)
+
+    def test_pool_preserves_input_order(self, raw_images):
+        """Verifies that the process pool returns the same rows, in the same order, as the inline path."""
+        inline = preprocessing.preprocess_batch(raw_images, workers=1, chunk_size=3)
+        preprocessing.shutdown_pool()
+        pooled = preprocessing.preprocess_batch(raw_images, workers=2, chunk_size=3)
+        assert pooled.indices == inline.indices
+        np.testing.assert_array_equal(pooled.features, inline.features)
+
+    def test_broken_pool_is_replaced(self, raw_images):
+        """Ensures a pool whose worker died is replaced and the batch still succeeds."""
+        inline = preprocessing.preprocess_batch(raw_images, workers=0, chunk_size=3)
+        preprocessing.shutdown_pool()
+        pool = preprocessing.get_pool(2)
+        pool.submit(os._exit, 1)
+        pooled = preprocessing.preprocess_batch(raw_images, workers=2, chunk_size=3)
+        assert preprocessing.get_pool(2) is not pool
+        np.testing.assert_array_equal(pooled.features, inline.features)
+
+    def test_workers_are_not_forked_from_the_server(self):
+        """Verifies that pool workers are children of the forkserver, not of the (threaded) server process."""
+        if preprocessing.POOL_START_METHOD != "forkserver":
+            pytest.skip("forkserver is not available on this platform")
+        preprocessing.shutdown_pool()
+        assert preprocessing.get_pool(2).submit(os.getppid).result() != os.getpid()
+
+    def test_accepts_pil_images(self, raw_images):
+        """Verifies that already opened PIL images are still accepted."""
+        images = [PIL_Image.open(io.BytesIO(raw)) for raw in raw_images[:3]]
+        batch = preprocessing.preprocess_batch(images, workers=1)
+        assert batch.features.shape == (3, hog_features.feature_length())
+
+    def test_reports_failures_per_file(self, raw_images):
+        """Ensures broken files are reported by index while the others are still encoded."""
+        items = [raw_images[0], b"not an image", raw_images[1], b"", raw_images[2]]
+        batch = preprocessing.preprocess_batch(items, workers=2, chunk_size=2)
+        assert sorted(batch.errors) == [1, 3]
+        assert batch.indices == [0, 2, 4]
+        assert batch.features.shape == (3, hog_features.feature_length())
+
+    def test_empty_batch(self):
+        """Verifies that an empty batch gives an empty feature matrix."""
+        batch = preprocessing.preprocess_batch([])
+        assert batch.features.shape == (0, hog_features.feature_length())
+
+
+class TestDecode:
+    """Tests for preprocessing.to_model_input."""
+
+    def test_small_images_match_original_pipeline(self, raw_images):
+        """Ensures grayscale and RGB uploads too small for a reduced decode give identical pixels."""
+        gray = cv2.imdecode(np.frombuffer(raw_images[0], np.uint8), cv2.IMREAD_GRAYSCALE)
+        rgb = cv2.resize(cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB), (640, 480))
+        rgb[..., 0] = 255 - rgb[..., 0]
+        for raw in (raw_images[0], encode(rgb), encode(rgb, format="PNG")):
+            np.testing.assert_array_equal(preprocessing.decode_image(raw), reference_model_input(raw))
+
+    def test_large_jpeg_uses_reduced_decode(self, raw_images):
+        """Verifies a large photo is decoded at reduced size and stays close to the full decode."""
+        gray = cv2.imdecode(np.frombuffer(raw_images[1], np.uint8), cv2.IMREAD_GRAYSCALE)
+        raw = encode(cv2.cvtColor(cv2.resize(gray, (2400, 2400), interpolation=cv2.INTER_CUBIC),
+                                  cv2.COLOR_GRAY2RGB))
+        image = PIL_Image.open(io.BytesIO(raw))
+        fast = preprocessing.to_model_input(image)
+        assert image.size == (1200, 1200)
+        assert fast.shape == (300, 300) and fast.dtype == np.uint8
+        difference = np.abs(fast.astype(np.int16) - reference_model_input(raw))
+        assert difference.mean() < 1
+        exact = preprocessing.to_model_input(PIL_Image.open(io.BytesIO(raw)), fast_decode=False)
+        np.testing.assert_array_equal(exact, reference_model_input(raw))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,116 @@
+"""
+Unit tests for the columnar result files and the result history reader.
+
+Tests cover:
+1. Blocks round-tripping every column, with dictionary-encoded strings and missing scores
+2. Dropping a block cut short by a crash before appending again, and compacting blocks into one
+3. Loading, filtering and summarizing the history across JSON, JSON-lines and columnar files
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import result_store
+
+RESULTS = [
+    {"File": "cast_01.jpeg", "Raw prediction": 0, "Decision": "approved", "Model version": "v1",
+     "Decision score": -1.5},
+    {"File": "cäst_02.jpeg", "Raw prediction": 1, "Decision": "rejected", "Model version": "v1",
+     "Decision score": 0.25},
+    {"File": "cast_03.jpeg", "Raw prediction": 0, "Decision": "approved"},
+]
+
+
+class TestColumnarFile:
+    """Tests for writing and reading columnar result files."""
+
+    def test_blocks_round_trip(self, tmp_path):
+        """Ensures every column comes back, with strings stored once per block and missing values marked."""
+        path = tmp_path / "batch_results_20260301.npb"
+        result_store.append_block(path, RESULTS[:2], time_ms=1_000)
+        result_store.append_block(path, RESULTS[2:], time_ms=2_000)
+        records, decisions, versions, _ = next(result_store.iter_blocks(path))
+        assert decisions.tolist() == ["approved", "rejected"] and versions.tolist() == ["v1"]
+        assert records["decision"].tolist() == [0, 1]
+        assert result_store.read_file_names(path) == [result["File"] for result in RESULTS]
+        history = result_store.load_history(tmp_path)
+        assert history["label"].tolist() == [0, 1, 0]
+        assert history["decision"].tolist() == ["approved", "rejected", "approved"]
+        assert history["model_version"].tolist() == ["v1", "v1", ""]
+        np.testing.assert_array_equal(history["score"], np.array([-1.5, 0.25, np.nan], dtype="f4"))
+        assert history["time"].astype(np.int64).tolist() == [1_000, 1_000, 2_000]
+        assert history["date"].tolist() == ["20260301"] * 3
+
+    def test_truncated_block_is_dropped(self, tmp_path):
+        """Verifies that a block cut short by a crash is ignored and removed before the next append."""
+        path = tmp_path / "results.npb"
+        result_store.append_block(path, RESULTS[:1])
+        complete = path.stat().st_size
+        result_store.append_block(path, RESULTS[1:])
+        with open(path, "r+b") as f:
+            f.truncate(complete + 150)
+        assert result_store.read_file_names(path) == ["cast_01.jpeg"]
+        result_store.repair(path)
+        assert path.stat().st_size == complete
+        result_store.append_block(path, RESULTS[1:])
+        assert result_store.read_file_names(path) == [result["File"] for result in RESULTS]
+
+    def test_compact_merges_blocks(self, tmp_path):
+        """Ensures compacting leaves one block with merged dictionaries and unchanged rows."""
+        path = tmp_path / "batch_results_20260301.npb"
+        result_store.append_block(path, RESULTS[2:] + RESULTS[:1], time_ms=1_000)
+        result_store.append_block(path, [dict(RESULTS[1], **{"Model version": "v2"})], time_ms=2_000)
+        before = result_store.load_history(tmp_path)
+        result_store.compact(path)
+        blocks = list(result_store.iter_blocks(path))
+        assert len(blocks) == 1
+        assert blocks[0][1].tolist() == ["approved", "rejected"] and blocks[0][2].tolist() == ["", "v1", "v2"]
+        after = result_store.load_history(tmp_path)
+        for column in result_store.COLUMNS:
+            np.testing.assert_array_equal(after[column], before[column])
+
+
+class TestHistory:
+    """Tests for reading many days of results."""
+
+    @pytest.fixture
+    def history_folder(self, tmp_path):
+        """Three days of results, one per output format, and files that are not results."""
+        with open(tmp_path / "batch_results_20260301.json", "w") as f:
+            json.dump({"Batch results": RESULTS[:2]}, f, indent=4)
+        with open(tmp_path / "batch_results_20260302.jsonl", "w") as f:
+            f.writelines(json.dumps(result) + "\n" for result in RESULTS)
+            f.write('{"File": "cut')
+        result_store.append_block(tmp_path / "batch_results_20260303.npb", RESULTS)
+        (tmp_path / "batch_results_20260303.json.tmp").write_text("{")
+        (tmp_path / "watch_checkpoint.json").write_text("{}")
+        return tmp_path
+
+    def test_loads_every_format_within_dates(self, history_folder):
+        """Ensures the history combines all formats and only opens the days asked for."""
+        history = result_store.load_history(history_folder)
+        assert len(history["file"]) == 8
+        assert set(history) == set(result_store.COLUMNS)
+        later = result_store.load_history(history_folder, since="20260302")
+        assert sorted(set(later["date"].tolist())) == ["20260302", "20260303"]
+        assert len(result_store.load_history(history_folder, since="20260401")["file"]) == 0
+
+    def test_filter_and_summarize(self, history_folder):
+        """Verifies counts and mean scores per group after filtering."""
+        history = result_store.load_history(history_folder)
+        summary = result_store.summarize(history, by=("decision",))
+        assert [(key, count) for key, count, _ in summary] == [(("approved",), 5), (("rejected",), 3)]
+        assert summary[1][2] == pytest.approx(0.25)
+        rejected = result_store.filter_history(history, decision="rejected", file_pattern="c?st_*")
+        assert result_store.summarize(rejected, by=("date", "model_version")) == [
+            (("20260301", "v1"), 1, pytest.approx(0.25)),
+            (("20260302", "v1"), 1, pytest.approx(0.25)),
+            (("20260303", "v1"), 1, pytest.approx(0.25)),
+        ]
+        assert result_store.summarize(result_store.filter_history(history, model_version="v2")) == []
@@ -0,0 +1,74 @@
+"""
+Unit tests for the regression check of the benchmark suite (benchmarks/run_suite.py).
+
+Tests cover:
+1. Flagging metrics that got worse past the threshold, for lower-is-better and higher-is-better metrics
+2. Per-metric thresholds and metrics missing from either run
+3. The suite's exit status with and without regressions
+"""
+import os
+import sys
+
+import pytest
+
+# Ensuring the benchmark suite is importable
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "benchmarks"))
+
+pytest.importorskip("sklearn")
+pytest.importorskip("cv2")
+
+import run_suite
+
+
+def results(metrics):
+    """A results dict as Results.to_dict writes it, from {name: (value, better)}."""
+    return {"meta": {}, "metrics": {name: {"value": value, "unit": "", "better": better}
+                                    for name, (value, better) in metrics.items()}}
+
+
+BASELINE = results({"serving.predict_p99_ms": (10.0, "lower"), "serving.batch_32_images_per_second": (100.0, "higher"),
+                    "model.test_accuracy": (0.9, "higher")})
+
+
+class TestCompare:
+    """Tests for run_suite.compare."""
+
+    def test_flags_regressions_in_both_directions(self):
+        """Ensures a slower lower-is-better and a smaller higher-is-better metric are both flagged."""
+        current = results({"serving.predict_p99_ms": (13.0, "lower"),
+                           "serving.batch_32_images_per_second": (70.0, "higher"),
+                           "model.test_accuracy": (0.9, "higher")})
+        regressions = run_suite.compare(current, BASELINE, 0.25)
+        assert [(name, base, value) for name, base, value, _ in regressions] == [
+            ("serving.predict_p99_ms", 10.0, 13.0), ("serving.batch_32_images_per_second", 100.0, 70.0)]
+        assert regressions[0][3] == pytest.approx(0.3)
+        assert regressions[1][3] == pytest.approx(-0.3)
+
+    def test_improvements_and_small_changes_pass(self):
+        """Verifies that improvements, and changes within the threshold, are not flagged."""
+        current = results({"serving.predict_p99_ms": (7.0, "lower"),
+                           "serving.batch_32_images_per_second": (80.0, "higher"),
+                           "model.test_accuracy": (0.95, "higher")})
+        assert run_suite.compare(current, BASELINE, 0.25) == []
+
+    def test_metric_thresholds_and_missing_metrics(self):
+        """Ensures per-metric thresholds override the default and metrics missing from either run are ignored."""
+        current = results({"model.test_accuracy": (0.88, "higher"), "serving.new_metric": (1.0, "lower")})
+        assert run_suite.compare(current, BASELINE, 0.25) == []
+        regressions = run_suite.compare(current, BASELINE, 0.25, {"model.test_accuracy": 0.01})
+        assert [name for name, *_ in regressions] == ["model.test_accuracy"]
+
+
+class TestReportRegressions:
+    """Tests for run_suite.report_regressions, the suite's exit status."""
+
+    def test_exit_status(self, capsys):
+        """Verifies status 1 with the regressed metrics printed, and status 0 without regressions."""
+        current = results({"serving.predict_p99_ms": (20.0, "lower")})
+        assert run_suite.report_regressions(current, BASELINE, 0.25, {}, "baseline.json") == 1
+        output = capsys.readouterr().out
+        assert "REGRESSION serving.predict_p99_ms: 10.0000 -> 20.0000 (+100.0%)" in output
+        assert run_suite.report_regressions(BASELINE, BASELINE, 0.25, {}, "baseline.json") == 0
+        assert "No metric regressed" in capsys.readouterr().out
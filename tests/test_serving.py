@@ -0,0 +1,113 @@
+"""
+Unit tests for the production serving entry points of app.py and gunicorn.conf.py.
+
+Tests cover:
+1. Readiness, and predictions instead of 503s, only after create_app has loaded and warmed the model
+2. Per-process services started once and left to the workers when preloading
+3. Model admin endpoints closed to other hosts without an admin token
+4. The gunicorn configuration and its app factory string
+"""
+import importlib
+import os
+import runpy
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BASE_DIR)
+
+svm = pytest.importorskip("sklearn.svm")
+pytest.importorskip("cv2")
+
+import model_artifact
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """Imports app.py afresh, serving a small exported SVC without cache or batch jobs."""
+    random_state = np.random.RandomState(0)
+    features = random_state.rand(40, 2592)
+    labels = np.repeat([0, 1], 20)
+    features[labels == 1, :1296] += 0.1
+    model_artifact.export_model(svm.SVC(kernel="rbf", gamma=0.01).fit(features, labels), tmp_path / "model")
+    monkeypatch.setenv("REFLASK_MODEL_PATH", str(tmp_path / "model"))
+    monkeypatch.setenv("REFLASK_PREDICTION_CACHE", "0")
+    monkeypatch.setenv("REFLASK_JOBS", "0")
+    monkeypatch.delitem(sys.modules, "app", raising=False)
+    module = importlib.import_module("app")
+    yield module
+    sys.modules.pop("app", None)
+
+
+class TestAppFactory:
+    """Tests for app.create_app and the health endpoints."""
+
+    def test_ready_only_after_create_app(self, app_module):
+        """Ensures importing the app loads nothing, predictions answer 503 and /readyz 200 once the model is warm."""
+        client = app_module.app.test_client()
+        assert app_module.registry.current() is None
+        assert client.get("/readyz").status_code == 503
+        assert client.post("/predict", data=b"image").status_code == 503
+        assert client.post("/predict_batch", data={}, content_type="multipart/form-data").status_code == 503
+        assert app_module.create_app() is app_module.app
+        response = client.get("/readyz")
+        assert response.status_code == 200
+        assert response.get_json()["model_version"] == "model"
+        assert client.get("/healthz").get_json() == {"status": "ok"}
+
+    def test_preload_leaves_services_to_workers(self, app_module):
+        """Verifies that create_app(start=False) loads the model only, and services start once per process."""
+        app_module.create_app(start=False)
+        assert app_module.registry.current() is not None
+        assert not app_module.ready.is_set()
+        model = app_module.registry.current()
+        app_module.create_app()
+        app_module.start_services()
+        assert app_module.ready.is_set()
+        assert app_module._services_pid == os.getpid()
+        assert app_module.registry.current() is model
+
+
+class TestAdminEndpoints:
+    """Tests for the authorization of /models/reload and /models/rollback."""
+
+    def test_no_token_rejects_remote_requests(self, app_module, monkeypatch):
+        """Ensures that without REFLASK_ADMIN_TOKEN only loopback requests may reload or roll back the model."""
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+        app_module.create_app(start=False)
+        model = app_module.registry.current()
+        client = app_module.app.test_client()
+        remote = {"REMOTE_ADDR": "10.0.0.5"}
+        assert client.post("/models/reload", json={"version": "model"}, environ_base=remote).status_code == 403
+        assert client.post("/models/rollback", environ_base=remote).status_code == 403
+        assert app_module.registry.current() is model
+        # From localhost the request is let through; there is no previous version to roll back to
+        assert client.post("/models/rollback", environ_base={"REMOTE_ADDR": "127.0.0.1"}).status_code == 409
+
+    def test_token_required_when_set(self, app_module, monkeypatch):
+        """Verifies that a configured token is required, from localhost too."""
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+        app_module.create_app(start=False)
+        client = app_module.app.test_client()
+        assert client.post("/models/rollback").status_code == 403
+        assert client.post("/models/rollback", headers={"X-Admin-Token": "secret"}).status_code == 409
+
+
+class TestGunicornConfig:
+    """Tests for gunicorn.conf.py."""
+
+    def test_config_preloads_the_factory(self, app_module, monkeypatch):
+        """Ensures the configuration preloads the app factory with threaded workers and single-threaded BLAS."""
+        gunicorn_util = pytest.importorskip("gunicorn.util")
+        monkeypatch.setattr(os, "environ", dict(os.environ))
+        monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+        monkeypatch.setenv("REFLASK_WORKERS", "3")
+        config = runpy.run_path(os.path.join(BASE_DIR, "gunicorn.conf.py"))
+        assert config["preload_app"] is True
+        assert (config["workers"], config["worker_class"]) == (3, "gthread")
+        assert os.environ["OMP_NUM_THREADS"] == "1"
+        assert gunicorn_util.import_app(config["wsgi_app"]) is app_module.app
+        assert not app_module.ready.is_set()
@@ -0,0 +1,103 @@
+"""
+Unit tests for the precomputed support-vector kernel engine.
+
+Tests cover:
+1. Parity with SVC.decision_function and SVC.predict
+2. Chunking and single-sample inputs
+3. Rejecting models the engine cannot serve
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+svm = pytest.importorskip("sklearn.svm")
+
+import svm_engine
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    """Trains the production SVC configuration on HOG-like features of two shifted classes."""
+    random_state = np.random.RandomState(0)
+    features = random_state.rand(240, 2592) * 0.2
+    labels = np.repeat([0, 1], 120)
+    features[labels == 1, :1296] += 0.05
+    model = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(features[::2], labels[::2])
+    return model, features[1::2]
+
+
+class TestSVCParity:
+    """Tests ensuring the engine reproduces the sklearn model."""
+
+    def test_float32_decision_values(self, fitted):
+        """Ensures float32 decision values match SVC.decision_function within the documented tolerance."""
+        model, features = fitted
+        engine = svm_engine.KernelSVMEngine.from_model(model)
+        assert engine.support_vectors.dtype == np.float32
+        assert engine.support_vectors.flags["C_CONTIGUOUS"]
+        np.testing.assert_allclose(engine.decision_function(features), model.decision_function(features),
+                                   rtol=0, atol=1e-4)
+
+    def test_float64_decision_values(self, fitted):
+        """Verifies that the float64 engine agrees to rounding error."""
+        model, features = fitted
+        engine = svm_engine.KernelSVMEngine.from_model(model, dtype=np.float64)
+        np.testing.assert_allclose(engine.decision_function(features), model.decision_function(features),
+                                   rtol=0, atol=1e-10)
+
+    def test_predict_matches_labels(self, fitted):
+        """Ensures predicted labels are the model's labels, with the same dtype."""
+        model, features = fitted
+        engine = svm_engine.KernelSVMEngine.from_model(model)
+        predictions = engine.predict(features)
+        np.testing.assert_array_equal(predictions, model.predict(features))
+        assert predictions.dtype == model.predict(features).dtype
+
+    def test_string_labels(self, fitted):
+        """Verifies that non-numeric classes_ are mapped like SVC.predict does."""
+        model, features = fitted
+        labels = np.where(model.predict(features) == 1, "rejected", "approved")
+        named = svm.SVC(kernel="rbf", C=1, gamma=0.01).fit(features, labels)
+        engine = svm_engine.KernelSVMEngine.from_model(named)
+        np.testing.assert_array_equal(engine.predict(features), named.predict(features))
+
+    def test_chunking_and_single_sample(self, fitted):
+        """Verifies that the chunk size does not change the output and 1-D input is one sample."""
+        model, features = fitted
+        engine = svm_engine.KernelSVMEngine.from_model(model, dtype=np.float64, chunk_size=7)
+        np.testing.assert_allclose(engine.decision_function(features), model.decision_function(features),
+                                   rtol=0, atol=1e-10)
+        assert engine.decision_function(features[0]).shape == (1,)
+
+
+class TestInputValidation:
+    """Tests for rejecting unsupported models and inputs."""
+
+    def test_rejects_linear_kernel(self, fitted):
+        """Ensures non-RBF models are refused."""
+        _, features = fitted
+        model = svm.SVC(kernel="linear").fit(features, np.arange(len(features)) % 2)
+        with pytest.raises(ValueError):
+            svm_engine.KernelSVMEngine.from_model(model)
+
+    def test_rejects_multiclass(self, fitted):
+        """Ensures models with more than two classes are refused."""
+        _, features = fitted
+        model = svm.SVC(kernel="rbf").fit(features, np.arange(len(features)) % 3)
+        with pytest.raises(ValueError):
+            svm_engine.KernelSVMEngine.from_model(model)
+
+    def test_rejects_wrong_feature_count(self, fitted):
+        """Ensures features of the wrong length are refused."""
+        engine = svm_engine.KernelSVMEngine.from_model(fitted[0])
+        with pytest.raises(ValueError):
+            engine.decision_function(np.zeros((2, 10)))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,110 @@
+"""
+Unit tests for the streaming multipart ingestion of /predict_batch.
+
+Tests cover:
+1. File parts yielded in order, each as soon as it is complete, with other fields skipped
+2. Per-file and per-request size limits
+3. Rejecting images with too many pixels before they are decoded
+"""
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ensuring project modules are importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+PIL_Image = pytest.importorskip("PIL.Image")
+werkzeug_test = pytest.importorskip("werkzeug.test")
+
+import preprocessing
+import upload_stream
+
+
+def multipart(data):
+    """Encodes a form as a multipart body; returns (body, boundary)."""
+    environ = werkzeug_test.EnvironBuilder(method="POST", data=data).get_environ()
+    return environ["wsgi.input"].read(), environ["CONTENT_TYPE"].split("boundary=")[1].strip('"')
+
+
+class RecordingStream(io.BytesIO):
+    """A request body that records how many bytes were read."""
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read = self.tell()
+        return chunk
+
+
+class TestIterUploads:
+    """Tests for reading file parts from a multipart body."""
+
+    def test_yields_files_in_order(self):
+        """Ensures every file part comes back with its name and bytes, and other fields are skipped."""
+        contents = [os.urandom(size) for size in (10, 200_000, 0)]
+        body, boundary = multipart({"files": [(io.BytesIO(content), f"{index}.jpg")
+                                              for index, content in enumerate(contents)],
+                                    "other": (io.BytesIO(b"ignored"), "other.jpg"), "note": "text"})
+        uploads = list(upload_stream.iter_uploads(io.BytesIO(body), boundary, read_size=4096))
+        assert [upload.filename for upload in uploads] == ["0.jpg", "1.jpg", "2.jpg"]
+        assert [upload.data for upload in uploads] == contents
+        assert all(upload.error is None for upload in uploads)
+
+    def test_empty_file_at_every_read_boundary(self):
+        """Verifies that parts keep exactly their bytes wherever the reads split the body and its delimiters."""
+        body, boundary = multipart({"files": [(io.BytesIO(b"first"), "0.jpg"), (io.BytesIO(b""), "1.jpg"),
+                                              (io.BytesIO(b"last"), "2.jpg")], "note": ""})
+        for read_size in range(1, len(body) + 1):
+            uploads = list(upload_stream.iter_uploads(io.BytesIO(body), boundary, read_size=read_size))
+            assert [upload.data for upload in uploads] == [b"first", b"", b"last"], read_size
+
+    def test_parts_are_yielded_while_reading(self):
+        """Verifies that the first file is yielded before the rest of the body has been read."""
+        body, boundary = multipart({"files": [(io.BytesIO(os.urandom(1000)), "first.jpg"),
+                                              (io.BytesIO(os.urandom(500_000)), "second.jpg")]})
+        stream = RecordingStream(body)
+        first = next(upload_stream.iter_uploads(stream, boundary, read_size=4096))
+        assert first.filename == "first.jpg"
+        assert stream.bytes_read < len(body) // 10
+
+    def test_oversized_file_is_reported(self):
+        """Ensures a file over the per-file limit fails alone, without its bytes."""
+        body, boundary = multipart({"files": [(io.BytesIO(os.urandom(5000)), "large.jpg"),
+                                              (io.BytesIO(b"small"), "small.jpg")]})
+        uploads = list(upload_stream.iter_uploads(io.BytesIO(body), boundary, max_file_bytes=1000,
+                                                  read_size=512))
+        assert uploads[0].data is None and "1000 bytes" in uploads[0].error
+        assert uploads[1] == ("small.jpg", b"small", None)
+
+    def test_request_limit_stops_reading(self):
+        """Verifies that reading stops with RequestTooLarge once the request limit is passed."""
+        body, boundary = multipart({"files": [(io.BytesIO(os.urandom(5000)), f"{index}.jpg")
+                                              for index in range(10)]})
+        stream = RecordingStream(body)
+        with pytest.raises(upload_stream.RequestTooLarge):
+            list(upload_stream.iter_uploads(stream, boundary, max_request_bytes=12_000, read_size=1024))
+        assert stream.bytes_read <= 12_000 + 1024
+
+    def test_truncated_body_raises(self):
+        """Ensures a body cut off before its closing boundary is an error, not a silent partial batch."""
+        body, boundary = multipart({"files": [(io.BytesIO(os.urandom(5000)), "cut.jpg")]})
+        with pytest.raises(ValueError):
+            list(upload_stream.iter_uploads(io.BytesIO(body[:3000]), boundary))
+
+
+class TestPixelLimit:
+    """Tests for the decompression bomb guard in preprocessing."""
+
+    def test_image_over_pixel_limit_fails_before_decoding(self, monkeypatch):
+        """Verifies that an image declaring too many pixels fails per file in a batch."""
+        monkeypatch.setattr(preprocessing, "MAX_IMAGE_PIXELS", 500 * 500)
+        uploads = []
+        for side in (400, 600):
+            buffer = io.BytesIO()
+            PIL_Image.fromarray(np.zeros((side, side), dtype=np.uint8)).save(buffer, format="PNG")
+            uploads.append(buffer.getvalue())
+        batch = preprocessing.preprocess_batch(uploads, workers=0)
+        assert batch.indices == [0]
+        assert "exceeds the limit" in batch.errors[1]
@@ -0,0 +1,137 @@
+"""
+Streaming multipart ingestion for /predict_batch, with bounded memory.
+
+request.files parses the whole multipart body before the view runs, and /predict_batch then read every file into
+memory before preprocessing started, so peak memory grew with the batch. Here the body is read from request.stream
+in READ_CHUNK_SIZE blocks and fed to Werkzeug's sans-IO MultipartDecoder; every file part is yielded as soon as its
+last byte has arrived. The view classifies the uploads in windows of REFLASK_INGEST_WINDOW (decode and HOG in the
+preprocessing pool, then one model call per window) and drops their bytes, so at most one window of raw images,
+plus the part being received, is held at a time: window x REFLASK_MAX_FILE_BYTES in the worst case. Limits:
+- REFLASK_MAX_FILE_BYTES: the rest of a larger file is discarded and the file is reported as failed,
+- REFLASK_MAX_REQUEST_BYTES: reading stops with RequestTooLarge, answered with 413,
+- REFLASK_MAX_IMAGE_PIXELS (preprocessing.py): images declaring more pixels fail before they are decoded.
+"""
+import os
+from collections import namedtuple
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+import preprocessing
+
+# Bytes read from the request body per step
+READ_CHUNK_SIZE = 64 * 1024
+# Largest accepted file (32 MiB) and request body (512 MiB)
+MAX_FILE_BYTES = int(os.environ.get("REFLASK_MAX_FILE_BYTES", 32 * 2 ** 20))
+MAX_REQUEST_BYTES = int(os.environ.get("REFLASK_MAX_REQUEST_BYTES", 512 * 2 ** 20))
+# Uploads classified together; by default enough to give every preprocessing worker one chunk
+INGEST_WINDOW = int(os.environ.get("REFLASK_INGEST_WINDOW",
+                                   max(preprocessing.PREPROCESS_WORKERS, 1) * preprocessing.PREPROCESS_CHUNK_SIZE))
+
+# One file part: its bytes, or None and the reason it was rejected
+Upload = namedtuple("Upload", ["filename", "data", "error"])
+
+
+class RequestTooLarge(ValueError):
+    """
+    Raised when a request body exceeds REFLASK_MAX_REQUEST_BYTES.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        super().__init__(f"Request body exceeds the limit of {limit} bytes.")
+
+
+def _delimiter_cut(data, delimiter):
+    """
+    The length of the longest prefix of data that does not end within a part delimiter ("\r\n--" + boundary up to
+    its line break). MultipartDecoder can emit bytes of a delimiter as file data when its buffer ends inside one.
+    """
+    start = data.rfind(delimiter)
+    if start != -1 and data.find(b"\n", start + len(delimiter)) == -1:
+        return start
+    position = data.find(b"\r", max(0, len(data) - len(delimiter) + 1))
+    while position != -1:
+        if delimiter.startswith(data[position:]):
+            return position
+        position = data.find(b"\r", position + 1)
+    return len(data)
+
+
+def iter_uploads(stream, boundary, field="files", max_file_bytes=None, max_request_bytes=None,
+                 read_size=READ_CHUNK_SIZE):
+    """
+    Yield the file parts of a multipart/form-data body named field, in order, while reading it.
+    Other fields are skipped without being kept.
+    Parameters:
+    - stream: file-like object with the body, e.g. request.stream.
+    - boundary: the boundary parameter of the Content-Type header.
+    - max_file_bytes / max_request_bytes: default to REFLASK_MAX_FILE_BYTES / REFLASK_MAX_REQUEST_BYTES.
+    Returns:
+    - A generator of Upload tuples; a file over max_file_bytes has data None and an error message.
+    Raises:
+    - RequestTooLarge once more than max_request_bytes have been read.
+    - ValueError if the body is not valid multipart data.
+    """
+    max_file_bytes = MAX_FILE_BYTES if max_file_bytes is None else max_file_bytes
+    max_request_bytes = MAX_REQUEST_BYTES if max_request_bytes is None else max_request_bytes
+    boundary = boundary.encode("latin-1") if isinstance(boundary, str) else boundary
+    decoder = MultipartDecoder(boundary)
+    delimiter = b"\r\n--" + boundary
+    received = 0
+    ended = False
+    # Bytes read but held back from the decoder because they may be the start of a delimiter
+    held = b""
+
+    def feed(minimum):
+        # Hand the decoder at least minimum more bytes, or everything left
+        nonlocal received, ended, held
+        fed = 0
+        while not ended and fed < minimum:
+            chunk = stream.read(read_size)
+            received += len(chunk)
+            if received > max_request_bytes:
+                raise RequestTooLarge(max_request_bytes)
+            if not chunk:
+                ended = True
+                decoder.receive_data(held)
+                decoder.receive_data(None)
+                return
+            data = held + chunk
+            cut = _delimiter_cut(data, delimiter)
+            if len(data) - cut > len(delimiter) + 256:
+                # No delimiter line is this long; the decoder rejects the malformed body
+                cut = len(data)
+            decoder.receive_data(data[:cut])
+            held = data[cut:]
+            fed += cut
+
+    # State of the file part being received; None while inside other fields
+    filename, chunks, size, error = None, [], 0, None
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            if ended:
+                raise ValueError("Incomplete multipart body.")
+            feed(1)
+            continue
+        if isinstance(event, (File, Field)):
+            # The decoder misses the delimiter after an empty part unless all of it is buffered when the part's
+            # data starts, and then reads the next part as data; delimiters are fed whole, so this is enough
+            feed(len(delimiter) + 2)
+        if isinstance(event, File) and event.name == field:
+            filename, chunks, size, error = event.filename, [], 0, None
+        elif isinstance(event, Data) and filename is not None:
+            size += len(event.data)
+            if error is None and size > max_file_bytes:
+                error = f"File exceeds the limit of {max_file_bytes} bytes."
+                chunks = []
+            if error is None:
+                chunks.append(event.data)
+            if not event.more_data:
+                yield Upload(filename, None if error else b"".join(chunks), error)
+                filename, chunks = None, []
+        elif isinstance(event, Epilogue):
+            return
+        elif not isinstance(event, Data):
+            # Any other field or file part: its data is skipped
+            filename = None